@@ -23,9 +23,12 @@ from routes.inventory_route import inventory_blueprint
 from routes.utilisation_route import utilisation_blueprint
 from routes.recommend_route import recommend_blueprint
 from routes.alerts_route import alerts_blueprint
+from routes.cache_route import cache_blueprint
+from routes.scheduler_route import scheduler_blueprint
 from flask_swagger_ui import get_swaggerui_blueprint
 from constants import SWAGGER_URL, API_URL
 from services.cache_service import init_cache
+from services.scheduler_service import init_scheduler
 from flask_talisman import Talisman
 from datetime import timedelta
 from flask import Flask
@@ -45,6 +48,7 @@ init_boto_clients()
 
 
 init_cache()
+init_scheduler()
 # torch.set_num_threads(1)
 # create_dir_path("audios")
 
@@ -120,6 +124,12 @@ application.register_blueprint(
 application.register_blueprint(
     recommend_blueprint, url_prefix=V1_ROUTE_PREFIX
 )
+application.register_blueprint(
+    cache_blueprint, url_prefix=V1_ROUTE_PREFIX
+)
+application.register_blueprint(
+    scheduler_blueprint, url_prefix=V1_ROUTE_PREFIX
+)
 
 # application.register_blueprint(
 #     polly_blueprint, url_prefix=V1_ROUTE_PREFIX
@@ -18,6 +18,66 @@ BASE_URL = "https://www.delmontefoods.com"
 PRESS_RELEASE_URL = "https://www.delmontefoods.com/news/press-releases?page="
 MAX_RETRIES = 3
 
+# Default cache TTLs (seconds) keyed by cache-key prefix. The longest matching
+# prefix wins; CACHE_TTL_POLICIES in the environment overrides these entries.
+CACHE_TTL_POLICIES = {
+    # CloudWatch utilisation checks
+    "idle_ec2_instances": 60 * 60,
+    "get_idle_rds_instances": 60 * 60,
+    "get_underutilized_redshift": 60 * 60,
+    "get_idle_load_balancers": 60 * 60,
+    "get_overprovisioned_ec2": 60 * 60,
+    "get_overprovisioned_lambdas": 60 * 60,
+    "get_overprovisioned_ebs": 60 * 60,
+    "list_lambda_functions": 60 * 60,
+    # Shared EC2/EBS describe snapshots (resource_snapshot_service)
+    "describe_ec2_instances": 15 * 60,
+    "describe_ebs_volumes": 15 * 60,
+    # Cost Explorer
+    "get_cost_anomalies": 6 * 60 * 60,
+    "get_cost_data": 12 * 60 * 60,
+    "cost_by_tag": 12 * 60 * 60,
+    "total_cost_trend": 12 * 60 * 60,
+    "cost_by_service": 12 * 60 * 60,
+    "forecasted_spend": 12 * 60 * 60,
+    "cost_service_and_tag": 12 * 60 * 60,
+    "get_daily_cost_trend": 12 * 60 * 60,
+    "budget_vs_actual": 12 * 60 * 60,
+}
+CACHE_TTL_IMMUTABLE = "immutable"
+
+# Utilisation classifier rules (utilisation_classifier_service). A resource
+# matches a rule when every condition holds: [op, threshold] with op one of
+# lt, le, gt, ge, on a metric feature (mean, p95, max, sum, active_fraction =
+# share of periods above active_threshold, trend = change per day) or on a
+# resource attribute (size_gib, memory_mb). no_data decides whether resources
+# without datapoints pass the metric conditions. The defaults reproduce the
+# previous mean/sum checks; UTILISATION_RULES in the environment overrides
+# these entries.
+UTILISATION_RULES = {
+    "ec2_idle": {
+        "active_threshold": 5, "no_data": False,
+        "conditions": {"mean": ["lt", 5]}},
+    "ec2_overprovisioned": {
+        "active_threshold": 20, "no_data": False,
+        "conditions": {"mean": ["lt", 5]}},
+    "rds_idle": {
+        "active_threshold": 5, "no_data": True,
+        "conditions": {"mean": ["lt", 5]}},
+    "redshift_underutilized": {
+        "active_threshold": 10, "no_data": True,
+        "conditions": {"mean": ["lt", 10]}},
+    "elb_idle": {
+        "active_threshold": 0, "no_data": True,
+        "conditions": {"sum": ["le", 0]}},
+    "ebs_overprovisioned": {
+        "active_threshold": 0, "no_data": True,
+        "conditions": {"size_gib": ["gt", 100], "sum": ["lt", 50]}},
+    "lambda_overprovisioned": {
+        "active_threshold": 0, "no_data": True,
+        "conditions": {"memory_mb": ["gt", 512], "sum": ["lt", 10]}},
+}
+
 ROUTES_ALLOWING_JSON = {
     "chat.post_feedback",
     "gtts.synthesize_route"
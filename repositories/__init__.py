@@ -8,7 +8,8 @@
 import gevent
 from services.logging_service import logging
 from repositories import (
-    chat_analytics_repository, chat_session_repository)
+    daily_cost_repository, inventory_snapshot_repository,
+    utilisation_metric_repository)
 
 
 logger = logging.getLogger(__name__)
@@ -23,7 +24,9 @@ def create_indexes():
     that the required indexes are set up for efficient querying and data retrieval.
 
     The collections being indexed:
-        - Chatbot Template
+        - Inventory snapshots
+        - Utilisation metrics
+        - Daily costs
 
     Logs:
         A debug message indicating successful creation of indexes.
@@ -31,8 +34,9 @@ def create_indexes():
 
     # List of greenlets (tasks) to run concurrently
     greenlets = [
-        gevent.spawn(chat_session_repository.create_index),
-        gevent.spawn(chat_analytics_repository.create_index)
+        gevent.spawn(inventory_snapshot_repository.create_index),
+        gevent.spawn(utilisation_metric_repository.create_index),
+        gevent.spawn(daily_cost_repository.create_index)
     ]
 
     # Wait for all greenlets to complete
@@ -0,0 +1,100 @@
+"""
+Repository for daily cost rows.
+
+Stores the rows of the local cost ledger (cost_ledger_service): one document
+per account, day, metric, service and tag value, so costs fetched from Cost
+Explorer outlive the host's ledger file. Refetched days overwrite their rows.
+Documents expire after MONGODB_COST_RETENTION_DAYS through a TTL index on day.
+
+ Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+ Unauthorized copying of this file, via any medium is strictly prohibited
+ Proprietary and confidential
+ See file LICENSE.txt for full license details.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING
+
+from repositories.mongo_db_service import bulk_upsert, get_database
+from utils.env_config import DB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "daily_costs"
+
+
+def get_collection():
+    """
+    Returns:
+        Collection: The daily costs collection.
+    """
+    return get_database()[COLLECTION_NAME]
+
+
+def create_index():
+    """
+    Creates the row key, the (account, tag_key, metric, day) range index and
+    the retention TTL index.
+    """
+    collection = get_collection()
+    collection.create_index(
+        [("account", ASCENDING), ("day", ASCENDING), ("tag_key", ASCENDING),
+         ("metric", ASCENDING), ("service", ASCENDING), ("tag_value", ASCENDING)],
+        unique=True, name="cost_key")
+    collection.create_index(
+        [("account", ASCENDING), ("tag_key", ASCENDING), ("metric", ASCENDING),
+         ("day", ASCENDING)],
+        name="account_tag_key_metric_day")
+    collection.create_index(
+        "day", name="day_ttl",
+        expireAfterSeconds=DB_CONFIG.MONGODB_COST_RETENTION_DAYS * 24 * 60 * 60)
+
+
+def upsert_costs(account, rows, tag_key=""):
+    """
+    Stores ledger rows.
+
+    Args:
+        account (str): Account id.
+        rows (Iterable[LedgerRow]): (day, service, tag value, metric, amount,
+            unit) rows.
+        tag_key (str): Tag key the rows are grouped by; "" for services only.
+
+    Returns:
+        int: The number of documents inserted or modified.
+    """
+    return bulk_upsert(get_collection(), (
+        ({"account": account, "day": _to_datetime(day), "tag_key": tag_key,
+          "metric": metric, "service": service, "tag_value": tag_value},
+         {"amount": amount, "unit": unit})
+        for day, service, tag_value, metric, amount, unit in rows))
+
+
+def find_costs(account, start, end, metrics, tag_key=""):
+    """
+    Returns the stored rows of the days in [start, end).
+
+    Args:
+        account (str): Account id.
+        start (str): First day, YYYY-MM-DD.
+        end (str): Day after the last, YYYY-MM-DD.
+        metrics (List[str]): Cost metrics.
+        tag_key (str): Tag key the rows are grouped by; "" for services only.
+
+    Returns:
+        List[LedgerRow]: (day, service, tag value, metric, amount, unit) rows.
+    """
+    projection = {"_id": 0, "day": 1, "service": 1, "tag_value": 1, "metric": 1,
+                  "amount": 1, "unit": 1}
+    return [(doc["day"].strftime("%Y-%m-%d"), doc["service"], doc["tag_value"],
+             doc["metric"], doc["amount"], doc.get("unit"))
+            for doc in get_collection().find(
+                {"account": account, "tag_key": tag_key, "metric": {"$in": list(metrics)},
+                 "day": {"$gte": _to_datetime(start), "$lt": _to_datetime(end)}},
+                projection)]
+
+
+def _to_datetime(day):
+    return datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc)
@@ -0,0 +1,106 @@
+"""
+Repository for inventory snapshots.
+
+Every collection run stores one document per resource, keyed by account,
+region, resource type, resource id and the run's collected_at time, with the
+resource's inventory fields under "data". Documents expire after
+MONGODB_INVENTORY_RETENTION_DAYS through a TTL index on collected_at.
+
+ Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+ Unauthorized copying of this file, via any medium is strictly prohibited
+ Proprietary and confidential
+ See file LICENSE.txt for full license details.
+"""
+
+import logging
+
+from pymongo import ASCENDING, DESCENDING
+
+from repositories.mongo_db_service import bulk_upsert, get_database
+from utils.env_config import DB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "inventory_snapshots"
+DATA_FIELD_NAME = "data"
+
+
+def get_collection():
+    """
+    Returns:
+        Collection: The inventory snapshots collection.
+    """
+    return get_database()[COLLECTION_NAME]
+
+
+def create_index():
+    """
+    Creates the snapshot key, the (account, region, type, collected_at) lookup
+    index and the retention TTL index.
+    """
+    collection = get_collection()
+    collection.create_index(
+        [("account", ASCENDING), ("region", ASCENDING), ("type", ASCENDING),
+         ("resource_id", ASCENDING), ("collected_at", ASCENDING)],
+        unique=True, name="snapshot_key")
+    collection.create_index(
+        [("account", ASCENDING), ("region", ASCENDING), ("type", ASCENDING),
+         ("collected_at", DESCENDING)],
+        name="account_region_type_collected_at")
+    collection.create_index(
+        "collected_at", name="collected_at_ttl",
+        expireAfterSeconds=DB_CONFIG.MONGODB_INVENTORY_RETENTION_DAYS * 24 * 60 * 60)
+
+
+def upsert_snapshot(account, region, resource_type, items, collected_at, id_field="id"):
+    """
+    Stores the resources of one collection run.
+
+    Args:
+        account (str): Account id.
+        region (str): Region name, or "global" for global resources.
+        resource_type (str): Resource type, e.g. "ec2" or "s3".
+        items (List[dict]): The resources' inventory fields.
+        collected_at (datetime): Time of the collection run.
+        id_field (str): Field of an item holding the resource id.
+
+    Returns:
+        int: The number of documents inserted or modified.
+    """
+    return bulk_upsert(get_collection(), (
+        ({"account": account, "region": region, "type": resource_type,
+          "resource_id": str(item[id_field]), "collected_at": collected_at},
+         {DATA_FIELD_NAME: item})
+        for item in items))
+
+
+def find_latest(account, region, resource_type, fields=None):
+    """
+    Returns the resources of the latest collection run.
+
+    Args:
+        account (str): Account id.
+        region (str): Region name.
+        resource_type (str): Resource type.
+        fields (List[str], optional): Inventory fields to return; all if None.
+
+    Returns:
+        List[dict]: The resources' inventory fields, with "resource_id" and
+        "collected_at".
+    """
+    collection = get_collection()
+    key = {"account": account, "region": region, "type": resource_type}
+    latest = collection.find_one(key, {"collected_at": 1, "_id": 0},
+                                 sort=[("collected_at", DESCENDING)])
+    if latest is None:
+        return []
+
+    projection = {"_id": 0, "resource_id": 1, "collected_at": 1}
+    if fields:
+        projection.update({f"{DATA_FIELD_NAME}.{field}": 1 for field in fields})
+    else:
+        projection[DATA_FIELD_NAME] = 1
+    return [{**doc.get(DATA_FIELD_NAME, {}), "resource_id": doc["resource_id"],
+             "collected_at": doc["collected_at"]}
+            for doc in collection.find({**key, "collected_at": latest["collected_at"]},
+                                       projection)]
@@ -4,7 +4,7 @@
 # See file LICENSE.txt for full license details.
 
 import time
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from utils.env_config import DB_CONFIG
 from datetime import datetime, timezone
 import logging
@@ -70,6 +70,39 @@ def generate_update_doc_with_timestamp(doc):
     doc[LAST_UPDATED_AT_FIELD_NAME] = generate_timestamp()
     return doc
 
+def bulk_upsert(collection, documents):
+    """
+    Upserts documents in unordered bulk writes of MONGODB_BULK_BATCH_SIZE
+    UpdateOne operations. Inserted documents get the creation timestamp, and
+    every written document the update timestamp.
+
+    Args:
+        collection (Collection): The collection to write to.
+        documents (Iterable[Tuple[dict, dict]]): (filter, fields) pairs; the
+            filter identifies the document and fields are set on it.
+
+    Returns:
+        int: The number of documents inserted or modified.
+    """
+    written = 0
+    batch = []
+    for key, fields in documents:
+        batch.append(UpdateOne(
+            key,
+            {"$set": generate_update_doc_with_timestamp(dict(fields)),
+             "$setOnInsert": {CREATED_AT_FIELD_NAME: generate_timestamp()}},
+            upsert=True))
+        if len(batch) >= DB_CONFIG.MONGODB_BULK_BATCH_SIZE:
+            written += _bulk_write(collection, batch)
+            batch = []
+    if batch:
+        written += _bulk_write(collection, batch)
+    return written
+
+def _bulk_write(collection, operations):
+    result = collection.bulk_write(operations, ordered=False)
+    return result.upserted_count + result.modified_count
+
 def generate_timestamp():
     """
     Generates the current timestamp in UTC timezone.
@@ -0,0 +1,82 @@
+"""
+Repository for utilisation metrics.
+
+Every utilisation check stores the features of each resource's metric matrix
+(see utilisation_classifier_service.metric_features), keyed by account,
+region, resource type, resource id, metric and the check's collected_at time.
+Documents expire after MONGODB_UTILISATION_RETENTION_DAYS through a TTL index
+on collected_at.
+
+ Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+ Unauthorized copying of this file, via any medium is strictly prohibited
+ Proprietary and confidential
+ See file LICENSE.txt for full license details.
+"""
+
+import logging
+import math
+
+from pymongo import ASCENDING, DESCENDING
+
+from repositories.mongo_db_service import bulk_upsert, get_database
+from utils.env_config import DB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "utilisation_metrics"
+
+
+def get_collection():
+    """
+    Returns:
+        Collection: The utilisation metrics collection.
+    """
+    return get_database()[COLLECTION_NAME]
+
+
+def create_index():
+    """
+    Creates the metric key, the (account, region, type, collected_at) lookup
+    index and the retention TTL index.
+    """
+    collection = get_collection()
+    collection.create_index(
+        [("account", ASCENDING), ("region", ASCENDING), ("type", ASCENDING),
+         ("resource_id", ASCENDING), ("metric", ASCENDING), ("collected_at", ASCENDING)],
+        unique=True, name="metric_key")
+    collection.create_index(
+        [("account", ASCENDING), ("region", ASCENDING), ("type", ASCENDING),
+         ("collected_at", DESCENDING)],
+        name="account_region_type_collected_at")
+    collection.create_index(
+        "collected_at", name="collected_at_ttl",
+        expireAfterSeconds=DB_CONFIG.MONGODB_UTILISATION_RETENTION_DAYS * 24 * 60 * 60)
+
+
+def upsert_metrics(account, region, resource_type, metric, resource_ids, features,
+                   collected_at):
+    """
+    Stores the metric features of one utilisation check.
+
+    Args:
+        account (str): Account id.
+        region (str): Region name.
+        resource_type (str): Resource type, e.g. "ec2" or "rds".
+        metric (str): CloudWatch metric name, e.g. "CPUUtilization".
+        resource_ids (List[str]): Resource ids, aligned with the features.
+        features (Dict[str, Sequence[float]]): Feature values per resource;
+            NaN values are stored as None.
+        collected_at (datetime): Time of the check.
+
+    Returns:
+        int: The number of documents inserted or modified.
+    """
+    def value(number):
+        number = float(number)
+        return None if math.isnan(number) else number
+
+    return bulk_upsert(get_collection(), (
+        ({"account": account, "region": region, "type": resource_type,
+          "resource_id": resource_id, "metric": metric, "collected_at": collected_at},
+         {name: value(values[i]) for name, values in features.items()})
+        for i, resource_id in enumerate(resource_ids)))
@@ -3,9 +3,11 @@ import json
 import boto3
 from flask import Blueprint, request, Response, jsonify
 from botocore.exceptions import ClientError
-from gevent import joinall, spawn
+from gevent import spawn
+from utils.gevent_util import gevent_join
 from datetime import datetime
 
+from services.response_cache_service import cached_response
 from services.alerts_service import check_spend_threshold, get_idle_ec2_instances, get_s3_buckets_without_lifecycle, get_ecr_repos_without_lifecycle, get_budget_vs_actual, get_unencrypted_s3_buckets, get_unrestricted_security_groups
 
 
@@ -23,6 +25,7 @@ alerts_blueprint = Blueprint('alerts', __name__)
 
 
 @alerts_blueprint.route("/alerts/ecr/no-lifecycle", methods=["GET"])
+@cached_response(get_ecr_repos_without_lifecycle)
 def ecr_no_lifecycle():
     result = get_ecr_repos_without_lifecycle()
     return {"repos_without_lifecycle": result}
@@ -33,12 +36,14 @@ def ecr_no_lifecycle():
 # ----------------------------
 
 @alerts_blueprint.route("/alerts/security/unrestricted-sgs", methods=["GET"])
+@cached_response(get_unrestricted_security_groups)
 def unrestricted_sgs():
     result = get_unrestricted_security_groups()
     return {"unrestricted_security_groups": result}
 
 
 @alerts_blueprint.route("/alerts/security/unencrypted-buckets", methods=["GET"])
+@cached_response(get_unencrypted_s3_buckets)
 def unencrypted_buckets():
     result = get_unencrypted_s3_buckets()
     return {"unencrypted_buckets": result}
@@ -49,6 +54,7 @@ def unencrypted_buckets():
 # ----------------------------
 
 @alerts_blueprint.route("/alerts/budgets", methods=["GET"])
+@cached_response(get_budget_vs_actual)
 def budget_vs_actual():
     result = get_budget_vs_actual()
     return {"budgets": result}
@@ -83,6 +89,7 @@ def spend_threshold():
 
 
 @alerts_blueprint.route("/alerts/idle-ec2", methods=["GET"])
+@cached_response(get_idle_ec2_instances)
 def idle_ec2():
     """
     Params:
@@ -119,7 +126,7 @@ def inventory_summary():
         spawn(get_budget_vs_actual),
         spawn(check_spend_threshold, threshold_usd=threshold, start_date=start_date, end_date=end_date),
     ]
-    joinall(greenlets)
+    gevent_join(greenlets)
 
     summary = {
         "idle_ec2_instances": greenlets[0].value,
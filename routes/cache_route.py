@@ -0,0 +1,40 @@
+from flask import Blueprint, Response, abort, request
+
+from services import cache_service
+
+
+cache_blueprint = Blueprint('cache', __name__)
+
+
+@cache_blueprint.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    if request.args.get("format") == "prometheus":
+        return cache_metrics()
+    return cache_service.get_stats()
+
+
+@cache_blueprint.route("/cache/metrics", methods=["GET"])
+def cache_metrics():
+    return Response(cache_service.get_prometheus_metrics(),
+                    mimetype="text/plain; version=0.0.4")
+
+
+@cache_blueprint.route("/cache/invalidate", methods=["POST"])
+def cache_invalidate():
+    namespaces = _namespaces()
+    removed = {namespace: cache_service.invalidate_namespace(namespace)
+               for namespace in namespaces}
+    return {"invalidated": removed}
+
+
+@cache_blueprint.route("/cache/prewarm", methods=["POST"])
+def cache_prewarm():
+    return {"prewarm": cache_service.prewarm(_namespaces())}
+
+
+def _namespaces():
+    namespaces = [ns.strip() for ns in request.args.get("namespace", "").split(",")
+                  if ns.strip()]
+    if not namespaces:
+        abort(400, "Query parameter 'namespace' is required.")
+    return namespaces
@@ -3,8 +3,10 @@ import json
 import boto3
 from flask import Blueprint, jsonify, request, Response
 from botocore.exceptions import ClientError
-from services.cost_service import cost_by_service, cost_by_tag, forecasted_spend, get_cost_anomalies, get_cost_data, get_daily_cost_trend, iso_date, total_cost_trend
+from services.response_cache_service import cached_response
+from services.cost_service import cost_by_service, cost_by_tag, cost_deltas_by_service, forecasted_spend, get_cost_anomalies, get_cost_data, get_local_cost_anomalies, get_daily_cost_trend, iso_date, local_forecasted_spend, total_cost_trend
 from datetime import date, datetime, timedelta
+from utils.env_config import CACHE_CONFIG
 
 cost_blueprint = Blueprint('cost', __name__, url_prefix='/cost')
 
@@ -29,6 +31,7 @@ def parse_dates():
 
 
 @cost_blueprint.route("/total-cost", methods=["GET"])  # ✅
+@cached_response(total_cost_trend)
 def api_total_spend():
     """Total spend between start and end (compares previous period of same length)."""
     start, end = parse_dates()
@@ -47,6 +50,7 @@ def api_total_spend():
 
 
 @cost_blueprint.route("/cost_breakdown", methods=["GET"])  # ✅
+@cached_response(cost_by_service)
 def api_cost_breakdown():
     """Cost breakdown by AWS service for given dates. Optional top_n."""
     start, end = parse_dates()
@@ -58,7 +62,19 @@ def api_cost_breakdown():
     return data
 
 
+@cost_blueprint.route("/service_deltas", methods=["GET"])
+@cached_response(cost_deltas_by_service)
+def api_service_deltas():
+    """Per-service change against the previous period of the same length. Optional top_n."""
+    start, end = parse_dates()
+    top_n = request.args.get("top_n", default=10, type=int)
+
+    data = cost_deltas_by_service(iso_date(start), iso_date(end), top_n=top_n)
+    return jsonify(data)
+
+
 @cost_blueprint.route("/team_spend", methods=["GET"])  # Cant be used currently
+@cached_response(cost_by_tag)
 def api_team_spend():
     """Cost breakdown by team/project (tag) for given dates. Requires ?tag_key=Team."""
     start, end = parse_dates()
@@ -71,6 +87,7 @@ def api_team_spend():
 
 
 @cost_blueprint.route("/anomalies", methods=["GET"])  # Cant be used currently
+@cached_response(get_cost_anomalies)
 def api_anomalies():
     """Fetch anomalies in given period (default last 30 days)."""
     start, end = parse_dates()
@@ -81,7 +98,22 @@ def api_anomalies():
     return jsonify(data)
 
 
+@cost_blueprint.route("/anomalies/local", methods=["GET"])
+@cached_response(get_local_cost_anomalies)
+def api_local_anomalies():
+    """Per-service anomalies detected locally from daily costs (default last 30 days)."""
+    start, end = parse_dates()
+    metric = request.args.get("metric", default="UnblendedCost")
+    if metric not in CACHE_CONFIG.CE_QUERY_METRICS:
+        return jsonify({"error": f"Unsupported metric: {metric}. "
+                                 f"Use one of {', '.join(CACHE_CONFIG.CE_QUERY_METRICS)}."}), 400
+
+    data = get_local_cost_anomalies(iso_date(start), iso_date(end), metric=metric)
+    return jsonify(data)
+
+
 @cost_blueprint.route("/forecast", methods=["GET"])  # ✅
+@cached_response(forecasted_spend)
 def api_forecast():
     """Forecast spend for the given date range."""
     start, end = parse_dates()
@@ -90,7 +122,30 @@ def api_forecast():
     return data
 
 
+@cost_blueprint.route("/forecast/local", methods=["GET"])
+@cached_response(local_forecasted_spend)
+def api_local_forecast():
+    """Forecast spend locally (default next 30 days). Optional granularity, by_service, cross_check."""
+    if request.args.get("start") and request.args.get("end"):
+        start, end = parse_dates()
+    else:
+        start = date.today()
+        end = start + timedelta(days=30)
+    granularity = request.args.get("granularity", default="DAILY").upper()
+    by_service = request.args.get("by_service", default="false").lower() == "true"
+    cross_check = request.args.get("cross_check", default="false").lower() == "true"
+
+    try:
+        data = local_forecasted_spend(iso_date(start), iso_date(end), metric='UNBLENDED_COST',
+                                      granularity=granularity, by_service=by_service,
+                                      cross_check=cross_check)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(data)
+
+
 @cost_blueprint.route("/daily-cost", methods=["GET"])  # ✅
+@cached_response(get_daily_cost_trend)
 def daily_cost_trend():
     try:
         year = int(request.args.get("year"))
@@ -1,23 +1,32 @@
 from decimal import Decimal
 import json
+import logging
 import boto3
 from flask import Blueprint, request, Response, jsonify
 from botocore.exceptions import ClientError
+from pymongo.errors import PyMongoError
+from services import snapshot_store_service
+from services.account_service import resolve_accounts, scan
+from services.response_cache_service import cached_response
 from services.inventory_service import list_ec2_instances, list_ebs_volumes, list_lambda_functions, list_rds_instances, list_s3_buckets
-from gevent import joinall, spawn
+from gevent import spawn
+from utils.gevent_util import gevent_join
 
+logger = logging.getLogger(__name__)
 
 inventory_blueprint = Blueprint('inventory', __name__)
 
 
 @inventory_blueprint.route("/ec2", methods=["GET"])
+@cached_response(list_ec2_instances)
 def list_ec2():
-    return list_ec2_instances()
+    return jsonify(scan(list_ec2_instances, request.args))
 
 
 @inventory_blueprint.route("/ebs", methods=["GET"])
+@cached_response(list_ebs_volumes)
 def list_ebs():
-    return list_ebs_volumes()
+    return jsonify(scan(list_ebs_volumes, request.args))
 
 
 # @inventory_blueprint.route("/s3", methods=["GET"])
@@ -26,27 +35,55 @@ def list_ebs():
 
 
 @inventory_blueprint.route("/lambda", methods=["GET"])
+@cached_response(list_lambda_functions)
 def list_lambda():
-    return list_lambda_functions()
+    return jsonify(scan(list_lambda_functions, request.args))
 
 
 @inventory_blueprint.route("/rds", methods=["GET"])
+@cached_response(list_rds_instances)
 def list_rds():
-    return list_rds_instances()
+    return jsonify(scan(list_rds_instances, request.args))
+
+
+@inventory_blueprint.route("/inventory/snapshot", methods=["GET"])
+def inventory_snapshot():
+    """Latest stored inventory of ?type=ec2|ebs|rds|lambda|s3 from MongoDB. Optional fields, region, account."""
+    if not snapshot_store_service.is_enabled():
+        return jsonify({"error": "Inventory snapshots are not enabled."}), 404
+    resource_type = request.args.get("type")
+    if resource_type not in snapshot_store_service.INVENTORY_TYPES:
+        return jsonify({"error": "Query parameter 'type' must be one of: "
+                                 f"{', '.join(snapshot_store_service.INVENTORY_TYPES)}."}), 400
+    fields = [field.strip() for field in request.args.get("fields", "").split(",")
+              if field.strip()]
+    region = request.args.get("region")
+    if resource_type == "s3":
+        region = snapshot_store_service.GLOBAL_REGION
+    try:
+        data = snapshot_store_service.get_inventory(
+            resource_type, region, request.args.get("account"), fields or None)
+    except PyMongoError as e:
+        logger.error(f"Reading the {resource_type} inventory snapshot failed: {e}")
+        return jsonify({"error": "Inventory snapshots are unavailable."}), 503
+    return jsonify(data)
 
 
 @inventory_blueprint.route('/inventory/summary', methods=['GET'])
+@cached_response(
+    list_ec2_instances, list_ebs_volumes, list_lambda_functions, list_rds_instances)
 def inventory_summary():
     # start_dt, end_dt, err = parse_dates()
+    if request.args.get("accounts"):
+        resolve_accounts(request.args["accounts"])
 
-    region = request.args.get('region', 'us-east-1')
     greenlets = [
-        spawn(list_ec2_instances),
-        spawn(list_ebs_volumes),
-        spawn(list_lambda_functions),
-        spawn(list_rds_instances),
+        spawn(scan, list_ec2_instances, request.args),
+        spawn(scan, list_ebs_volumes, request.args),
+        spawn(scan, list_lambda_functions, request.args),
+        spawn(scan, list_rds_instances, request.args),
     ]
-    joinall(greenlets)
+    gevent_join(greenlets)
 
     summary = {
         "ec2_instances": greenlets[0].value,
@@ -1,7 +1,10 @@
 from flask import Blueprint, Flask, request, jsonify
 from datetime import datetime, timedelta
 
-from gevent import joinall, spawn
+from gevent import spawn
+from utils.gevent_util import gevent_join
+from services.region_service import for_regions
+from services.response_cache_service import cached_response
 from services.recommend_service import (
     get_ec2_rightsizing_recommendations,
     get_ebs_rightsizing_recommendations,
@@ -21,13 +24,17 @@ recommend_blueprint = Blueprint('recommend', __name__)
 
 
 @recommend_blueprint.route('/recommend/rightsizing-ec2', methods=['GET'])
+@cached_response(get_ec2_rightsizing_recommendations)
 def ec2_rightsizing():
-    return jsonify(get_ec2_rightsizing_recommendations())
+    return jsonify(for_regions(get_ec2_rightsizing_recommendations,
+                               request.args.get('regions'), request.args.get('region')))
 
 
 @recommend_blueprint.route('/recommend/rightsizing-ebs', methods=['GET'])
+@cached_response(get_ebs_rightsizing_recommendations)
 def ebs_rightsizing():
-    return jsonify(get_ebs_rightsizing_recommendations())
+    return jsonify(for_regions(get_ebs_rightsizing_recommendations,
+                               request.args.get('regions'), request.args.get('region')))
 
 # ----------------------------
 # Cleanup
@@ -35,21 +42,24 @@ def ebs_rightsizing():
 
 
 @recommend_blueprint.route('/recommend/unattached-ebs', methods=['GET'])
+@cached_response(get_unattached_ebs_volumes)
 def unattached_ebs():
-    region = request.args.get('region', 'us-east-1')
-    return jsonify(get_unattached_ebs_volumes(region))
+    return jsonify(for_regions(get_unattached_ebs_volumes,
+                               request.args.get('regions'), request.args.get('region')))
 
 
 @recommend_blueprint.route('/recommend/cleanup/unassociated-eips', methods=['GET'])
+@cached_response(get_unassociated_elastic_ips)
 def unassociated_eips():
-    region = request.args.get('region', 'us-east-1')
-    return jsonify(get_unassociated_elastic_ips(region))
+    return jsonify(for_regions(get_unassociated_elastic_ips,
+                               request.args.get('regions'), request.args.get('region')))
 
 
 @recommend_blueprint.route('/recommend/inactive-nats', methods=['GET'])
+@cached_response(get_inactive_nat_gateways)
 def inactive_nats():
-    region = request.args.get('region', 'us-east-1')
-    return jsonify(get_inactive_nat_gateways(region))
+    return jsonify(for_regions(get_inactive_nat_gateways,
+                               request.args.get('regions'), request.args.get('region')))
 
 # ----------------------------
 # Tagging Gaps
@@ -57,9 +67,10 @@ def inactive_nats():
 
 
 @recommend_blueprint.route('/recommend/untagged-ec2', methods=['GET'])
+@cached_response(get_ec2_instances_without_tags)
 def untagged_ec2():
-    region = request.args.get('region', 'us-east-1')
-    return jsonify(get_ec2_instances_without_tags(region))
+    return jsonify(for_regions(get_ec2_instances_without_tags,
+                               request.args.get('regions'), request.args.get('region')))
 
 # ----------------------------
 # Cost Explorer (RI & SP)
@@ -67,11 +78,13 @@ def untagged_ec2():
 
 
 @recommend_blueprint.route('/recommend/savings-ri-opportunities', methods=['GET'])
+@cached_response(get_reserved_instance_savings_opportunities)
 def ri_opportunities():
     return jsonify(get_reserved_instance_savings_opportunities())
 
 
 @recommend_blueprint.route('/recommend/savings-sp-opportunities', methods=['GET'])
+@cached_response(get_savings_plans_opportunities)
 def sp_opportunities():
     return jsonify(get_savings_plans_opportunities())
 
@@ -81,19 +94,30 @@ def sp_opportunities():
 
 
 @recommend_blueprint.route('/optimization/summary', methods=['GET'])
+@cached_response(
+    get_ec2_rightsizing_recommendations,
+    get_ebs_rightsizing_recommendations,
+    get_unattached_ebs_volumes,
+    get_unassociated_elastic_ips,
+    get_inactive_nat_gateways,
+    get_ec2_instances_without_tags,
+    get_reserved_instance_savings_opportunities,
+    get_savings_plans_opportunities
+)
 def optimization_summary():
-    region = request.args.get('region', 'us-east-1')
+    regions = request.args.get('regions')
+    region = request.args.get('region')
     greenlets = [
-        spawn(get_ec2_rightsizing_recommendations),
-        spawn(get_ebs_rightsizing_recommendations),
-        spawn(get_unattached_ebs_volumes, region),
-        spawn(get_unassociated_elastic_ips, region),
-        spawn(get_inactive_nat_gateways, region),
-        spawn(get_ec2_instances_without_tags, region),
+        spawn(for_regions, get_ec2_rightsizing_recommendations, regions, region),
+        spawn(for_regions, get_ebs_rightsizing_recommendations, regions, region),
+        spawn(for_regions, get_unattached_ebs_volumes, regions, region),
+        spawn(for_regions, get_unassociated_elastic_ips, regions, region),
+        spawn(for_regions, get_inactive_nat_gateways, regions, region),
+        spawn(for_regions, get_ec2_instances_without_tags, regions, region),
         spawn(get_reserved_instance_savings_opportunities),
         spawn(get_savings_plans_opportunities),
     ]
-    joinall(greenlets)
+    gevent_join(greenlets)
 
     summary = {
         "rightsizing": {
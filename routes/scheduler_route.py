@@ -0,0 +1,23 @@
+from flask import Blueprint, abort, request
+
+from services import scheduler_service
+
+
+scheduler_blueprint = Blueprint('scheduler', __name__)
+
+
+@scheduler_blueprint.route("/scheduler/status", methods=["GET"])
+def scheduler_status():
+    return scheduler_service.get_status()
+
+
+@scheduler_blueprint.route("/scheduler/run", methods=["POST"])
+def scheduler_run():
+    job = request.args.get("job", "")
+    if job not in scheduler_service.jobs:
+        abort(400, f"Query parameter 'job' must be one of: {', '.join(scheduler_service.jobs)}.")
+    try:
+        status = scheduler_service.request_run(job)
+    except RuntimeError as e:
+        abort(404, str(e))
+    return {"run": {job: status}}
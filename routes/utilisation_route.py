@@ -1,7 +1,10 @@
 from flask import Blueprint, Flask, request, jsonify
 from datetime import datetime, timedelta
 
-from gevent import joinall, spawn
+from gevent import spawn
+from utils.gevent_util import gevent_join
+from services.account_service import resolve_accounts, scan
+from services.response_cache_service import cached_response
 from services.utilisation_service import (
     get_stopped_ec2_instances,
     get_unattached_ebs_volumes,
@@ -31,94 +34,113 @@ def parse_dates():
 
 
 @utilisation_blueprint.route("/idle/ec2", methods=["GET"])
+@cached_response(get_stopped_ec2_instances)
 def idle_ec2():
     start_dt, end_dt, err = parse_dates()
     if err:
         return jsonify({"error": err}), 400
-    instances = get_stopped_ec2_instances()
+    instances = scan(get_stopped_ec2_instances, request.args)
     return jsonify({"stopped_ec2_instances": instances})
 
 
 @utilisation_blueprint.route("/idle/ebs", methods=["GET"])
+@cached_response(get_unattached_ebs_volumes)
 def idle_ebs():
     start_dt, end_dt, err = parse_dates()
     if err:
         return jsonify({"error": err}), 400
-    volumes = get_unattached_ebs_volumes()
+    volumes = scan(get_unattached_ebs_volumes, request.args)
     return jsonify({"unattached_ebs_volumes": volumes})
 
 
 @utilisation_blueprint.route("/idle/rds", methods=["GET"])
+@cached_response(get_idle_rds_instances)
 def idle_rds():
     start_dt, end_dt, err = parse_dates()
     if err:
         return jsonify({"error": err}), 400
-    idle = get_idle_rds_instances()
+    idle = scan(get_idle_rds_instances, request.args)
     return jsonify({"idle_rds_instances": idle})
 
 
 @utilisation_blueprint.route("/idle/redshift", methods=["GET"])
+@cached_response(get_underutilized_redshift)
 def idle_redshift():
     start_dt, end_dt, err = parse_dates()
     if err:
         return jsonify({"error": err}), 400
-    underutilized = get_underutilized_redshift()
+    underutilized = scan(get_underutilized_redshift, request.args)
     return jsonify({"underutilized_redshift_clusters": underutilized})
 
 
 @utilisation_blueprint.route("/idle/loadbalancers", methods=["GET"])
+@cached_response(get_idle_load_balancers)
 def idle_lbs():
     start_dt, end_dt, err = parse_dates()
     if err:
         return jsonify({"error": err}), 400
-    idle = get_idle_load_balancers()
+    idle = scan(get_idle_load_balancers, request.args)
     return jsonify({"idle_load_balancers": idle})
 
 
 @utilisation_blueprint.route("/overprovisioned/ec2", methods=["GET"])
+@cached_response(get_overprovisioned_ec2)
 def overprovisioned_ec2():
     start_dt, end_dt, err = parse_dates()
     if err:
         return jsonify({"error": err}), 400
-    over = get_overprovisioned_ec2()
+    over = scan(get_overprovisioned_ec2, request.args)
     return jsonify({"overprovisioned_ec2": over})
 
 
 @utilisation_blueprint.route("/overprovisioned/lambda", methods=["GET"])
+@cached_response(get_overprovisioned_lambdas)
 def overprovisioned_lambda():
     start_dt, end_dt, err = parse_dates()
     if err:
         return jsonify({"error": err}), 400
-    over = get_overprovisioned_lambdas()
+    over = scan(get_overprovisioned_lambdas, request.args)
     return jsonify({"overprovisioned_lambda": over})
 
 
 @utilisation_blueprint.route("/overprovisioned/ebs", methods=["GET"])
+@cached_response(get_overprovisioned_ebs)
 def overprovisioned_ebs():
     start_dt, end_dt, err = parse_dates()
     if err:
         return jsonify({"error": err}), 400
-    over = get_overprovisioned_ebs()
+    over = scan(get_overprovisioned_ebs, request.args)
     return jsonify({"overprovisioned_ebs": over})
 
 
 @utilisation_blueprint.route('/utilisation/summary', methods=['GET'])
+@cached_response(
+    get_stopped_ec2_instances,
+    get_unattached_ebs_volumes,
+    get_idle_rds_instances,
+    get_underutilized_redshift,
+    get_idle_load_balancers,
+    get_overprovisioned_ec2,
+    get_overprovisioned_lambdas,
+    get_overprovisioned_ebs
+)
 def optimization_summary():
     start_dt, end_dt, err = parse_dates()
+    if request.args.get("accounts"):
+        resolve_accounts(request.args["accounts"])
 
-    region = request.args.get('region', 'us-east-1')
     greenlets = [
-        spawn(get_stopped_ec2_instances),
-        spawn(get_unattached_ebs_volumes),
-        spawn(get_idle_rds_instances),
-        spawn(get_underutilized_redshift),
-        spawn(get_idle_load_balancers),
-        spawn(get_overprovisioned_ec2),
-        spawn(get_overprovisioned_lambdas),
-        spawn(get_overprovisioned_ebs),
+        spawn(scan, get_stopped_ec2_instances, request.args),
+        spawn(scan, get_unattached_ebs_volumes, request.args),
+        spawn(scan, get_idle_rds_instances, request.args),
+        spawn(scan, get_underutilized_redshift, request.args),
+        spawn(scan, get_idle_load_balancers, request.args),
+        spawn(scan, get_overprovisioned_ec2, request.args),
+        spawn(scan, get_overprovisioned_lambdas, request.args),
+        spawn(scan, get_overprovisioned_ebs, request.args),
 
     ]
-    joinall(greenlets)
+    gevent_join(greenlets)
 
     summary = {
         "stopped_ec2_instances": greenlets[0].value,
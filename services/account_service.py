@@ -0,0 +1,119 @@
+"""
+Module for running scans across the member accounts of the organization.
+
+Service functions that take an account argument build their clients with
+get_boto_client(service, region, account), which assumes AWS_ASSUME_ROLE_NAME
+in that account and caches the temporary credentials until shortly before
+they expire. for_accounts() runs such a function for every requested account
+on a pool of AWS_ACCOUNT_POOL_SIZE greenlets, each account fanning out over
+the requested regions through region_service, and merges the results into one
+list whose items carry an "account" field.
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import logging
+from typing import Any, Callable, List, Mapping, Optional
+
+from werkzeug.exceptions import BadRequest
+
+from services import cache_service, region_service
+from utils.boto3_util import get_account_id, get_boto_client, paginate
+from utils.env_config import AWS_CONFIG
+from utils.gevent_util import gevent_map
+
+logger = logging.getLogger(__name__)
+
+ALL_ACCOUNTS = "all"
+
+
+@cache_service.cached()
+def get_accounts() -> List[str]:
+    """
+    Returns the accounts that may be scanned: AWS_ACCOUNTS if set, otherwise
+    every active account of the organization.
+    """
+    if AWS_CONFIG.AWS_ACCOUNTS:
+        return AWS_CONFIG.AWS_ACCOUNTS
+    organizations = get_boto_client("organizations")
+    return sorted(account["Id"]
+                  for account in paginate(organizations, "list_accounts", "Accounts[]")
+                  if account["Status"] == "ACTIVE")
+
+
+def resolve_accounts(accounts: str) -> List[str]:
+    """
+    Parses an accounts argument: "all" or a comma separated list of account
+    ids, each of which must be one of get_accounts().
+    """
+    allowed = get_accounts()
+    if accounts.strip().lower() == ALL_ACCOUNTS:
+        return allowed
+    requested = [account.strip() for account in accounts.split(",")
+                 if account.strip()]
+    unknown = [account for account in requested
+               if account not in allowed and account != get_account_id()]
+    if unknown:
+        raise BadRequest(f"Unknown accounts: {', '.join(unknown)}")
+    return requested
+
+
+def for_accounts(
+    func: Callable[..., Any],
+    accounts: Optional[str] = None,
+    regions: Optional[str] = None,
+    region: Optional[str] = None,
+    **kwargs: Any
+) -> Any:
+    """
+    Calls a function taking region and account arguments for the requested
+    accounts and regions.
+
+    :param accounts: Optional[str]
+        "all" or a comma separated list of account ids. If empty, only the
+        default credentials are scanned and region_service.for_regions()'s
+        result is returned unchanged.
+    :param regions: Optional[str]
+        Regions to scan in each account, see region_service.for_regions().
+    :param region: Optional[str]
+        Single region to scan when regions is empty.
+    :return: Any
+        With accounts, a merged list of items tagged with their account.
+        Accounts that fail contribute an {"account", "error"} item.
+    """
+    if not accounts:
+        return region_service.for_regions(func, regions, region, **kwargs)
+
+    account_list = resolve_accounts(accounts)
+    results = gevent_map(
+        lambda account: region_service.for_regions(
+            func, regions, region, account=_account_argument(account), **kwargs),
+        account_list,
+        concurrency=AWS_CONFIG.AWS_ACCOUNT_POOL_SIZE,
+        return_exceptions=True)
+    merged = []
+    for account, result in zip(account_list, results):
+        if isinstance(result, BaseException):
+            logger.error(f"{func.__name__} failed in account {account}: {result!r}")
+            merged.append({"account": account, "error": str(result) or repr(result)})
+        else:
+            merged.extend(region_service.tag_results(result, account=account))
+    return merged
+
+
+def scan(func: Callable[..., Any], args: Mapping[str, str], **kwargs: Any) -> Any:
+    """
+    Calls for_accounts() with the accounts, regions and region query arguments.
+    """
+    return for_accounts(func, args.get("accounts"), args.get("regions"),
+                        args.get("region"), **kwargs)
+
+
+def _account_argument(account: str) -> Optional[str]:
+    """
+    The default credentials' own account is scanned without assuming a role.
+    """
+    return None if account == get_account_id() else account
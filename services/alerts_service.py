@@ -1,84 +1,55 @@
 from datetime import datetime, timedelta
-import boto3
 import logging
 
-from services import cache_service
+import numpy as np
+
+from services import (cache_service, ce_query_service, metrics_service,
+                      resource_snapshot_service, utilisation_classifier_service)
+from services.inventory_service import get_s3_bucket_details
+from utils.boto3_util import get_account_id, get_boto_client, paginate
+from utils.gevent_util import gevent_map
 
 logger = logging.getLogger(__name__)
-s3 = boto3.client("s3", region_name='us-east-1')
-ecr = boto3.client("ecr", region_name='us-east-1')
-ec2 = boto3.client("ec2", region_name='us-east-1')
-budgets = boto3.client("budgets")
-ce = boto3.client("ce", region_name='us-east-1')
-cw = boto3.client("cloudwatch", region_name='us-east-1')
 # ----------------------------
 # 1. Resources without lifecycle policies
 # ----------------------------
 
 
+@cache_service.cached("s3_buckets_without_lifecycle", depends_on=[get_s3_bucket_details])
 def get_s3_buckets_without_lifecycle():
-    # Create a unique cache key based on input parameters
-    cache_key = f"s3_buckets_without_lifecycle"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
     """Return list of S3 buckets without lifecycle policy."""
-    buckets = s3.list_buckets()["Buckets"]
-    no_lifecycle = []
-    for b in buckets:
-        try:
-            s3.get_bucket_lifecycle_configuration(Bucket=b["Name"])
-        except s3.exceptions.NoSuchLifecycleConfiguration:
-            no_lifecycle.append(b["Name"])
-
-    # Store result in cache
-    cache_service.set(cache_key, no_lifecycle)
-    logger.info("Cached result for key: %s", cache_key)
-    return no_lifecycle
+    return [b["name"] for b in get_s3_bucket_details()
+            if b["lifecycle"] is None
+            and not {"lifecycle", "bucket"} & b["errors"].keys()]
 
 
+@cache_service.cached("ecr_repos_without_lifecycle")
 def get_ecr_repos_without_lifecycle():
-    # Create a unique cache key based on input parameters
-    cache_key = f"ecr_repos_without_lifecycle"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
     """Return list of ECR repos without lifecycle policy."""
-    repos = ecr.describe_repositories()["repositories"]
-    no_policy = []
-    for r in repos:
+    ecr = get_boto_client("ecr")
+    repos = [r["repositoryName"]
+             for r in paginate(ecr, "describe_repositories", "repositories[]")]
+
+    def has_no_policy(repository_name):
         try:
-            ecr.get_lifecycle_policy(repositoryName=r["repositoryName"])
+            ecr.get_lifecycle_policy(repositoryName=repository_name)
+            return False
         except ecr.exceptions.LifecyclePolicyNotFoundException:
-            no_policy.append(r["repositoryName"])
-    # Store result in cache
-    cache_service.set(cache_key, no_policy)
-    logger.info("Cached result for key: %s", cache_key)
-    return no_policy
+            return True
+
+    missing = gevent_map(has_no_policy, repos)
+    return [name for name, no_policy in zip(repos, missing) if no_policy]
 
 
 # ----------------------------
 # 2. Security / compliance overlap
 # ----------------------------
 
+@cache_service.cached("unrestricted_security_groups")
 def get_unrestricted_security_groups():
-    # Create a unique cache key based on input parameters
-    cache_key = f"unrestricted_security_groups"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return list(set(cached_result))
     """Return security groups with wide-open inbound rules (0.0.0.0/0 or ::/0)."""
-    sgs = ec2.describe_security_groups()["SecurityGroups"]
+    ec2 = get_boto_client("ec2")
+    sgs = paginate(ec2, "describe_security_groups", "SecurityGroups[]")
     open_sgs = []
     for sg in sgs:
         for perm in sg.get("IpPermissions", []):
@@ -88,58 +59,30 @@ def get_unrestricted_security_groups():
             for ipv6_range in perm.get("Ipv6Ranges", []):
                 if ipv6_range.get("CidrIpv6") == "::/0":
                     open_sgs.append(sg["GroupId"])
-    # Store result in cache
-    cache_service.set(cache_key, open_sgs)
-    logger.info("Cached result for key: %s", cache_key)
     return list(set(open_sgs))
 
 
+@cache_service.cached("unencrypted_s3_buckets", depends_on=[get_s3_bucket_details])
 def get_unencrypted_s3_buckets():
-    # Create a unique cache key based on input parameters
-    cache_key = f"unencrypted_s3_buckets"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
     """Return list of S3 buckets without encryption enabled."""
-    buckets = s3.list_buckets()["Buckets"]
-    unencrypted = []
-    for b in buckets:
-        try:
-            s3.get_bucket_encryption(Bucket=b["Name"])
-        except s3.exceptions.ClientError:
-            unencrypted.append(b["Name"])
-    # Store result in cache
-    cache_service.set(cache_key, unencrypted)
-    logger.info("Cached result for key: %s", cache_key)
-    return unencrypted
+    return [b["name"] for b in get_s3_bucket_details()
+            if b["encryption"] is None and "bucket" not in b["errors"]]
 
 
 # ----------------------------
 # 3. Budget vs Actual
 # ----------------------------
 
+@cache_service.cached("budget_vs_actual")
 def get_budget_vs_actual():
-    # Create a unique cache key based on input parameters
-    cache_key = f"budget_vs_actual"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
     """Return AWS Budgets (if set) with actual spend vs budgeted amount."""
+    budgets = get_boto_client("budgets")
     results = []
-    response = budgets.describe_budgets(
-        AccountId=boto3.client("sts", region_name='us-east-1').get_caller_identity()["Account"])
-    for budget in response.get("Budgets", []):
+    account_id = get_account_id()
+    for budget in paginate(budgets, "describe_budgets", "Budgets[]", AccountId=account_id):
         budget_name = budget["BudgetName"]
         actual = budgets.describe_budget_performance_history(
-            AccountId=boto3.client(
-                "sts", region_name='us-east-1').get_caller_identity()["Account"],
+            AccountId=account_id,
             BudgetName=budget_name
         )
         results.append({
@@ -147,9 +90,6 @@ def get_budget_vs_actual():
             "Limit": budget["BudgetLimit"]["Amount"] + " " + budget["BudgetLimit"]["Unit"],
             "ActualSpend": budget["CalculatedSpend"]["ActualSpend"]["Amount"] + " " + budget["CalculatedSpend"]["ActualSpend"]["Unit"],
         })
-    # Store result in cache
-    cache_service.set(cache_key, results)
-    logger.info("Cached result for key: %s", cache_key)
     return results
 
 
@@ -159,59 +99,33 @@ def get_budget_vs_actual():
 
 def check_spend_threshold(threshold_usd, start_date=None, end_date=None):
     """Check if spend exceeds threshold for given period."""
-
     if not start_date or not end_date:
         # default: current month
         today = datetime.utcnow()
         start_date = today.replace(day=1).strftime("%Y-%m-%d")
         end_date = today.strftime("%Y-%m-%d")
 
-    response = ce.get_cost_and_usage(
-        TimePeriod={"Start": start_date, "End": end_date},
-        Granularity="MONTHLY",
-        Metrics=["UnblendedCost"]
-    )
-
-    amount = float(response["ResultsByTime"][0]
-                   ["Total"]["UnblendedCost"]["Amount"])
+    # Answered from the local cost ledger (ce_query_service)
+    store = ce_query_service.get_cost_store(start_date, end_date)
+    amount = store.total(start_date, end_date)
     return amount > threshold_usd, amount
 
 
+@cache_service.cached("idle_ec2_instances", depends_on=[resource_snapshot_service.describe_ec2_instances])
 def get_idle_ec2_instances(idle_cpu_threshold=5, days=7):
-    # Create a unique cache key based on input parameters
-    cache_key = f"idle_ec2_instances"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
     """Return EC2 instances with very low CPU utilization (CloudWatch check)."""
-
-    instances = ec2.describe_instances()
-    idle_instances = []
-    for reservation in instances["Reservations"]:
-        for instance in reservation["Instances"]:
-            instance_id = instance["InstanceId"]
-            metrics = cw.get_metric_statistics(
-                Namespace="AWS/EC2",
-                MetricName="CPUUtilization",
-                Dimensions=[{"Name": "InstanceId", "Value": instance_id}],
-                StartTime=datetime.utcnow() - timedelta(days=days),
-                EndTime=datetime.utcnow(),
-                Period=3600,
-                Statistics=["Average"]
-            )
-            if metrics["Datapoints"]:
-                avg_cpu = sum(
-                    d["Average"] for d in metrics["Datapoints"]) / len(metrics["Datapoints"])
-                if avg_cpu < idle_cpu_threshold:
-                    idle_instances.append({
-                        "instance_id": instance_id,
-                        "avg_cpu": avg_cpu
-                    })
-    # Store result in cache
-    cache_service.set(cache_key, idle_instances)
-    logger.info("Cached result for key: %s", cache_key)
-    return idle_instances
+    cw = get_boto_client("cloudwatch")
+    instance_ids, cpu = metrics_service.get_metric_matrix(
+        cw, "AWS/EC2", "CPUUtilization", "InstanceId",
+        [instance["InstanceId"]
+         for instance in resource_snapshot_service.get_ec2_instances()],
+        stat="Average",
+        period=3600,
+        start_time=datetime.utcnow() - timedelta(days=days),
+        end_time=datetime.utcnow()
+    )
+    idle, features = utilisation_classifier_service.classify(
+        "ec2_idle", cpu, 3600,
+        conditions={"mean": ["lt", idle_cpu_threshold]})
+    return [{"instance_id": instance_ids[i], "avg_cpu": float(features["mean"][i])}
+            for i in np.flatnonzero(idle)]
@@ -1,77 +1,859 @@
-"""
-Module for cache management.
-
-Copyright Flexday Solutions LLC, Inc - All Rights Reserved
-Unauthorized copying of this file, via any medium is strictly prohibited
-Proprietary and confidential
-See file LICENSE.txt for full license details.
-"""
-
-import logging
-from typing import Any, Dict, List
-from datetime import datetime, timedelta
-logger = logging.getLogger(__name__)
-CACHE_TTL_DAYS = 7
-
-store: Dict[str, Any] = {}
-
-
-def init_cache() -> None:
-    """
-    Initializes the cache by creating an empty dictionary called "store".
-    """
-    global store
-    store = {}
-    logger.info("Cache created...")
-
-
-def clear_all() -> None:
-    """
-    Clears all elements in the cache.
-    """
-    store.clear()
-    logger.info("Cache cleared...")
-
-
-def set(key: str, value: Any) -> None:
-    """
-    Stores value in cache along with the current timestamp.
-    """
-    store[key] = {
-        "value": value,
-        "timestamp": datetime.utcnow()
-    }
-    logger.info("Set value in cache for key: %s", key)
-
-
-def get(key: str) -> Any:
-    """
-    Retrieves value from cache if it hasn't expired.
-    """
-    item = store.get(key)
-    if not item:
-        logger.info("Cache miss for key: %s", key)
-        return None
-
-    timestamp = item.get("timestamp")
-    if not timestamp or (datetime.utcnow() - timestamp) > timedelta(days=CACHE_TTL_DAYS):
-        logger.info("Cache expired for key: %s", key)
-        # Clear only if key is 'top_news'
-        if key == "top_news":
-            store.pop(key, None)  # Optional: remove expired cache
-            logger.info("Cleared expired cache for key: %s", key)
-        return None
-
-    logger.info("Cache hit for key: %s", key)
-    return item["value"]
-
-
-def get_all_keys() -> List[str]:
-    """
-    Returns a list of all the keys in the cache.
-
-    :return: List[str]
-        A list of all the keys in the cache.
-    """
-    keys = store.keys()
-    return list(keys)
\ No newline at end of file
+"""
+Module for cache management.
+
+A bounded in-process LRU cache with TTL policies, single-flight computation,
+stale-while-revalidate, negative caching and dependent namespaces, optionally
+shared through an L2 backend and warmed from a snapshot file. Services use it
+through the @cached decorator.
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import pickle
+import sys
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Union
+from datetime import datetime, timedelta
+
+import gevent
+from gevent.event import AsyncResult
+
+from constants import CACHE_TTL_POLICIES, CACHE_TTL_IMMUTABLE
+from services import cache_snapshot_service, l2_cache_service
+from utils.env_config import CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+store: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+store_bytes = 0
+
+_sweeper: Optional[gevent.Greenlet] = None
+_snapshotter: Optional[gevent.Greenlet] = None
+_l2: Optional[l2_cache_service.CacheBackend] = None
+_inflight: Dict[str, AsyncResult] = {}
+
+# Per-namespace counters: hits, misses, stale, coalesced, negative (hits on
+# negative entries), evictions, expirations
+stats: Dict[str, Counter] = defaultdict(Counter)
+# Functions decorated with @cached, by namespace
+cached_functions: Dict[str, Callable[..., Any]] = {}
+# Namespaces invalidated whenever a namespace they derive from changes
+dependents: Dict[str, Set[str]] = defaultdict(set)
+# Per-namespace count of computed values that were not cached
+uncached: Counter = Counter()
+# Consecutive negative results per key, for the negative-cache backoff
+_failures: "OrderedDict[str, int]" = OrderedDict()
+
+STAT_EVENTS = ("hits", "misses", "stale", "coalesced", "negative",
+               "evictions", "expirations")
+
+ttl_policies: Dict[str, Any] = {**CACHE_TTL_POLICIES,
+                                **CACHE_CONFIG.CACHE_TTL_POLICIES}
+
+
+def init_cache() -> None:
+    """
+    Initializes the cache by creating an LRU store warmed from the snapshot
+    file, connecting the configured L2 backend and starting the periodic sweep
+    of expired entries and snapshot writer.
+    """
+    global store, store_bytes, _sweeper, _snapshotter, _l2
+    store = OrderedDict()
+    store_bytes = 0
+    _l2 = l2_cache_service.create_backend()
+    if _sweeper is None or _sweeper.dead:
+        _sweeper = gevent.spawn(_sweep_forever)
+    if CACHE_CONFIG.CACHE_SNAPSHOT_PATH:
+        load_snapshot()
+        if _snapshotter is None or _snapshotter.dead:
+            _snapshotter = gevent.spawn(_snapshot_forever)
+    logger.info("Cache created...")
+
+
+def clear_all() -> None:
+    """
+    Clears all elements in the cache, including the shared L2 cache.
+    """
+    global store_bytes
+    store.clear()
+    store_bytes = 0
+    _l2_call("clear")
+    logger.info("Cache cleared...")
+
+
+def set(
+    key: str,
+    value: Any,
+    ttl: Optional[int] = None,
+    immutable: bool = False,
+    stale_ttl: Optional[int] = None,
+    negative: bool = False,
+    invalidate_dependents: bool = True
+) -> None:
+    """
+    Stores value in cache along with the current timestamp, evicting the least
+    recently used entries if the entry count or byte budget is exceeded. With
+    an L2 backend (l2_cache_service) the entry is also written through to it,
+    so other workers read it instead of fetching it from AWS.
+
+    :param ttl: Optional[int]
+        Lifetime in seconds. Defaults to the TTL policy matching the key.
+    :param immutable: bool
+        If True the entry never expires (e.g. data for a closed billing period).
+    :param stale_ttl: Optional[int]
+        Seconds past the TTL during which get_or_compute() may still serve the
+        value while refreshing it. Defaults to CACHE_STALE_TTL_SECONDS.
+    :param negative: bool
+        Marks the value as an error or placeholder result, see get_or_compute().
+    :param invalidate_dependents: bool
+        Whether dependent namespaces are invalidated, see add_dependent().
+    """
+    if ttl is None and not immutable:
+        ttl = get_ttl(key)
+    if stale_ttl is None:
+        stale_ttl = CACHE_CONFIG.CACHE_STALE_TTL_SECONDS
+    now = datetime.utcnow()
+    expires_at = None if immutable or ttl is None else now + \
+        timedelta(seconds=ttl)
+    item = {
+        "value": value,
+        "timestamp": now,
+        "expires_at": expires_at,
+        "stale_until": None if expires_at is None else expires_at + timedelta(seconds=stale_ttl),
+        "negative": negative
+    }
+    data = _serialize(item)
+    size = len(data) if data is not None else sys.getsizeof(value)
+    if size > CACHE_CONFIG.CACHE_MAX_BYTES:
+        logger.warning(
+            "Skipped caching key: %s, value of %d bytes exceeds the cache budget", key, size)
+        delete(key)
+        return
+
+    _store_item(key, item, size)
+    if data is not None:
+        _l2_call("set", key, data, item["stale_until"])
+    if invalidate_dependents:
+        _invalidate_dependents(get_namespace(key))
+    logger.info("Set value in cache for key: %s", key)
+
+
+def get(key: str) -> Any:
+    """
+    Retrieves value from cache if it hasn't expired. Expired entries are
+    removed on access.
+    """
+    item = _lookup(key)
+    if not item:
+        _record(key, "misses")
+        return None
+
+    if _is_expired(item, datetime.utcnow()):
+        logger.info("Cache expired for key: %s", key)
+        _record(key, "misses")
+        return None
+
+    logger.info("Cache hit for key: %s", key)
+    _record(key, "hits")
+    return item["value"]
+
+
+def get_or_compute(
+    key: str,
+    compute: Callable[[], Any],
+    ttl: Optional[int] = None,
+    immutable: bool = False,
+    cache_if: Optional[Callable[[Any], bool]] = None,
+    stale_ttl: Optional[int] = None,
+    negative_if: Optional[Callable[[Any], bool]] = None
+) -> Any:
+    """
+    Returns the cached value for key, computing and caching it on a miss.
+
+    Only one greenlet computes a given key at a time; concurrent callers wait
+    for its result (or exception) instead of repeating the upstream calls. A
+    waiter that times out after CACHE_SINGLE_FLIGHT_TIMEOUT_SECONDS computes the
+    value itself. An entry past its TTL but within its stale window is returned
+    as is while a background greenlet recomputes it.
+
+    :param compute: Callable[[], Any]
+        Zero-argument callable producing the value.
+    :param ttl: Optional[int]
+        Lifetime in seconds, see set().
+    :param immutable: bool
+        If True the entry never expires, see set().
+    :param cache_if: Optional[Callable[[Any], bool]]
+        Predicate deciding whether a computed value is cached. None values are
+        never cached.
+    :param stale_ttl: Optional[int]
+        Stale window in seconds, see set().
+    :param negative_if: Optional[Callable[[Any], bool]]
+        Predicate flagging a computed value as an error or placeholder result.
+        Such values are cached with the negative-cache backoff TTL instead of
+        ttl and are never served stale.
+    """
+    item = _lookup(key)
+    if item:
+        if not _is_expired(item, datetime.utcnow()):
+            logger.info("Cache hit for key: %s", key)
+            _record(key, "negative" if item.get("negative") else "hits")
+            return item["value"]
+        logger.info("Serving stale value for key: %s", key)
+        _record(key, "stale")
+        if key not in _inflight:
+            _inflight[key] = AsyncResult()
+            gevent.spawn(_refresh, key, compute, ttl,
+                         immutable, cache_if, stale_ttl, negative_if, previous=item)
+        return item["value"]
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        logger.info("Waiting on in-flight computation for key: %s", key)
+        _record(key, "coalesced")
+        try:
+            return pending.get(timeout=CACHE_CONFIG.CACHE_SINGLE_FLIGHT_TIMEOUT_SECONDS)
+        except gevent.Timeout:
+            logger.warning(
+                "Timed out waiting on in-flight computation for key: %s", key)
+            return compute()
+
+    _record(key, "misses")
+    _inflight[key] = AsyncResult()
+    return _compute_and_set(key, compute, ttl, immutable, cache_if, stale_ttl,
+                            negative_if)
+
+
+def recompute(
+    key: str,
+    compute: Callable[[], Any],
+    ttl: Optional[int] = None,
+    immutable: bool = False,
+    cache_if: Optional[Callable[[Any], bool]] = None,
+    stale_ttl: Optional[int] = None,
+    negative_if: Optional[Callable[[Any], bool]] = None
+) -> Any:
+    """
+    Computes the value for key and replaces the cached one, which keeps being
+    served until then. If the new value equals the cached one, dependent
+    namespaces are left intact. Arguments are as for get_or_compute().
+    """
+    pending = _inflight.get(key)
+    if pending is not None:
+        return pending.get(timeout=CACHE_CONFIG.CACHE_SINGLE_FLIGHT_TIMEOUT_SECONDS)
+    _inflight[key] = AsyncResult()
+    return _compute_and_set(key, compute, ttl, immutable, cache_if, stale_ttl,
+                            negative_if, previous=_lookup(key))
+
+
+def cached(
+    namespace: Optional[str] = None,
+    ttl: Optional[int] = None,
+    immutable: Union[bool, Callable[..., bool]] = False,
+    cache_if: Optional[Callable[[Any], bool]] = None,
+    stale_ttl: Optional[int] = None,
+    negative_if: Optional[Callable[[Any], bool]] = None,
+    depends_on: Sequence[Union[str, Callable[..., Any]]] = ()
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator caching a function's results through get_or_compute().
+
+    The cache key is the namespace followed by a hash of the full call
+    signature with defaults applied, so calls with different arguments never
+    share an entry and calls spelled differently (positional vs keyword) do.
+
+    :param namespace: Optional[str]
+        Key prefix; defaults to the function name. TTL policies match on it.
+        Namespaces must be unique across cached functions.
+    :param ttl: Optional[int]
+        Lifetime in seconds; defaults to the policy for the namespace.
+    :param immutable: Union[bool, Callable[..., bool]]
+        True, or a predicate called with the function's arguments, to cache
+        the result without expiry (e.g. for closed billing periods).
+    :param cache_if: Optional[Callable[[Any], bool]]
+        Predicate deciding whether a result is cached.
+    :param stale_ttl: Optional[int]
+        Stale-while-revalidate window in seconds, see set().
+    :param negative_if: Optional[Callable[[Any], bool]]
+        Predicate flagging error or placeholder results for negative caching,
+        see get_or_compute().
+    :param depends_on: Sequence[Union[str, Callable[..., Any]]]
+        Namespaces, or @cached functions, the results are derived from; the
+        namespace is invalidated whenever one of them changes, see
+        add_dependent().
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        name = namespace or func.__name__
+        if name in cached_functions:
+            raise ValueError(
+                f"Cache namespace {name} of {func.__module__}.{func.__qualname__} "
+                f"is already used; pass a distinct namespace")
+        for dependency in depends_on:
+            add_dependent(getattr(dependency, "cache_namespace", dependency), name)
+        signature = inspect.signature(func)
+
+        def call(lookup: Callable[..., Any], args: Any, kwargs: Any) -> Any:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            is_immutable = immutable(*bound.args, **bound.kwargs) \
+                if callable(immutable) else immutable
+            return lookup(
+                make_key(name, bound.arguments),
+                functools.partial(func, *bound.args, **bound.kwargs),
+                ttl=ttl, immutable=is_immutable, cache_if=cache_if, stale_ttl=stale_ttl,
+                negative_if=negative_if)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return call(get_or_compute, args, kwargs)
+
+        @functools.wraps(func)
+        def refresh(*args: Any, **kwargs: Any) -> Any:
+            return call(recompute, args, kwargs)
+
+        wrapper.cache_namespace = name
+        # Recomputes the entry for the given arguments, see recompute()
+        wrapper.refresh = refresh
+        cached_functions[name] = wrapper
+        return wrapper
+    return decorator
+
+
+def make_key(namespace: str, arguments: Dict[str, Any]) -> str:
+    """
+    Builds a cache key from a namespace and the normalized call arguments.
+
+    :return: str
+        "<namespace>" for calls without arguments, else "<namespace>:<sha1>".
+    """
+    if not arguments:
+        return namespace
+    payload = json.dumps(arguments, sort_keys=True,
+                         default=str, separators=(",", ":"))
+    return f"{namespace}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+
+def get_namespace(key: str) -> str:
+    """
+    Returns the namespace (prefix before the first ':') of a cache key.
+    """
+    return key.split(":", 1)[0]
+
+
+def delete(key: str) -> bool:
+    """
+    Removes a single key from the cache, including the shared L2 cache.
+
+    :return: bool
+        True if the key was present in this worker's cache.
+    """
+    _l2_call("delete", key)
+    return _discard(key)
+
+
+def add_dependent(namespace: str, dependent: str) -> None:
+    """
+    Registers a namespace derived from another one (e.g. a cached HTTP
+    response built from a service's results). Setting or invalidating any key
+    of namespace invalidates the whole dependent namespace.
+    """
+    dependents[namespace].add(dependent)
+
+
+def invalidate_namespace(namespace: str) -> int:
+    """
+    Removes every entry of a namespace and of its dependent namespaces from
+    the cache, including the shared L2 cache.
+
+    :return: int
+        The number of entries removed from this worker's cache.
+    """
+    keys = [key for key in store if get_namespace(key) == namespace]
+    for key in keys:
+        _discard(key)
+    _l2_call("delete_namespace", namespace)
+    logger.info("Invalidated %d cache entries in namespace: %s",
+                len(keys), namespace)
+    return len(keys) + _invalidate_dependents(namespace)
+
+
+def prewarm(namespaces: List[str]) -> Dict[str, str]:
+    """
+    Recomputes the default-argument entry of each @cached namespace in a
+    background greenlet, replacing any cached value.
+
+    :return: Dict[str, str]
+        "scheduled", "unknown" or "requires_arguments" per requested namespace.
+    """
+    scheduled = {}
+    for namespace in namespaces:
+        func = cached_functions.get(namespace)
+        if func is None:
+            scheduled[namespace] = "unknown"
+            continue
+        try:
+            arguments = _default_arguments(func)
+        except TypeError:
+            scheduled[namespace] = "requires_arguments"
+            continue
+        gevent.spawn(_prewarm, namespace, func, arguments)
+        scheduled[namespace] = "scheduled"
+    return scheduled
+
+
+def get_negative_state(namespaces: List[str]) -> Dict[str, datetime]:
+    """
+    Returns, for each of the given namespaces holding live negative entries in
+    this worker's cache, the latest time one of them expires.
+
+    :return: Dict[str, datetime]
+        Expiry (naive UTC) by namespace.
+    """
+    now = datetime.utcnow()
+    state: Dict[str, datetime] = {}
+    for key, item in store.items():
+        namespace = get_namespace(key)
+        if namespace in namespaces and item.get("negative") and not _is_expired(item, now):
+            state[namespace] = max(state.get(namespace, item["expires_at"]),
+                                   item["expires_at"])
+    return state
+
+
+def get_stats() -> Dict[str, Any]:
+    """
+    Returns cache statistics per namespace and in total: hit/miss counters,
+    evictions, expirations, live entries, bytes and the oldest entry's age.
+
+    :return: Dict[str, Any]
+        {"namespaces": {namespace: {...}}, "total": {...}}
+    """
+    now = datetime.utcnow()
+    namespaces: Dict[str, Dict[str, Any]] = {}
+
+    def bucket(namespace: str) -> Dict[str, Any]:
+        if namespace not in namespaces:
+            namespaces[namespace] = {**{event: 0 for event in STAT_EVENTS},
+                                     "entries": 0, "bytes": 0,
+                                     "oldest_age_seconds": None}
+        return namespaces[namespace]
+
+    for namespace, counter in stats.items():
+        bucket(namespace).update(counter)
+    for key, item in store.items():
+        entry = bucket(get_namespace(key))
+        entry["entries"] += 1
+        entry["bytes"] += item["size"]
+        age = round((now - item["timestamp"]).total_seconds(), 3)
+        entry["oldest_age_seconds"] = max(entry["oldest_age_seconds"] or 0, age)
+
+    total = {**{event: 0 for event in STAT_EVENTS},
+             "entries": len(store), "bytes": store_bytes}
+    for entry in namespaces.values():
+        for event in STAT_EVENTS:
+            total[event] += entry[event]
+        entry["hit_ratio"] = _hit_ratio(entry)
+    total["hit_ratio"] = _hit_ratio(total)
+    total["max_entries"] = CACHE_CONFIG.CACHE_MAX_ENTRIES
+    total["max_bytes"] = CACHE_CONFIG.CACHE_MAX_BYTES
+    return {"namespaces": dict(sorted(namespaces.items())), "total": total}
+
+
+def get_prometheus_metrics() -> str:
+    """
+    Renders get_stats() in the Prometheus text exposition format.
+    """
+    cache_stats = get_stats()
+    lines = []
+    for event in STAT_EVENTS:
+        name = f"cache_{event}_total"
+        lines.append(f"# TYPE {name} counter")
+        lines.extend(_prometheus_samples(name, cache_stats, event))
+    for field, name in (("entries", "cache_entries"), ("bytes", "cache_bytes"),
+                        ("oldest_age_seconds", "cache_oldest_entry_age_seconds")):
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(_prometheus_samples(name, cache_stats, field))
+    return "\n".join(lines) + "\n"
+
+
+def get_all_keys() -> List[str]:
+    """
+    Returns a list of all the keys in the cache.
+
+    :return: List[str]
+        A list of all the keys in the cache.
+    """
+    keys = store.keys()
+    return list(keys)
+
+
+def get_ttl(key: str) -> Optional[int]:
+    """
+    Resolves the TTL for a key from the policy with the longest matching
+    key prefix.
+
+    :return: Optional[int]
+        TTL in seconds, or None if the matching policy marks entries immutable.
+    """
+    matches = [prefix for prefix in ttl_policies if key.startswith(prefix)]
+    if not matches:
+        return CACHE_CONFIG.CACHE_DEFAULT_TTL_SECONDS
+    policy = ttl_policies[max(matches, key=len)]
+    if str(policy).lower() == CACHE_TTL_IMMUTABLE:
+        return None
+    return int(policy)
+
+
+def sweep_expired() -> int:
+    """
+    Removes every entry past its hard expiry from the cache.
+
+    :return: int
+        The number of entries removed.
+    """
+    now = datetime.utcnow()
+    expired = [key for key, item in store.items() if _is_dead(item, now)]
+    for key in expired:
+        _discard(key)
+        _record(key, "expirations")
+    _l2_call("sweep")
+    if expired:
+        logger.info("Swept %d expired cache entries", len(expired))
+    return len(expired)
+
+
+def _lookup(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the entry for key, including stale entries, and marks it as
+    recently used. Entries past their hard expiry are removed, and misses are
+    read through the L2 cache.
+    """
+    item = store.get(key)
+    if not item:
+        item = _l2_lookup(key)
+        if not item:
+            logger.info("Cache miss for key: %s", key)
+        return item
+
+    if _is_dead(item, datetime.utcnow()):
+        logger.info("Cache expired for key: %s", key)
+        _discard(key)
+        _record(key, "expirations")
+        return None
+
+    store.move_to_end(key)
+    return item
+
+
+def _record(key: str, event: str) -> None:
+    stats[get_namespace(key)][event] += 1
+
+
+def _invalidate_dependents(namespace: str) -> int:
+    return sum(invalidate_namespace(dependent)
+               for dependent in dependents.get(namespace, ()))
+
+
+def _hit_ratio(entry: Dict[str, Any]) -> Optional[float]:
+    """
+    Share of lookups answered from the cache, counting stale and negative
+    hits as hits.
+    """
+    served = entry["hits"] + entry["stale"] + entry["coalesced"] + entry["negative"]
+    lookups = served + entry["misses"]
+    return round(served / lookups, 4) if lookups else None
+
+
+def _prometheus_samples(name: str, cache_stats: Dict[str, Any], field: str) -> List[str]:
+    samples = []
+    for namespace, entry in cache_stats["namespaces"].items():
+        if entry[field] is not None:
+            label = namespace.replace("\\", "\\\\").replace('"', '\\"')
+            samples.append(f'{name}{{namespace="{label}"}} {entry[field]}')
+    return samples
+
+
+def _prewarm(namespace: str, func: Callable[..., Any], arguments: Dict[str, Any]) -> None:
+    """
+    Drops the default-argument entry of a namespace and recomputes it.
+    """
+    try:
+        delete(make_key(namespace, arguments))
+        func()
+        logger.info("Prewarmed cache namespace: %s", namespace)
+    except Exception as e:
+        logger.error(f"Prewarm failed for namespace {namespace}: {e}")
+
+
+def _default_arguments(func: Callable[..., Any]) -> Dict[str, Any]:
+    bound = inspect.signature(func).bind()
+    bound.apply_defaults()
+    return bound.arguments
+
+
+def _l2_lookup(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Reads key through to the L2 cache and promotes a live entry into L1.
+    """
+    data = _l2_call("get", key)
+    if data is None:
+        return None
+    try:
+        item = pickle.loads(data)
+    except Exception as e:
+        logger.error(f"Discarding unreadable L2 cache entry {key}: {e}")
+        return None
+    if _is_dead(item, datetime.utcnow()):
+        return None
+    _store_item(key, item, len(data))
+    logger.info("L2 cache hit for key: %s", key)
+    return item
+
+
+def _l2_call(method: str, *args: Any) -> Any:
+    """
+    Calls a method on the L2 backend, if any. L2 failures are logged and
+    treated as misses so they never fail a request.
+    """
+    if _l2 is None:
+        return None
+    try:
+        return getattr(_l2, method)(*args)
+    except Exception as e:
+        logger.error(f"L2 cache {method} failed: {e}")
+        return None
+
+
+def _store_item(key: str, item: Dict[str, Any], size: int) -> None:
+    """
+    Inserts an entry into L1 as the most recently used one.
+    """
+    global store_bytes
+    _discard(key)
+    item["size"] = size
+    store[key] = item
+    store_bytes += size
+    _evict_overflow()
+
+
+def _discard(key: str) -> bool:
+    """
+    Removes key from this worker's L1 cache only.
+    """
+    global store_bytes
+    item = store.pop(key, None)
+    if item is None:
+        return False
+    store_bytes -= item["size"]
+    return True
+
+
+def _compute_and_set(
+    key: str,
+    compute: Callable[[], Any],
+    ttl: Optional[int],
+    immutable: bool,
+    cache_if: Optional[Callable[[Any], bool]],
+    stale_ttl: Optional[int],
+    negative_if: Optional[Callable[[Any], bool]],
+    previous: Optional[Dict[str, Any]] = None
+) -> Any:
+    """
+    Computes the value for key as the single in-flight computation registered
+    in _inflight by the caller, caches it and hands it (or the exception
+    raised) to any waiting greenlets. Dependents are not invalidated if the
+    value equals the previous entry's.
+    """
+    pending = _inflight[key]
+    try:
+        value = compute()
+    except BaseException as e:
+        # Also gevent.Timeout, so waiters are released when a caller's timeout
+        # interrupts the computation
+        pending.set_exception(e)
+        raise
+    finally:
+        if _inflight.get(key) is pending:
+            del _inflight[key]
+
+    if value is None or (cache_if is not None and not cache_if(value)):
+        uncached[get_namespace(key)] += 1
+    elif negative_if is not None and negative_if(value):
+        negative_ttl = _negative_ttl(key)
+        logger.warning("Negative-caching result for key: %s for %d seconds",
+                       key, negative_ttl)
+        set(key, value, ttl=negative_ttl, stale_ttl=0, negative=True)
+    else:
+        _failures.pop(key, None)
+        changed = previous is None or previous.get("negative") or previous["value"] != value
+        set(key, value, ttl=ttl, immutable=immutable, stale_ttl=stale_ttl,
+            invalidate_dependents=changed)
+    pending.set(value)
+    return value
+
+
+def _negative_ttl(key: str) -> int:
+    """
+    Records another consecutive negative result for key and returns its
+    backoff TTL: CACHE_NEGATIVE_TTL_SECONDS, doubled for every consecutive
+    failure up to CACHE_NEGATIVE_MAX_TTL_SECONDS, so a missing permission
+    costs one AWS call per backoff period instead of one per request.
+    """
+    failures = _failures.pop(key, 0) + 1
+    _failures[key] = failures
+    while len(_failures) > CACHE_CONFIG.CACHE_MAX_ENTRIES:
+        _failures.popitem(last=False)
+    ttl = CACHE_CONFIG.CACHE_NEGATIVE_TTL_SECONDS * 2 ** min(failures - 1, 32)
+    return min(ttl, CACHE_CONFIG.CACHE_NEGATIVE_MAX_TTL_SECONDS)
+
+
+def _refresh(key: str, *args: Any, **kwargs: Any) -> None:
+    """
+    Background revalidation of a stale entry. Failures keep the stale value,
+    and dependents are only invalidated if the value changed.
+    """
+    try:
+        _compute_and_set(key, *args, **kwargs)
+        logger.info("Refreshed stale cache key: %s", key)
+    except Exception as e:
+        logger.error(f"Background refresh failed for key {key}: {e}")
+
+
+def save_snapshot() -> int:
+    """
+    Writes live entries to the snapshot file at CACHE_SNAPSHOT_PATH.
+
+    Entries already in the file from other workers are kept unless they are
+    dead or this worker holds a newer value for the key.
+
+    :return: int
+        The number of entries written.
+    """
+    path = CACHE_CONFIG.CACHE_SNAPSHOT_PATH
+    now = datetime.utcnow()
+    entries = {}
+    for key, data in cache_snapshot_service.load(path).items():
+        item = _deserialize(key, data)
+        if item is not None and not _is_dead(item, now):
+            entries[key] = (item["timestamp"], data)
+
+    for key, item in list(store.items()):
+        if _is_dead(item, now):
+            continue
+        existing = entries.get(key)
+        if existing and existing[0] > item["timestamp"]:
+            continue
+        data = _serialize({k: v for k, v in item.items() if k != "size"})
+        if data is not None:
+            entries[key] = (item["timestamp"], data)
+
+    cache_snapshot_service.save(
+        path, {key: data for key, (_, data) in entries.items()})
+    logger.info("Saved %d cache entries to snapshot %s", len(entries), path)
+    return len(entries)
+
+
+def load_snapshot() -> int:
+    """
+    Restores live entries from the snapshot file at CACHE_SNAPSHOT_PATH into
+    L1, so restarted or recycled workers start warm. Entries keep their
+    original expiry times; dead entries are skipped and existing keys are
+    left untouched.
+
+    :return: int
+        The number of entries restored.
+    """
+    path = CACHE_CONFIG.CACHE_SNAPSHOT_PATH
+    try:
+        entries = cache_snapshot_service.load(path)
+    except Exception as e:
+        logger.error(f"Failed to load cache snapshot {path}: {e}")
+        return 0
+
+    now = datetime.utcnow()
+    restored = 0
+    for key, data in entries.items():
+        item = _deserialize(key, data)
+        if item is None or key in store or _is_dead(item, now):
+            continue
+        _store_item(key, item, len(data))
+        restored += 1
+    logger.info("Restored %d cache entries from snapshot %s", restored, path)
+    return restored
+
+
+def _is_expired(item: Dict[str, Any], now: datetime) -> bool:
+    """
+    True once the entry is past its TTL (soft expiry).
+    """
+    expires_at = item.get("expires_at")
+    return expires_at is not None and now > expires_at
+
+
+def _is_dead(item: Dict[str, Any], now: datetime) -> bool:
+    """
+    True once the entry is past its stale window (hard expiry).
+    """
+    stale_until = item.get("stale_until")
+    return stale_until is not None and now > stale_until
+
+
+def _evict_overflow() -> None:
+    """
+    Evicts least recently used entries until the cache fits its entry count
+    and byte budget.
+    """
+    while store and (len(store) > CACHE_CONFIG.CACHE_MAX_ENTRIES
+                     or store_bytes > CACHE_CONFIG.CACHE_MAX_BYTES):
+        key = next(iter(store))
+        _discard(key)
+        _record(key, "evictions")
+        logger.info("Evicted least recently used cache key: %s", key)
+
+
+def _serialize(item: Dict[str, Any]) -> Optional[bytes]:
+    """
+    Pickles a cache entry for the L2 cache. The pickled size also serves as
+    the entry's approximate memory footprint.
+    """
+    try:
+        return pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        logger.warning(f"Cache entry is not serializable: {e}")
+        return None
+
+
+def _deserialize(key: str, data: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Unpickles a snapshot entry. Corrupt entries, or entries of classes that
+    no longer exist, are skipped.
+    """
+    try:
+        return pickle.loads(data)
+    except Exception as e:
+        logger.error(f"Skipping unreadable cache snapshot entry {key}: {e}")
+        return None
+
+
+def _sweep_forever() -> None:
+    while True:
+        gevent.sleep(CACHE_CONFIG.CACHE_SWEEP_INTERVAL_SECONDS)
+        try:
+            sweep_expired()
+        except Exception as e:
+            logger.error(f"Cache sweep failed: {e}")
+
+
+def _snapshot_forever() -> None:
+    while True:
+        gevent.sleep(CACHE_CONFIG.CACHE_SNAPSHOT_INTERVAL_SECONDS)
+        try:
+            save_snapshot()
+        except Exception as e:
+            logger.error(f"Cache snapshot failed: {e}")
@@ -0,0 +1,86 @@
+"""
+Module for reading and writing cache snapshot files.
+
+A snapshot lets a new worker start with a warm cache instead of paying the
+full AWS fan-out on its first requests. The file layout is:
+
+    MAGIC (8 bytes) | VERSION (2 bytes, big endian) | SHA-256 of body (32 bytes) | body
+
+where body is a zlib-compressed pickle of {key: pickled cache entry}. Entries
+are pickled individually so their sizes are known when they are restored.
+Files with another magic, version or a checksum mismatch are ignored.
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import struct
+import zlib
+from typing import Dict
+
+from utils.gevent_util import gevent_spawn
+from utils.storage_util import (
+    create_dir_path, get_dir_from_path, path_exists, read_file, rename_path, write_file)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"CCSNAP\x00\x01"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct(">8sH32s")
+
+
+def save(path: str, entries: Dict[str, bytes]) -> None:
+    """
+    Atomically writes pickled cache entries to a snapshot file.
+
+    Args:
+        path (str): Snapshot file path.
+        entries (Dict[str, bytes]): Pickled cache entries by key.
+    """
+    body = zlib.compress(pickle.dumps(
+        entries, protocol=pickle.HIGHEST_PROTOCOL))
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                          hashlib.sha256(body).digest())
+
+    directory = get_dir_from_path(path)
+    if directory:
+        gevent_spawn(create_dir_path, directory)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    gevent_spawn(write_file, tmp_path, header + body, mode='wb')
+    gevent_spawn(rename_path, tmp_path, path)
+
+
+def load(path: str) -> Dict[str, bytes]:
+    """
+    Reads pickled cache entries from a snapshot file.
+
+    Args:
+        path (str): Snapshot file path.
+
+    Returns:
+        Dict[str, bytes]: Pickled cache entries by key, empty if the file is
+        missing or invalid.
+    """
+    if not gevent_spawn(path_exists, path):
+        return {}
+    data = gevent_spawn(read_file, path, mode='rb')
+    if len(data) < _HEADER.size:
+        logger.warning("Ignoring truncated cache snapshot: %s", path)
+        return {}
+
+    magic, version, checksum = _HEADER.unpack_from(data)
+    body = data[_HEADER.size:]
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        logger.warning(
+            "Ignoring cache snapshot with unsupported format: %s", path)
+        return {}
+    if hashlib.sha256(body).digest() != checksum:
+        logger.warning("Ignoring corrupt cache snapshot: %s", path)
+        return {}
+    return pickle.loads(zlib.decompress(body))
@@ -0,0 +1,166 @@
+"""
+Module for answering Cost Explorer queries from a local daily ledger.
+
+Cost Explorer bills every request, and the cost endpoints ask for overlapping
+data: the same SERVICE grouping over the same windows, monthly totals of days
+already fetched, one metric at a time. get_cost_store() returns the daily
+ledger's (cost_ledger_service) rows for one metric as a columnar CostStore
+(cost_store_service), which the cost services aggregate with vectorized
+operations:
+
+- Only the days of the requested window missing from the ledger, or
+  unsettled and due for a refresh, are fetched: DAILY, grouped by SERVICE
+  (and the tag, for tag breakdowns), with all CE_QUERY_METRICS in one call,
+  paging through NextPageToken. Settled days are first looked up in MongoDB
+  when MONGODB_SNAPSHOTS_ENABLED is set (snapshot_store_service).
+- Stores are kept in memory and rebuilt only when the ledger has changed.
+- get_estimated_days() reports the days Cost Explorer marked as estimated.
+
+Fetched rows are also stored in MongoDB when MONGODB_SNAPSHOTS_ENABLED is set
+(snapshot_store_service).
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from services import snapshot_store_service
+from services.cost_ledger_service import is_settled_period, ledger
+from services.cost_store_service import CostStore
+from utils.boto3_util import get_boto_client
+from utils.env_config import CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+SERVICE_GROUP = {"Type": "DIMENSION", "Key": "SERVICE"}
+TAG_GROUP_TYPE = "TAG"
+
+# Serializes ledger refreshes so concurrent requests fetch each day only once
+_ledger_lock = threading.Lock()
+# (metric, tag key) -> (CostStore, ledger version it was built from)
+_stores: Dict[Tuple[str, str], Tuple[CostStore, Optional[float]]] = {}
+
+
+def get_cost_store(
+    start: str,
+    end: str,
+    metric: str = "UnblendedCost",
+    tag_key: str = ""
+) -> CostStore:
+    """
+    Returns the ledger's costs for a metric as a CostStore, after fetching
+    the days of [start, end) it is missing.
+
+    :param tag_key: str
+        Cost allocation tag whose values the store breaks costs down by; ""
+        for services only.
+    """
+    start_day = _parse_date(start)
+    end_day = min(_parse_date(end), date.today() + timedelta(days=1))
+    _refresh_ledger(start_day, end_day, [metric], tag_key)
+
+    version = ledger.version(tag_key)
+    store, store_version = _stores.get((metric, tag_key), (None, None))
+    if store is None or store_version != version:
+        store = CostStore.from_rows(
+            ledger.read(date.min, date.max, [metric], tag_key), metric)
+        _stores[(metric, tag_key)] = (store, version)
+    return store
+
+
+def get_estimated_days(start: str, end: str, tag_key: str = "") -> List[str]:
+    """
+    Returns the days of [start, end) whose ledger costs Cost Explorer marked
+    as estimated when they were fetched.
+    """
+    return ledger.estimated_days(_parse_date(start), _parse_date(end), tag_key)
+
+
+def _refresh_ledger(start: date, end: date, metrics: List[str], tag_key: str) -> None:
+    """
+    Fetches the days of [start, end) the ledger is missing or must refresh.
+    """
+    fetched = sorted(set(CACHE_CONFIG.CE_QUERY_METRICS) | set(metrics))
+    group_by = [SERVICE_GROUP]
+    if tag_key:
+        group_by.append({"Type": TAG_GROUP_TYPE, "Key": tag_key})
+    with _ledger_lock:
+        for range_start, range_end in ledger.missing_ranges(
+                start, end, metrics, tag_key):
+            range_start = _load_settled_days(range_start, range_end, fetched, tag_key)
+            if range_start >= range_end:
+                continue
+            response = _query(
+                TimePeriod={"Start": range_start.isoformat(),
+                            "End": range_end.isoformat()},
+                Granularity="DAILY",
+                Metrics=fetched,
+                GroupBy=group_by)
+            rows = []
+            estimated_days = []
+            for result in response["ResultsByTime"]:
+                day = result["TimePeriod"]["Start"]
+                for group in result.get("Groups", []):
+                    keys = group["Keys"]
+                    tag_value = keys[1] if len(keys) > 1 else ""
+                    rows.extend((day, keys[0], tag_value, metric,
+                                 float(value["Amount"]), value.get("Unit"))
+                                for metric, value in group["Metrics"].items())
+                if result.get("Estimated"):
+                    estimated_days.append(day)
+            ledger.write(range_start, range_end, fetched, rows,
+                         estimated_days, tag_key)
+            snapshot_store_service.save_daily_costs(rows, tag_key)
+
+
+def _load_settled_days(start: date, end: date, metrics: List[str], tag_key: str) -> date:
+    """
+    Writes the settled days at the start of [start, end) to the ledger from
+    MongoDB, if all of them are stored there, and returns the first day left
+    to fetch from Cost Explorer.
+    """
+    settled_end = start
+    while settled_end < end and is_settled_period(settled_end + timedelta(days=1)):
+        settled_end += timedelta(days=1)
+    rows = snapshot_store_service.find_daily_costs(start, settled_end, metrics, tag_key)
+    if rows is None:
+        return start
+    ledger.write(start, settled_end, metrics, rows, (), tag_key)
+    logger.info("Loaded %s to %s costs from MongoDB", start, settled_end)
+    return settled_end
+
+
+def _query(**request: Any) -> Dict[str, Any]:
+    """
+    Calls Cost Explorer, following NextPageToken and merging the pages.
+    """
+    ce = get_boto_client("ce")
+    results: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    calls = 0
+    while True:
+        response = ce.get_cost_and_usage(**request)
+        calls += 1
+        for result in response.get("ResultsByTime", []):
+            period = (result["TimePeriod"]["Start"], result["TimePeriod"]["End"])
+            if period in results:
+                # A period split across pages continues with more groups
+                results[period]["Groups"].extend(result.get("Groups", []))
+            else:
+                results[period] = {**result, "Groups": list(result.get("Groups", []))}
+        if not response.get("NextPageToken"):
+            break
+        request["NextPageToken"] = response["NextPageToken"]
+    logger.info("Fetched %s %s costs in %d GetCostAndUsage calls",
+                request["TimePeriod"], request.get("Granularity"), calls)
+    return {**response, "ResultsByTime": list(results.values()),
+            "NextPageToken": None}
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
@@ -0,0 +1,286 @@
+"""
+Module for detecting cost anomalies locally from the daily cost ledger.
+
+Cost Explorer's anomaly detection needs monitors and returns at most one page
+of results, so daily per-service costs are also scored in-process: each day's
+cost is compared with the rolling median of the service's previous
+CE_ANOMALY_WINDOW_DAYS days, scaled by the median absolute deviation (MAD).
+A day is an anomaly when its modified z-score reaches CE_ANOMALY_THRESHOLD and
+it exceeds the median by at least CE_ANOMALY_MIN_IMPACT.
+
+Scoring is incremental. The detector state holds only the last window of
+daily costs per service (a services x window float32 ring buffer), the last
+day folded into it and the anomalies found so far, and is saved with
+np.savez_compressed at CE_ANOMALY_STATE_PATH. Settled days are folded into the
+state once; the unsettled tail is scored on a copy at every call and its
+anomalies are reported as estimated. Costs are read from the ledger through
+ce_query_service, so only days it is missing are fetched from Cost Explorer.
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services import ce_query_service
+from services.cost_ledger_service import is_settled_period
+from services.cost_store_service import CostStore
+from utils.env_config import CACHE_CONFIG
+from utils.storage_util import create_dir_path, get_dir_from_path
+
+logger = logging.getLogger(__name__)
+
+# Scales the MAD to a standard deviation for normally distributed costs
+MAD_TO_SIGMA = 1.4826
+# Lower bounds of the scale, so flat series do not turn cents into anomalies
+MIN_SCALE_FRACTION = 0.05
+MIN_SCALE = 0.01
+
+
+class CostAnomalyDetector:
+    """
+    Rolling median/MAD anomaly detector over one metric's daily service costs.
+    """
+
+    def __init__(self, path: str, metric: str):
+        self.path = path
+        self.metric = metric
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._reset()
+
+    def _reset(self) -> None:
+        window_days = CACHE_CONFIG.CE_ANOMALY_WINDOW_DAYS
+        self.services: List[str] = []
+        self.window = np.zeros((0, window_days), dtype=np.float32)
+        self.history = 0
+        self.last_day: Optional[date] = None
+        self.anomalies: Dict[str, np.ndarray] = {
+            "day": np.array([], dtype="datetime64[D]"),
+            "service": np.array([], dtype=np.int32),
+            "amount": np.array([], dtype=np.float32),
+            "expected": np.array([], dtype=np.float32),
+            "score": np.array([], dtype=np.float32),
+        }
+
+    def detect(self, start: date, end: date) -> List[Dict[str, Any]]:
+        """
+        Returns the anomalies of the days in [start, end), after folding the
+        settled days since the last call into the state.
+        """
+        with self._lock:
+            self._load()
+            yesterday = date.today() - timedelta(days=1)
+            first_day = self.last_day + timedelta(days=1) if self.last_day \
+                else yesterday - timedelta(days=CACHE_CONFIG.CE_ANOMALY_HISTORY_DAYS
+                                           + CACHE_CONFIG.CE_ANOMALY_WINDOW_DAYS)
+            if first_day > yesterday:
+                return self._report(start, end, [])
+            store = ce_query_service.get_cost_store(
+                first_day.isoformat(), (yesterday + timedelta(days=1)).isoformat(),
+                metric=self.metric)
+
+            settled_end = first_day
+            while settled_end <= yesterday and is_settled_period(settled_end + timedelta(days=1)):
+                settled_end += timedelta(days=1)
+            if settled_end > first_day:
+                self._fold(store, first_day, settled_end)
+                self._save()
+
+            # Score the unsettled tail without committing it to the state
+            tail = self._scan(store, settled_end, yesterday + timedelta(days=1),
+                              commit=False)
+            return self._report(start, end, tail)
+
+    def _fold(self, store: CostStore, start: date, end: date) -> None:
+        """
+        Scores the days of [start, end) and folds them into the state.
+        """
+        found = self._scan(store, start, end, commit=True)
+        self.last_day = end - timedelta(days=1)
+        if found:
+            days, services, amounts, expected, scores = zip(*found)
+            new = {"day": np.array(days, dtype="datetime64[D]"),
+                   "service": np.array(services, dtype=np.int32),
+                   "amount": np.array(amounts, dtype=np.float32),
+                   "expected": np.array(expected, dtype=np.float32),
+                   "score": np.array(scores, dtype=np.float32)}
+            self.anomalies = {name: np.concatenate([self.anomalies[name], new[name]])
+                              for name in self.anomalies}
+        logger.info("Folded %d days of %s into the anomaly state, %d anomalies",
+                    (end - start).days, self.metric, len(found))
+
+    def _scan(
+        self,
+        store: CostStore,
+        start: date,
+        end: date,
+        commit: bool
+    ) -> List[Tuple[str, int, float, float, float]]:
+        """
+        Scores the days of [start, end) one at a time, pushing each into the
+        window ring buffer.
+
+        :param commit: bool
+            Whether the days are folded into the state or scored on a copy.
+        :return: List[Tuple[str, int, float, float, float]]
+            (day, service index, amount, expected, score) of each anomaly.
+        """
+        rows = self._service_rows(store)
+        window = self.window if commit else self.window.copy()
+        history = self.history
+
+        found = []
+        day = start
+        while day < end:
+            costs = np.zeros(len(window), dtype=np.float32)
+            position = np.searchsorted(store.days, np.datetime64(day, "D"))
+            if position < len(store.days) and store.days[position] == np.datetime64(day, "D"):
+                np.add.at(costs, rows, store.matrix[position])
+
+            filled = min(history, window.shape[1])
+            if filled >= CACHE_CONFIG.CE_ANOMALY_MIN_HISTORY_DAYS:
+                past = window[:, :filled]
+                median = np.median(past, axis=1)
+                mad = np.median(np.abs(past - median[:, None]), axis=1)
+                scale = np.maximum(np.maximum(MAD_TO_SIGMA * mad,
+                                              MIN_SCALE_FRACTION * np.abs(median)), MIN_SCALE)
+                scores = (costs - median) / scale
+                flagged = np.flatnonzero(
+                    (scores >= CACHE_CONFIG.CE_ANOMALY_THRESHOLD)
+                    & (costs - median >= CACHE_CONFIG.CE_ANOMALY_MIN_IMPACT))
+                found.extend((day.isoformat(), int(i), float(costs[i]),
+                              float(median[i]), float(scores[i])) for i in flagged)
+
+            window[:, history % window.shape[1]] = costs
+            history += 1
+            day += timedelta(days=1)
+        if commit:
+            self.history = history
+        return found
+
+    def _service_rows(self, store: CostStore) -> np.ndarray:
+        """
+        State rows of the store's services, adding rows for new services.
+        Their past costs were zero, which is what the added rows hold.
+        """
+        index = {service: row for row, service in enumerate(self.services)}
+        new = [str(service) for service in store.services if str(service) not in index]
+        if new:
+            index.update((service, len(self.services) + offset)
+                         for offset, service in enumerate(new))
+            self.services.extend(new)
+            self.window = np.vstack([self.window, np.zeros(
+                (len(new), self.window.shape[1]), dtype=np.float32)])
+        return np.array([index[str(service)] for service in store.services], dtype=np.intp)
+
+    def _report(
+        self,
+        start: date,
+        end: date,
+        tail: List[Tuple[str, int, float, float, float]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Anomalies of [start, end), most significant first.
+        """
+        days = self.anomalies["day"]
+        selected = np.flatnonzero((days >= np.datetime64(start, "D"))
+                                  & (days < np.datetime64(end, "D")))
+        found = [(str(days[i]), int(self.anomalies["service"][i]),
+                  float(self.anomalies["amount"][i]), float(self.anomalies["expected"][i]),
+                  float(self.anomalies["score"][i]), False) for i in selected]
+        found.extend((*anomaly, True) for anomaly in tail
+                     if start.isoformat() <= anomaly[0] < end.isoformat())
+
+        anomalies = []
+        for day, service, amount, expected, score, estimated in found:
+            anomalies.append({
+                'id': f"{day}:{self.services[service]}",
+                'start': day,
+                'end': (date.fromisoformat(day) + timedelta(days=1)).isoformat(),
+                'dimension': self.services[service],
+                'amount': round(amount, 2),
+                'expected': round(expected, 2),
+                'total_estimated_impact': round(amount - expected, 2),
+                'score': round(score, 2),
+                'estimated': estimated,
+            })
+        return sorted(anomalies, key=lambda anomaly: -anomaly['total_estimated_impact'])
+
+    def _load(self) -> None:
+        """
+        (Re)loads the state when the file was written by another worker.
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            with np.load(self.path) as state:
+                if state["window"].shape[1] != CACHE_CONFIG.CE_ANOMALY_WINDOW_DAYS:
+                    logger.info("Anomaly window changed, rebuilding %s", self.path)
+                    self._reset()
+                    return
+                self.services = [str(service) for service in state["services"]]
+                self.window = state["window"]
+                self.history = int(state["history"])
+                self.last_day = date.fromisoformat(str(state["last_day"]))
+                self.anomalies = {name: state[f"anomaly_{name}"] for name in self.anomalies}
+        except Exception as e:
+            logger.warning(f"Could not load anomaly state {self.path}: {e}")
+            self._reset()
+            return
+        self._loaded_mtime = mtime
+
+    def _save(self) -> None:
+        directory = get_dir_from_path(self.path)
+        if directory:
+            create_dir_path(directory)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            np.savez_compressed(
+                file,
+                services=np.array(self.services, dtype=str),
+                window=self.window,
+                history=np.int64(self.history),
+                last_day=np.datetime64(self.last_day, "D"),
+                **{f"anomaly_{name}": values for name, values in self.anomalies.items()})
+        os.replace(temp_path, self.path)
+        self._loaded_mtime = os.path.getmtime(self.path)
+
+
+_detectors: Dict[str, CostAnomalyDetector] = {}
+
+
+def detect_anomalies(
+    start_date: str,
+    end_date: str,
+    metric: str = "UnblendedCost"
+) -> List[Dict[str, Any]]:
+    """
+    Returns the local anomalies of [start_date, end_date) for a metric. The
+    metric names the detector's state file, so only CE_QUERY_METRICS are
+    accepted; others raise ValueError.
+
+    :return: List[Dict[str, Any]]
+        Anomalies by descending impact, with "id", "start", "end", "dimension"
+        (the service), "amount", "expected", "total_estimated_impact",
+        "score" and "estimated" (set for days still being settled).
+    """
+    if metric not in CACHE_CONFIG.CE_QUERY_METRICS:
+        raise ValueError(f"Unsupported metric: {metric}")
+    detector = _detectors.get(metric)
+    if detector is None:
+        detector = _detectors.setdefault(metric, CostAnomalyDetector(
+            CACHE_CONFIG.CE_ANOMALY_STATE_PATH.format(metric=metric), metric))
+    return detector.detect(date.fromisoformat(start_date), date.fromisoformat(end_date))
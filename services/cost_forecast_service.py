@@ -0,0 +1,381 @@
+"""
+Module for forecasting spend locally from the daily cost ledger.
+
+Every service's daily cost, and the account total, is modelled with additive
+Holt-Winters exponential smoothing: a level, a damped trend and a weekly
+seasonal profile. All series are fitted together in vectorized NumPy; the
+smoothing parameters of each series are chosen from a fixed grid by the sum
+of squared one-step errors over the last CE_FORECAST_HISTORY_DAYS days.
+
+The fitted parameters and the model state (level, trend, seasonal profile and
+residual deviation per series) are saved with np.savez_compressed at
+CE_FORECAST_STATE_PATH. Settled days are folded into the state with one
+smoothing step each as they arrive, and the parameters are refitted every
+CE_FORECAST_REFIT_DAYS days. The unsettled tail is folded into a copy at every
+call, so forecasts start from yesterday's costs. Forecasting any horizon is
+then a closed-form evaluation of the state.
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import itertools
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from services import ce_query_service
+from services.cost_ledger_service import is_settled_period
+from services.cost_store_service import DAILY, MONTHLY, CostStore
+from utils.env_config import CACHE_CONFIG
+from utils.storage_util import create_dir_path, get_dir_from_path
+
+logger = logging.getLogger(__name__)
+
+SEASON_DAYS = 7
+# Damping of the trend per day ahead, so long horizons do not extrapolate it forever
+DAMPING = 0.98
+# Candidate (alpha, beta, gamma) smoothing parameters
+PARAMETER_GRID = np.array(list(itertools.product(
+    (0.05, 0.1, 0.2, 0.3, 0.5, 0.7),
+    (0.01, 0.05, 0.1, 0.2),
+    (0.05, 0.1, 0.2, 0.3))))
+# Parameters of series first seen between refits
+DEFAULT_PARAMETERS = (0.3, 0.05, 0.1)
+# z-score of the 80% prediction interval, Cost Explorer's default level
+INTERVAL_Z = 1.2816
+TOTAL_SERIES = "*"
+
+
+class CostForecaster:
+    """
+    Holt-Winters models of one metric's daily costs per service and in total.
+    """
+
+    def __init__(self, path: str, metric: str):
+        self.path = path
+        self.metric = metric
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._reset()
+
+    def _reset(self) -> None:
+        # Series are the services followed by TOTAL_SERIES
+        self.series: List[str] = [TOTAL_SERIES]
+        self.parameters = np.array([DEFAULT_PARAMETERS])
+        self.level = np.zeros(1)
+        self.trend = np.zeros(1)
+        self.season = np.zeros((1, SEASON_DAYS))
+        self.sigma = np.zeros(1)
+        self.last_day: Optional[date] = None
+        self.fitted_day: Optional[date] = None
+
+    def forecast(
+        self,
+        start: date,
+        end: date,
+        granularity: str = DAILY,
+        by_service: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Forecasts the days of [start, end) from yesterday's costs, split into
+        DAILY or MONTHLY periods. Days before today are forecast as today.
+        """
+        with self._lock:
+            self._load()
+            yesterday = date.today() - timedelta(days=1)
+            first_day = self.last_day + timedelta(days=1) if self.last_day \
+                else yesterday - timedelta(days=CACHE_CONFIG.CE_FORECAST_HISTORY_DAYS)
+            if first_day <= yesterday:
+                store = ce_query_service.get_cost_store(
+                    first_day.isoformat(), (yesterday + timedelta(days=1)).isoformat(),
+                    metric=self.metric)
+                settled_end = first_day
+                while settled_end <= yesterday and is_settled_period(settled_end + timedelta(days=1)):
+                    settled_end += timedelta(days=1)
+                self._advance(store, first_day, settled_end)
+                # Fold the unsettled tail into a copy of the state
+                state = self._smooth(self._state(), store, settled_end,
+                                     yesterday + timedelta(days=1))
+            else:
+                state = self._state()
+
+        start = max(start, yesterday + timedelta(days=1))
+        end = max(end, start)
+        return self._evaluate(state, yesterday, start, end, granularity, by_service)
+
+    def _advance(self, store: CostStore, first_day: date, settled_end: date) -> None:
+        """
+        Folds the settled days of [first_day, settled_end) into the state,
+        refitting the parameters when they are CE_FORECAST_REFIT_DAYS old.
+        """
+        if settled_end <= first_day:
+            return
+        if self.fitted_day is None \
+                or (settled_end - self.fitted_day).days >= CACHE_CONFIG.CE_FORECAST_REFIT_DAYS:
+            fit_start = settled_end - timedelta(days=CACHE_CONFIG.CE_FORECAST_HISTORY_DAYS)
+            if fit_start < first_day:
+                store = ce_query_service.get_cost_store(
+                    fit_start.isoformat(), settled_end.isoformat(), metric=self.metric)
+            self._fit(store, fit_start, settled_end)
+        else:
+            self._smooth(self._state(), store, first_day, settled_end, commit=True)
+        self.last_day = settled_end - timedelta(days=1)
+        self._save()
+
+    def _fit(self, store: CostStore, start: date, end: date) -> None:
+        """
+        Chooses each series' parameters from PARAMETER_GRID on the days of
+        [start, end) and keeps the state they end in.
+        """
+        self.series = [str(service) for service in store.services] + [TOTAL_SERIES]
+        costs = self._daily_costs(store, start, end)
+        days, count = costs.shape
+        grid_size = len(PARAMETER_GRID)
+        alpha, beta, gamma = (PARAMETER_GRID[:, i, None] for i in range(3))
+
+        # Initial level and trend from the first two weeks, season from the first
+        first_week = costs[:SEASON_DAYS].mean(axis=0)
+        second_week = costs[SEASON_DAYS:2 * SEASON_DAYS].mean(axis=0) \
+            if days >= 2 * SEASON_DAYS else first_week
+        level = np.tile(first_week, (grid_size, 1))
+        trend = np.tile((second_week - first_week) / SEASON_DAYS, (grid_size, 1))
+        season = np.zeros((grid_size, count, SEASON_DAYS))
+        for offset in range(min(SEASON_DAYS, days)):
+            season[:, :, (start + timedelta(days=offset)).weekday()] = \
+                costs[offset] - first_week
+
+        # One-step errors from the third week on, after a week of burn-in
+        errors = np.zeros((grid_size, count))
+        for offset in range(SEASON_DAYS, days):
+            weekday = (start + timedelta(days=offset)).weekday()
+            error = costs[offset] - (level + DAMPING * trend + season[:, :, weekday])
+            if offset >= 2 * SEASON_DAYS:
+                errors += error ** 2
+            level, trend, season[:, :, weekday] = _smoothing_step(
+                level, trend, season[:, :, weekday], costs[offset], alpha, beta, gamma)
+
+        best = errors.argmin(axis=0)
+        columns = np.arange(count)
+        self.parameters = PARAMETER_GRID[best]
+        self.level = level[best, columns]
+        self.trend = trend[best, columns]
+        self.season = season[best, columns]
+        self.sigma = np.sqrt(errors[best, columns] / max(days - 2 * SEASON_DAYS, 1))
+        self.fitted_day = end
+        logger.info("Fitted %s forecasts of %d series on %d days",
+                    self.metric, count, days)
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        return {"level": self.level.copy(), "trend": self.trend.copy(),
+                "season": self.season.copy()}
+
+    def _smooth(
+        self,
+        state: Dict[str, np.ndarray],
+        store: CostStore,
+        start: date,
+        end: date,
+        commit: bool = False
+    ) -> Dict[str, np.ndarray]:
+        """
+        Applies one smoothing step per day of [start, end) to a state with
+        each series' parameters; commit stores the result as the model state.
+        """
+        self._add_series(store)
+        for name in state:
+            missing = len(self.series) - len(state[name])
+            if missing:
+                state[name] = np.concatenate([state[name][:-1], np.zeros(
+                    (missing,) + state[name].shape[1:]), state[name][-1:]])
+        alpha, beta, gamma = self.parameters.T
+        costs = self._daily_costs(store, start, end)
+        for offset, day_costs in enumerate(costs):
+            weekday = (start + timedelta(days=offset)).weekday()
+            state["level"], state["trend"], state["season"][:, weekday] = _smoothing_step(
+                state["level"], state["trend"], state["season"][:, weekday],
+                day_costs, alpha, beta, gamma)
+        if commit:
+            self.level, self.trend, self.season = \
+                state["level"], state["trend"], state["season"]
+        return state
+
+    def _add_series(self, store: CostStore) -> None:
+        """
+        Adds services first seen since the last fit, with a zero state.
+        """
+        new = [str(service) for service in store.services
+               if str(service) not in self.series]
+        if not new:
+            return
+        self.series = self.series[:-1] + new + [TOTAL_SERIES]
+
+        def grow(values: np.ndarray, fill: Any) -> np.ndarray:
+            added = np.full((len(new),) + values.shape[1:], fill, dtype=float)
+            return np.concatenate([values[:-1], added, values[-1:]])
+
+        self.parameters = grow(self.parameters, DEFAULT_PARAMETERS)
+        self.level = grow(self.level, 0)
+        self.trend = grow(self.trend, 0)
+        self.season = grow(self.season, 0)
+        self.sigma = grow(self.sigma, 0)
+
+    def _daily_costs(self, store: CostStore, start: date, end: date) -> np.ndarray:
+        """
+        (days x series) costs of [start, end) in self.series order, the last
+        column being the total; days without rows are zero.
+        """
+        days = (end - start).days
+        costs = np.zeros((days, len(self.series)))
+        bounds = np.searchsorted(store.days, np.array([start, end], dtype="datetime64[D]"))
+        window = slice(int(bounds[0]), int(bounds[1]))
+        offsets = (store.days[window] - np.datetime64(start, "D")).astype(int)
+        index = {name: column for column, name in enumerate(self.series)}
+        columns = np.array([index[str(service)] for service in store.services], dtype=np.intp)
+        if len(columns):
+            costs[np.ix_(offsets, columns)] = store.matrix[window]
+        costs[:, -1] = costs[:, :-1].sum(axis=1)
+        return costs
+
+    def _evaluate(
+        self,
+        state: Dict[str, np.ndarray],
+        origin: date,
+        start: date,
+        end: date,
+        granularity: str,
+        by_service: bool
+    ) -> Dict[str, Any]:
+        """
+        Forecast periods of [start, end) from a state ending on origin.
+        """
+        if granularity not in (DAILY, MONTHLY):
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        horizons = np.arange((start - origin).days, (end - origin).days)
+        weekdays = np.array([(origin + timedelta(days=int(h))).weekday() for h in horizons],
+                            dtype=np.intp)
+        # Damped trend: sum of DAMPING ** i for i = 1..h
+        damped = DAMPING * (1 - DAMPING ** horizons) / (1 - DAMPING)
+        means = np.maximum(state["level"][:, None] + state["trend"][:, None] * damped
+                           + state["season"][:, weekdays], 0)
+
+        # Variance of the h-step error of additive Holt's method
+        alpha, beta = self.parameters[:, 0, None], self.parameters[:, 1, None]
+        variances = self.sigma[:, None] ** 2 * (1 + (horizons - 1) * (
+            alpha ** 2 + alpha * beta * horizons
+            + beta ** 2 * horizons * (2 * horizons - 1) / 6))
+
+        periods = []
+        day = start
+        while day < end:
+            if granularity == DAILY:
+                period_end = day + timedelta(days=1)
+            else:
+                period_end = min(date(day.year + day.month // 12, day.month % 12 + 1, 1), end)
+            days = slice((day - start).days, (period_end - start).days)
+            mean = float(means[-1, days].sum())
+            deviation = INTERVAL_Z * float(np.sqrt(variances[-1, days].sum()))
+            period = {
+                'time_period_start': day.isoformat(),
+                'time_period_end': period_end.isoformat(),
+                'mean': mean,
+                'lower': max(mean - deviation, 0.0),
+                'upper': mean + deviation,
+            }
+            if by_service:
+                totals = means[:-1, days].sum(axis=1)
+                period['services'] = {self.series[i]: float(totals[i])
+                                      for i in np.flatnonzero(totals)}
+            periods.append(period)
+            day = period_end
+        return {'series': periods, 'total': float(means[-1].sum()), 'unit': 'USD'}
+
+    def _load(self) -> None:
+        """
+        (Re)loads the state when the file was written by another worker.
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            with np.load(self.path) as state:
+                self.series = [str(name) for name in state["series"]]
+                self.parameters = state["parameters"]
+                self.level = state["level"]
+                self.trend = state["trend"]
+                self.season = state["season"]
+                self.sigma = state["sigma"]
+                self.last_day = date.fromisoformat(str(state["last_day"]))
+                self.fitted_day = date.fromisoformat(str(state["fitted_day"]))
+        except Exception as e:
+            logger.warning(f"Could not load forecast state {self.path}: {e}")
+            self._reset()
+            return
+        self._loaded_mtime = mtime
+
+    def _save(self) -> None:
+        directory = get_dir_from_path(self.path)
+        if directory:
+            create_dir_path(directory)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            np.savez_compressed(
+                file,
+                series=np.array(self.series, dtype=str),
+                parameters=self.parameters,
+                level=self.level,
+                trend=self.trend,
+                season=self.season,
+                sigma=self.sigma,
+                last_day=np.datetime64(self.last_day, "D"),
+                fitted_day=np.datetime64(self.fitted_day, "D"))
+        os.replace(temp_path, self.path)
+        self._loaded_mtime = os.path.getmtime(self.path)
+
+
+def _smoothing_step(level, trend, season, costs, alpha, beta, gamma):
+    """
+    One additive Holt-Winters update with a damped trend; season is the
+    component of the observed weekday.
+    """
+    previous = level
+    level = alpha * (costs - season) + (1 - alpha) * (previous + DAMPING * trend)
+    trend = beta * (level - previous) + (1 - beta) * DAMPING * trend
+    season = gamma * (costs - level) + (1 - gamma) * season
+    return level, trend, season
+
+
+_forecasters: Dict[str, CostForecaster] = {}
+
+
+def forecast_spend(
+    start_date: str,
+    end_date: str,
+    metric: str = "UnblendedCost",
+    granularity: str = DAILY,
+    by_service: bool = False
+) -> Dict[str, Any]:
+    """
+    Forecasts the spend of [start_date, end_date) for a metric.
+
+    :return: Dict[str, Any]
+        {"series": [{"time_period_start", "time_period_end", "mean", "lower",
+        "upper"}, ...], "total", "unit"}, like the Cost Explorer forecast,
+        with an 80% prediction interval. by_service adds each period's
+        "services" breakdown.
+    """
+    forecaster = _forecasters.get(metric)
+    if forecaster is None:
+        forecaster = _forecasters.setdefault(metric, CostForecaster(
+            CACHE_CONFIG.CE_FORECAST_STATE_PATH.format(metric=metric), metric))
+    return forecaster.forecast(date.fromisoformat(start_date), date.fromisoformat(end_date),
+                               granularity, by_service)
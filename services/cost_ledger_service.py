@@ -0,0 +1,213 @@
+"""
+Module for the local daily Cost Explorer ledger.
+
+Daily costs older than the CE settlement window never change, so they are
+fetched once and kept on disk as (day, tag key, service, tag value, metric,
+amount) rows in a sqlite file at CE_LEDGER_PATH, shared by all workers on the
+host. A coverage table records which days are stored for which metric and
+grouping, when they were fetched and whether they were settled then.
+
+ce_query_service asks the ledger for the days of a window that are missing,
+or unsettled and older than CE_LEDGER_REFRESH_SECONDS, fetches only those
+from Cost Explorer and answers every range and grouping from the stored rows.
+
+Rows fetched grouped by SERVICE alone are stored with an empty tag key; rows
+fetched grouped by SERVICE and a tag are stored under that tag key.
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from utils.env_config import CACHE_CONFIG
+from utils.storage_util import create_dir_path, get_dir_from_path
+
+logger = logging.getLogger(__name__)
+
+# (day, service, tag value, metric, amount, unit)
+LedgerRow = Tuple[str, str, str, str, float, Optional[str]]
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS costs ("
+    "day TEXT NOT NULL, tag_key TEXT NOT NULL, metric TEXT NOT NULL, "
+    "service TEXT NOT NULL, tag_value TEXT NOT NULL, amount REAL NOT NULL, "
+    "unit TEXT, PRIMARY KEY (day, tag_key, metric, service, tag_value)"
+    ") WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS coverage ("
+    "day TEXT NOT NULL, tag_key TEXT NOT NULL, metric TEXT NOT NULL, "
+    "fetched_at REAL NOT NULL, settled INTEGER NOT NULL, "
+    "estimated INTEGER NOT NULL, PRIMARY KEY (day, tag_key, metric)"
+    ") WITHOUT ROWID",
+)
+
+
+def is_settled_period(end_date) -> bool:
+    """
+    Return True if Cost Explorer data for a period ending at end_date (exclusive)
+    is final, i.e. the period closed more than CE_SETTLEMENT_DAYS ago.
+    Results for settled periods can be cached as immutable.
+    """
+    if isinstance(end_date, str):
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+    elif isinstance(end_date, datetime):
+        end_date = end_date.date()
+    return end_date + timedelta(days=CACHE_CONFIG.CE_SETTLEMENT_DAYS) <= date.today()
+
+
+class CostLedger:
+    """
+    Daily cost rows on a local sqlite file.
+
+    Connections are opened lazily per process so the ledger is safe to create
+    before gunicorn forks its workers.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            directory = get_dir_from_path(self.path)
+            if directory:
+                create_dir_path(directory)
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def missing_ranges(
+        self,
+        start: date,
+        end: date,
+        metrics: Iterable[str],
+        tag_key: str = ""
+    ) -> List[Tuple[date, date]]:
+        """
+        Returns the [start, end) ranges of days that must be fetched: days not
+        stored for every metric, and unsettled days fetched more than
+        CE_LEDGER_REFRESH_SECONDS ago.
+        """
+        metrics = sorted(set(metrics))
+        placeholders = ",".join("?" * len(metrics))
+        refresh_before = time.time() - CACHE_CONFIG.CE_LEDGER_REFRESH_SECONDS
+        fresh = {day for day, in self._connection().execute(
+            "SELECT day FROM coverage "
+            f"WHERE tag_key = ? AND metric IN ({placeholders}) "
+            "AND day >= ? AND day < ? AND (settled = 1 OR fetched_at >= ?) "
+            "GROUP BY day HAVING COUNT(*) = ?",
+            (tag_key, *metrics, start.isoformat(), end.isoformat(),
+             refresh_before, len(metrics)))}
+
+        ranges = []
+        day = start
+        while day < end:
+            if day.isoformat() not in fresh:
+                if ranges and ranges[-1][1] == day:
+                    ranges[-1] = (ranges[-1][0], day + timedelta(days=1))
+                else:
+                    ranges.append((day, day + timedelta(days=1)))
+            day += timedelta(days=1)
+        return ranges
+
+    def write(
+        self,
+        start: date,
+        end: date,
+        metrics: Iterable[str],
+        rows: Iterable[LedgerRow],
+        estimated_days: Iterable[str] = (),
+        tag_key: str = ""
+    ) -> None:
+        """
+        Replaces the rows of the days in [start, end) for the given metrics
+        and records them as covered.
+        """
+        metrics = sorted(set(metrics))
+        placeholders = ",".join("?" * len(metrics))
+        estimated_days = set(estimated_days)
+        now = time.time()
+        coverage = []
+        day = start
+        while day < end:
+            settled = int(is_settled_period(day + timedelta(days=1)))
+            estimated = int(day.isoformat() in estimated_days)
+            coverage.extend((day.isoformat(), tag_key, metric, now, settled, estimated)
+                            for metric in metrics)
+            day += timedelta(days=1)
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM costs "
+                f"WHERE tag_key = ? AND metric IN ({placeholders}) "
+                "AND day >= ? AND day < ?",
+                (tag_key, *metrics, start.isoformat(), end.isoformat()))
+            conn.executemany(
+                "INSERT OR REPLACE INTO costs (day, tag_key, metric, service, "
+                "tag_value, amount, unit) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((day, tag_key, metric, service, tag_value, amount, unit)
+                 for day, service, tag_value, metric, amount, unit in rows))
+            conn.executemany(
+                "INSERT OR REPLACE INTO coverage (day, tag_key, metric, "
+                "fetched_at, settled, estimated) VALUES (?, ?, ?, ?, ?, ?)",
+                coverage)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def read(
+        self,
+        start: date,
+        end: date,
+        metrics: Iterable[str],
+        tag_key: str = ""
+    ) -> List[LedgerRow]:
+        """
+        Returns the stored rows of the days in [start, end) for the given
+        metrics.
+        """
+        metrics = sorted(set(metrics))
+        placeholders = ",".join("?" * len(metrics))
+        return self._connection().execute(
+            "SELECT day, service, tag_value, metric, amount, unit FROM costs "
+            f"WHERE tag_key = ? AND metric IN ({placeholders}) "
+            "AND day >= ? AND day < ?",
+            (tag_key, *metrics, start.isoformat(), end.isoformat())).fetchall()
+
+    def version(self, tag_key: str = "") -> Optional[float]:
+        """
+        Returns the time of the latest write for a tag key, which changes
+        whenever its stored rows do.
+        """
+        return self._connection().execute(
+            "SELECT MAX(fetched_at) FROM coverage WHERE tag_key = ?",
+            (tag_key,)).fetchone()[0]
+
+    def estimated_days(self, start: date, end: date, tag_key: str = "") -> List[str]:
+        """
+        Returns the days in [start, end) whose stored costs were estimated.
+        """
+        return [day for day, in self._connection().execute(
+            "SELECT DISTINCT day FROM coverage WHERE tag_key = ? "
+            "AND day >= ? AND day < ? AND estimated = 1",
+            (tag_key, start.isoformat(), end.isoformat()))]
+
+
+ledger = CostLedger(CACHE_CONFIG.CE_LEDGER_PATH)
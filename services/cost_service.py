@@ -1,62 +1,59 @@
-from services import cache_service
-import boto3
+from services import cache_service, ce_query_service, cost_anomaly_service, cost_forecast_service
+from services.cost_ledger_service import is_settled_period
+from utils.boto3_util import get_account_id, get_boto_client, paginate
 from datetime import datetime, timedelta
 from botocore.exceptions import ClientError
 from datetime import date, datetime, timedelta
 import math
+import numpy as np
 import logging
+from utils.env_config import CACHE_CONFIG
 
 logger = logging.getLogger(__name__)
 
 
-cost_explorer_client = boto3.client(
-    'ce', region_name='us-east-1')  # Cost Explorer
-
-
 def iso_date(dt: date):
     """Return date string YYYY-MM-DD for datetime or date."""
     return dt.strftime('%Y-%m-%d')
 
 
+def _is_settled_range(start_date, end_date, *args, **kwargs) -> bool:
+    """@cached immutability predicate for functions taking (start_date, end_date, ...)."""
+    return is_settled_period(end_date)
+
+
+def _is_settled_month(year: int, month: int) -> bool:
+    """@cached immutability predicate for get_daily_cost_trend."""
+    next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return is_settled_period(next_month)
+
+
+@cache_service.cached(immutable=_is_settled_range)
 def total_cost_trend(start_date, end_date, granularity='DAILY', metrics=('UnblendedCost',)):
     """
     Get total cost and time-series trend from Cost Explorer.
     - start_date, end_date: 'YYYY-MM-DD' strings (end is exclusive per API; usually set end = today)
-    - granularity: 'DAILY'|'WEEKLY'|'MONTHLY'
-    - metrics: tuple/list of metrics (e.g., 'UnblendedCost','BlendedCost','AmortizedCost','NetUnblendedCost')
-    Returns: {'total': float, 'currency': str, 'series': [{'start':..., 'end':..., 'amount': float}, ...]}
+    - granularity: 'DAILY'|'MONTHLY'
+    - metrics: tuple/list of metrics (e.g., 'UnblendedCost','BlendedCost','AmortizedCost','NetUnblendedCost');
+      the first one is reported
+    Returns: {'total': float, 'currency': str,
+              'series': [{'start':..., 'end':..., 'amount': float, 'estimated': bool}, ...]}
+      where 'estimated' is set for periods with days Cost Explorer still estimates.
     """
     try:
-        resp = cost_explorer_client.get_cost_and_usage(
-            TimePeriod={'Start': start_date, 'End': end_date},
-            Granularity=granularity,
-            Metrics=list(metrics)
-        )
+        store = ce_query_service.get_cost_store(start_date, end_date, metric=metrics[0])
     except ClientError as e:
         logger.error(f"AWS ClientError: {e}")
+        raise
 
-    # Sum results (if there are groups the API returns groups; here we use ResultsByTime)
-    series = []
-    total = 0.0
-    currency = None
-    for item in resp.get('ResultsByTime', []):
-        amt = 0.0
-        # metric key: use first metric
-        metric_name = metrics[0]
-        amt_str = item.get('Total', {}).get(metric_name, {}).get('Amount')
-        unit = item.get('Total', {}).get(metric_name, {}).get('Unit')
-        if amt_str is not None:
-            amt = float(amt_str)
-            total += amt
-            currency = unit
-        series.append({
-            'start': item.get('TimePeriod', {}).get('Start'),
-            'end': item.get('TimePeriod', {}).get('End'),
-            'amount': amt
-        })
-    return {'total': total, 'currency': currency, 'series': series}
+    series = store.periods(start_date, end_date, granularity)
+    estimated_days = ce_query_service.get_estimated_days(start_date, end_date)
+    for period in series:
+        period['estimated'] = any(period['start'] <= day < period['end'] for day in estimated_days)
+    return {'total': store.total(start_date, end_date), 'currency': store.unit, 'series': series}
 
 
+@cache_service.cached(immutable=_is_settled_range)
 def cost_by_service(start_date, end_date, granularity='MONTHLY', metric='UnblendedCost', top_n=None):
     """
     Return cost grouped by AWS service.
@@ -64,113 +61,70 @@ def cost_by_service(start_date, end_date, granularity='MONTHLY', metric='Unblend
     - top_n: if provided, only returns top N (highest cost).
     """
     try:
-        resp = cost_explorer_client.get_cost_and_usage(
-            TimePeriod={'Start': start_date, 'End': end_date},
-            Granularity=granularity,
-            Metrics=[metric],
-            GroupBy=[{'Type': 'DIMENSION', 'Key': 'SERVICE'}]
-        )
+        store = ce_query_service.get_cost_store(start_date, end_date, metric=metric)
     except ClientError as e:
         logger.error(f"AWS ClientError: {e}")
         raise
 
-    # CostExplorer returns aggregated ResultsByTime; for monthly granularity we typically have one item
-    agg = {}
-    for timeblock in resp.get('ResultsByTime', []):
-        for group in timeblock.get('Groups', []):
-            key = group.get('Keys')[0]  # service name
-            amt = float(group['Metrics'][metric]['Amount'])
-            unit = group['Metrics'][metric]['Unit']
-            agg.setdefault(key, 0.0)
-            agg[key] += amt
-
-    items = [{'service': k, 'amount': v, 'unit': unit} for k, v in agg.items()]
-    items.sort(key=lambda x: x['amount'], reverse=True)
-    if top_n:
-        items = items[:top_n]
-    return items
+    return [{'service': service, 'amount': amount, 'unit': store.unit}
+            for service, amount in store.top_services(start_date, end_date, top_n)]
 
 
+@cache_service.cached(immutable=_is_settled_range)
 def cost_by_tag(start_date, end_date, tag_key, granularity='MONTHLY', metric='UnblendedCost', top_n=None):
     """
     Group costs by tag values for tag_key.
     - tag_key: string name of the tag key you activated (e.g., 'Project', 'Team', 'Owner')
     Returns: [{'tag_value': value_or_empty, 'amount': float, 'unit': str}, ...]
     """
-    # Create a unique cache key based on input parameters
-    cache_key = f"cost_by_tag:{start_date}:{end_date}:{tag_key}"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
     try:
-        group = [{'Type': 'TAG', 'Key': tag_key}]
-        resp = cost_explorer_client.get_cost_and_usage(
-            TimePeriod={'Start': start_date, 'End': end_date},
-            Granularity=granularity,
-            Metrics=[metric],
-            GroupBy=group
-        )
+        store = ce_query_service.get_cost_store(
+            start_date, end_date, metric=metric, tag_key=tag_key)
     except ClientError as e:
         logger.error(f"AWS ClientError: {e}")
         raise
 
-    agg = {}
-    unit = None
-    for timeblock in resp.get('ResultsByTime', []):
-        for group in timeblock.get('Groups', []):
-            # group['Keys'] contains the tag value(s)
-            tag_value = group['Keys'][0] if group['Keys'] else ''
-            amt = float(group['Metrics'][metric]['Amount'])
-            unit = group['Metrics'][metric]['Unit']
-            agg.setdefault(tag_value, 0.0)
-            agg[tag_value] += amt
-
-    items = [{'tag_value': k, 'amount': v, 'unit': unit}
-             for k, v in agg.items()]
-    items.sort(key=lambda x: x['amount'], reverse=True)
-    if top_n:
-        items = items[:top_n]
-    # Store result in cache
-    cache_service.set(cache_key, items)
-    logger.info("Cached result for key: %s", cache_key)
-    return items
+    amounts = store.by_tag(start_date, end_date)
+    present = np.flatnonzero(store.present(start_date, end_date)[1])
+    order = present[np.argsort(-amounts[present], kind='stable')][:top_n or None]
+    return [{'tag_value': str(store.tag_values[i]), 'amount': float(amounts[i]), 'unit': store.unit}
+            for i in order]
 
 
 def top_n_services(start_date, end_date, n=5, metric='UnblendedCost'):
-    """Return top-n services by spend in the given period."""
-    # Create a unique cache key based on input parameters
-    cache_key = f"top_n_services:{start_date}:{end_date}"
+    """Return top-n services by spend in the given period (cached by cost_by_service)."""
+    return cost_by_service(start_date, end_date,
+                           granularity='MONTHLY', metric=metric, top_n=n)
 
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
 
-    result = cost_by_service(start_date, end_date,
-                             granularity='MONTHLY', metric=metric, top_n=n)
-    # Store result in cache
-    cache_service.set(cache_key, result)
-    logger.info("Cached result for key: %s", cache_key)
+@cache_service.cached(immutable=_is_settled_range)
+def cost_deltas_by_service(start_date, end_date, metric='UnblendedCost', top_n=None):
+    """
+    Compare each service's cost with the previous period of the same length.
+    Returns: [{'service', 'amount', 'previous_amount', 'delta', 'delta_percent'}, ...]
+    by descending absolute change.
+    """
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    previous_start = iso_date(start - (end - start))
+    try:
+        store = ce_query_service.get_cost_store(previous_start, end_date, metric=metric)
+    except ClientError as e:
+        logger.error(f"AWS ClientError: {e}")
+        raise
 
+    deltas = store.deltas(start_date, end_date, previous_start, start_date)
+    return [d for d in deltas if d['amount'] or d['previous_amount']][:top_n or None]
 
+
+@cache_service.cached()
 def get_cost_anomalies(start_date, end_date, monitor_arn=None):
     """
     Fetch anomalies detected in the given time window.
     - If monitor_arn is provided, only anomalies for that monitor will be returned.
     Returns a list of anomalies with fields like: { 'AnomalyId','AnomalyStartDate','AnomalyEndDate','TotalImpact','DimensionValue', ... }
     """
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_cost_anomalies:{start_date}:{end_date}"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
+    cost_explorer_client = get_boto_client('ce')
     params = {
         'TimePeriod': {'Start': start_date, 'End': end_date},
         'MaxResults': 100
@@ -194,68 +148,59 @@ def get_cost_anomalies(start_date, end_date, monitor_arn=None):
             'total_estimated_impact': a.get('TotalImpact'),
             'severity': a.get('Severity')
         })
-    # Store result in cache
-    cache_service.set(cache_key, anomalies)
-    logger.info("Cached result for key: %s", cache_key)
     return anomalies
 
 
-def get_cost_data():
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_cost_data"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
+@cache_service.cached(ttl=CACHE_CONFIG.CE_LEDGER_REFRESH_SECONDS)
+def get_local_cost_anomalies(start_date, end_date, metric='UnblendedCost'):
+    """
+    Per-service daily cost anomalies in the given time window, detected locally
+    from the cost ledger (rolling median/MAD) without a Cost Explorer monitor.
+    Returns: [{'id','start','end','dimension','amount','expected','total_estimated_impact',
+    'score','estimated'}, ...] by descending impact.
+    """
+    try:
+        return cost_anomaly_service.detect_anomalies(start_date, end_date, metric=metric)
+    except ClientError as e:
+        logger.error(f"AWS ClientError: {e}")
+        raise
 
-    sts = boto3.client('sts', region_name='us-east-1')
 
+@cache_service.cached()
+def get_cost_data():
     end = datetime.today().date()
     start = end - timedelta(days=30)
 
     # Get AWS Account ID
-    account_id = sts.get_caller_identity()['Account']
+    account_id = get_account_id()
 
-    # Get cost data grouped by service
+    # Get cost by service per month
     try:
-        response = cost_explorer_client.get_cost_and_usage(
-            TimePeriod={'Start': start.isoformat(), 'End': end.isoformat()},
-            Granularity='MONTHLY',
-            Metrics=['UnblendedCost'],
-            GroupBy=[{'Type': 'DIMENSION', 'Key': 'SERVICE'}]
-        )
+        store = ce_query_service.get_cost_store(start.isoformat(), end.isoformat())
     except ClientError as e:
         logger.error(f"AWS ClientError: {e}")
         raise
 
     results = []
-    total_cost = 0.0
-
-    for day in response['ResultsByTime']:
-        for group in day['Groups']:
-            cost = float(group['Metrics']['UnblendedCost']['Amount'])
-            total_cost += cost
+    for period in store.periods(start.isoformat(), end.isoformat(), 'MONTHLY', by_service=True):
+        for i in np.flatnonzero(period['amounts']):
             results.append({
-                'date': day['TimePeriod']['Start'],
-                'service': group['Keys'][0],
-                'cost': cost
+                'date': period['start'],
+                'service': str(store.services[i]),
+                'cost': float(period['amounts'][i])
             })
 
     result = {
         'data': results,
-        'total_cost': total_cost,
+        'total_cost': store.total(start.isoformat(), end.isoformat()),
         'start_date': start.isoformat(),
         'end_date': end.isoformat(),
         'account_id': account_id
     }
-    # Store result in cache
-    cache_service.set(cache_key, result)
-    logger.info("Cached result for key: %s", cache_key)
     return result
 
 
+@cache_service.cached()
 def forecasted_spend(start_date, end_date, metric='UNBLENDED_COST', granularity='DAILY'):
     """
     Get Cost Explorer forecast for the given time window.
@@ -264,14 +209,7 @@ def forecasted_spend(start_date, end_date, metric='UNBLENDED_COST', granularity=
     - granularity: 'DAILY' or 'MONTHLY'
     Returns: {'forecast_result': [{'timestamp':..., 'mean':float,'lower':float,'upper':float}, ...], 'unit': str}
     """
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_cost_data:{start_date}:{end_date}"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
+    cost_explorer_client = get_boto_client('ce')
     try:
         resp = cost_explorer_client.get_cost_forecast(
             TimePeriod={'Start': start_date, 'End': end_date},
@@ -295,116 +233,101 @@ def forecasted_spend(start_date, end_date, metric='UNBLENDED_COST', granularity=
     # Unit is in resp['ForecastResultsByTime'][0]['Unit'] typically
     unit = resp.get('ForecastResultsByTime', [{}])[0].get('Unit')
     result = {'series': series, 'unit': unit}
-    # Store result in cache
-    cache_service.set(cache_key, result)
-    logger.info("Cached result for key: %s", cache_key)
     return result
 
 
+@cache_service.cached(ttl=CACHE_CONFIG.CE_LEDGER_REFRESH_SECONDS)
+def local_forecasted_spend(start_date, end_date, metric='UNBLENDED_COST', granularity='DAILY',
+                           by_service=False, cross_check=False):
+    """
+    Forecast spend for the given time window locally (Holt-Winters over the cost ledger),
+    without a Cost Explorer request per range.
+    - metric: Cost Explorer forecast metric, e.g. 'UNBLENDED_COST' or 'AMORTIZED_COST'
+    - by_service: add a per-service breakdown to each period
+    - cross_check: also call get_cost_forecast and report its total next to the local one
+    Returns: {'series': [{'time_period_start','time_period_end','mean','lower','upper'}, ...],
+    'total': float, 'unit': str}
+    """
+    ledger_metric = ''.join(word.capitalize() for word in metric.split('_'))
+    try:
+        result = cost_forecast_service.forecast_spend(
+            start_date, end_date, metric=ledger_metric, granularity=granularity,
+            by_service=by_service)
+    except ClientError as e:
+        logger.error(f"AWS ClientError: {e}")
+        raise
+
+    if cross_check:
+        try:
+            ce_total = sum(item['mean'] for item in forecasted_spend(
+                start_date, end_date, metric=metric, granularity=granularity)['series'])
+            result['ce_forecast'] = {
+                'total': ce_total,
+                'difference_percent': round((result['total'] - ce_total) / ce_total * 100, 2)
+                if ce_total else None
+            }
+        except ClientError as e:
+            logger.warning(f"Cost Explorer forecast cross-check failed: {e}")
+            result['ce_forecast'] = {'error': str(e)}
+    return result
+
+
+@cache_service.cached(immutable=_is_settled_range)
 def cost_service_and_tag(start_date, end_date, tag_key, granularity='MONTHLY', metric='UnblendedCost'):
     """
     Group cost by service and tag value (two-level grouping).
     Returns a dict: { service_name: [ {tag_value:..., amount:...}, ... ], ... }
     """
-    # Create a unique cache key based on input parameters
-    cache_key = f"cost_service_and_tag:{start_date}:{end_date}:{tag_key}"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-    groups = [
-        {'Type': 'DIMENSION', 'Key': 'SERVICE'},
-        {'Type': 'TAG', 'Key': tag_key}
-    ]
     try:
-        resp = cost_explorer_client.get_cost_and_usage(
-            TimePeriod={'Start': start_date, 'End': end_date},
-            Granularity=granularity,
-            Metrics=[metric],
-            GroupBy=groups
-        )
+        store = ce_query_service.get_cost_store(
+            start_date, end_date, metric=metric, tag_key=tag_key)
     except ClientError as e:
         logger.error(f"AWS ClientError: {e}")
         raise
-    result = {}
-    for timeblock in resp.get('ResultsByTime', []):
-        for g in timeblock.get('Groups', []):
-            keys = g.get('Keys', [])
-            service = keys[0] if len(keys) > 0 else 'Unknown'
-            tag_value = keys[1] if len(keys) > 1 else ''
-            amt = float(g['Metrics'][metric]['Amount'])
-            result.setdefault(service, {})
-            result[service].setdefault(tag_value, 0.0)
-            result[service][tag_value] += amt
-
-    # Convert nested dict to structured
-    out = {svc: [{'tag_value': tv, 'amount': amt}
-                 for tv, amt in vals.items()] for svc, vals in result.items()}
-    # Store result in cache
-    cache_service.set(cache_key, out)
-    logger.info("Cached result for key: %s", cache_key)
+
+    services, tags, amounts = store.service_tag_amounts(start_date, end_date)
+    out = {}
+    for service_index, tag_index, amount in zip(services, tags, amounts):
+        out.setdefault(str(store.services[service_index]), []).append({
+            'tag_value': str(store.tag_values[tag_index]),
+            'amount': float(amount)
+        })
     return out
 
 
+@cache_service.cached(immutable=_is_settled_month)
 def get_daily_cost_trend(year: int, month: int):
     """
-    Returns daily AWS cost trend for a given month.
+    Returns daily AWS cost trend for a given month, as [{'date', 'cost', 'estimated'}, ...]
+    with 'estimated' set for days Cost Explorer still estimates.
     Example: get_daily_cost_trend(2025, 9) → daily costs for Sept 2025
     """
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_daily_cost_trend:{year}:{month}"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
-    # Get first and last day of the month
-    start_date = datetime(year, month, 1)
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        end_date = datetime(year, month + 1, 1) - timedelta(days=1)
+    start_date = date(year, month, 1)
+    # CE is exclusive of End
+    end_date = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
     try:
-        response = cost_explorer_client.get_cost_and_usage(
-            TimePeriod={
-                "Start": start_date.strftime("%Y-%m-%d"),
-                # CE is exclusive of End
-                "End": (end_date + timedelta(days=1)).strftime("%Y-%m-%d"),
-            },
-            Granularity="DAILY",
-            Metrics=["UnblendedCost"]
-        )
+        store = ce_query_service.get_cost_store(start_date.isoformat(), end_date.isoformat())
     except ClientError as e:
         logger.error(f"AWS ClientError: {e}")
         raise
 
-    daily_costs = []
-    for result in response["ResultsByTime"]:
-        day = result["TimePeriod"]["Start"]
-        amount = float(result["Total"]["UnblendedCost"]["Amount"])
-        daily_costs.append({
-            "date": day,
-            "cost": amount
-        })
-    # Store result in cache
-    cache_service.set(cache_key, daily_costs)
-    logger.info("Cached result for key: %s", cache_key)
-    return daily_costs
+    estimated_days = set(ce_query_service.get_estimated_days(
+        start_date.isoformat(), end_date.isoformat()))
+    return [{"date": period["start"], "cost": period["amount"],
+             "estimated": period["start"] in estimated_days}
+            for period in store.periods(start_date.isoformat(), end_date.isoformat(), 'DAILY')]
 
 
 def list_active_cost_allocation_tags():
     """
     Returns all active cost allocation tag keys in your account.
     """
-    response = cost_explorer_client.list_cost_allocation_tags(
+    cost_explorer_client = get_boto_client('ce')
+    tags = paginate(
+        cost_explorer_client, 'list_cost_allocation_tags', 'CostAllocationTags[]',
         Status='Active'  # Only tags that are enabled for cost allocation
     )
-    tags = response.get('CostAllocationTags', [])
-    return tags
+    return list(tags)
 
 
 def tag_exists(tag_key, start_date, end_date):
@@ -412,6 +335,7 @@ def tag_exists(tag_key, start_date, end_date):
     Check if a tag key exists in Cost Explorer data by fetching tag values.
     Returns True if tag has any values in the given time range.
     """
+    cost_explorer_client = get_boto_client('ce')
     try:
         response = cost_explorer_client.get_tags(
             TimePeriod={'Start': iso_date(
@@ -423,64 +347,3 @@ def tag_exists(tag_key, start_date, end_date):
         return len(values) > 0
     except Exception as e:
         return False
-
-
-# def cost_by_tag(start_date, end_date, tag_key):
-#     # tags = get_active_tags()
-#     # if tag_key not in tags:
-#     #     return {"error": f"No active cost allocation tag found for '{tag_key}'."}
-#     # if not tag_exists(tag_key, start_date, end_date):
-#     #     return {"error": f"Tag '{tag_key}' not found in cost data."}
-
-#     response = cost_explorer_client.get_cost_and_usage(
-#         TimePeriod={'Start': iso_date(start_date), 'End': iso_date(end_date)},
-#         Granularity='MONTHLY',
-#         Metrics=['UnblendedCost'],
-#         GroupBy=[{'Type': 'TAG', 'Key': tag_key}]
-#     )
-#     result = []
-#     for group in response['ResultsByTime'][0]['Groups']:
-#         key = group['Keys'][0]
-#         cost = float(group['Metrics']['UnblendedCost']['Amount'])
-#         result.append({'tag_value': key, 'cost': cost})
-#     return result
-
-def cost_by_tag(start_date, end_date, tag_key):
-    # Create a unique cache key based on input parameters
-    cache_key = f"cost_by_tag:{start_date}:{end_date}:{tag_key}"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-    try:
-        response = cost_explorer_client.get_cost_and_usage(
-            TimePeriod={'Start': iso_date(
-                start_date), 'End': iso_date(end_date)},
-            Granularity='MONTHLY',
-            Metrics=['UnblendedCost'],
-            GroupBy=[{'Type': 'TAG', 'Key': tag_key}]
-        )
-    except ClientError as e:
-        logger.error(f"AWS ClientError: {e}")
-        raise
-
-    tag_costs = {}
-
-    # loop through each time period (each month/week depending on granularity)
-    for result in response['ResultsByTime']:
-        for group in result['Groups']:
-            key = group['Keys'][0] or "UnTagged"
-            cost = float(group['Metrics']['UnblendedCost']['Amount'])
-            tag_costs[key] = tag_costs.get(key, 0.0) + cost
-
-    if not tag_costs:
-        return {"error": f"Tag '{tag_key}' not found in cost data."}
-
-    # convert to list of dicts
-    result = [{'tag_value': k, 'cost': v} for k, v in tag_costs.items()]
-    # Store result in cache
-    cache_service.set(cache_key, result)
-    logger.info("Cached result for key: %s", cache_key)
-    return result
@@ -0,0 +1,234 @@
+"""
+Module for columnar, in-memory cost time series.
+
+A CostStore holds one metric's daily costs as NumPy arrays: a sorted day index,
+a (days x services) amount matrix and, when loaded with a tag key, columnar
+(day, service, tag value, amount) arrays for the service x tag breakdown, which
+is too sparse for a dense matrix with thousands of tag values. Totals, top-N,
+period-over-period deltas and service x tag breakdowns are vectorized
+reductions over a day slice, so multi-year ranges answer without Python loops.
+
+Stores are loaded from ledger rows (cost_ledger_service).
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.cost_ledger_service import LedgerRow
+
+DAILY = "DAILY"
+MONTHLY = "MONTHLY"
+
+
+class CostStore:
+    """
+    Daily costs of one metric by service, and optionally by tag value.
+    """
+
+    def __init__(
+        self,
+        days: np.ndarray,
+        services: np.ndarray,
+        tag_values: np.ndarray,
+        day_index: np.ndarray,
+        service_index: np.ndarray,
+        tag_index: np.ndarray,
+        amounts: np.ndarray,
+        unit: Optional[str] = None
+    ):
+        self.days = days
+        self.services = services
+        self.tag_values = tag_values
+        self.unit = unit
+        # Columnar (day, service, tag) rows, kept for tag breakdowns
+        self._day_index = day_index
+        self._service_index = service_index
+        self._tag_index = tag_index
+        self._amounts = amounts
+        self.matrix = np.zeros((len(days), len(services)))
+        np.add.at(self.matrix, (day_index, service_index), amounts)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[LedgerRow], metric: str) -> "CostStore":
+        """
+        Loads a store from ledger rows (day, service, tag value, metric,
+        amount, unit), keeping only the given metric.
+        """
+        rows = [row for row in rows if row[3] == metric]
+        unit = next((row[5] for row in rows if row[5]), None)
+        return cls._from_columns([row[0] for row in rows], [row[1] for row in rows],
+                                 [row[2] for row in rows], [row[4] for row in rows], unit)
+
+    @classmethod
+    def _from_columns(
+        cls,
+        days: List[str],
+        services: List[str],
+        tags: List[str],
+        amounts: List[float],
+        unit: Optional[str]
+    ) -> "CostStore":
+        day_labels, day_index = np.unique(
+            np.array(days, dtype="datetime64[D]"), return_inverse=True)
+        service_labels, service_index = np.unique(
+            np.array(services, dtype=str), return_inverse=True)
+        tag_labels, tag_index = np.unique(
+            np.array(tags, dtype=str), return_inverse=True)
+        return cls(day_labels, service_labels, tag_labels,
+                   day_index.ravel(), service_index.ravel(), tag_index.ravel(),
+                   np.array(amounts, dtype=float), unit)
+
+    def _day_slice(self, start: str, end: str) -> slice:
+        """
+        Rows of the day index within [start, end).
+        """
+        bounds = np.searchsorted(
+            self.days, np.array([start, end], dtype="datetime64[D]"))
+        return slice(int(bounds[0]), int(bounds[1]))
+
+    def total(self, start: str, end: str) -> float:
+        """
+        Total cost of [start, end).
+        """
+        return float(self.matrix[self._day_slice(start, end)].sum())
+
+    def by_service(self, start: str, end: str) -> np.ndarray:
+        """
+        Cost of [start, end) per service, aligned with self.services.
+        """
+        return self.matrix[self._day_slice(start, end)].sum(axis=0)
+
+    def top_services(
+        self,
+        start: str,
+        end: str,
+        n: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Services with costs in [start, end) by descending cost, the top n if
+        given.
+        """
+        costs = self.by_service(start, end)
+        candidates = np.flatnonzero(self.present(start, end)[0])
+        if n and n < len(candidates):
+            order = candidates[np.argpartition(-costs[candidates], n - 1)[:n]]
+        else:
+            order = candidates
+        order = order[np.argsort(-costs[order], kind="stable")]
+        return [(str(self.services[i]), float(costs[i])) for i in order]
+
+    def present(self, start: str, end: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Masks of the services and tag values with rows in [start, end),
+        aligned with self.services and self.tag_values. Zero-cost rows count,
+        as Cost Explorer returns their groups too.
+        """
+        window = self._day_slice(start, end)
+        mask = (self._day_index >= window.start) & (self._day_index < window.stop)
+        services = np.zeros(len(self.services), dtype=bool)
+        services[self._service_index[mask]] = True
+        tag_values = np.zeros(len(self.tag_values), dtype=bool)
+        tag_values[self._tag_index[mask]] = True
+        return services, tag_values
+
+    def periods(
+        self,
+        start: str,
+        end: str,
+        granularity: str = DAILY,
+        by_service: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Costs of [start, end) split into Cost Explorer DAILY or MONTHLY
+        periods, with period boundaries clipped to the range like Cost
+        Explorer. Each period has "start", "end" and "amount", or "amounts"
+        per service when by_service is set.
+        """
+        if granularity not in (DAILY, MONTHLY):
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        first, last = np.array([start, end], dtype="datetime64[D]")
+        unit = "D" if granularity == DAILY else "M"
+        starts = np.arange(first.astype(f"datetime64[{unit}]"),
+                           last.astype(f"datetime64[{unit}]") + 1).astype("datetime64[D]")
+        starts = np.clip(starts, first, last)
+        ends = np.append(starts[1:], last)
+        keep = starts < ends
+        starts, ends = starts[keep], ends[keep]
+
+        # Sum the day rows of each period with one reduceat over the slice
+        window = self.matrix[self._day_slice(start, end)]
+        days = self.days[self._day_slice(start, end)]
+        offsets = np.searchsorted(days, starts)
+        sums = np.zeros((len(starts), len(self.services)))
+        non_empty = offsets < np.append(offsets[1:], len(days))
+        if non_empty.any():
+            sums[non_empty] = np.add.reduceat(window, offsets[non_empty], axis=0)
+
+        results = []
+        for period_start, period_end, row in zip(starts, ends, sums):
+            period = {"start": str(period_start), "end": str(period_end)}
+            if by_service:
+                period["amounts"] = row
+            else:
+                period["amount"] = float(row.sum())
+            results.append(period)
+        return results
+
+    def deltas(
+        self,
+        start: str,
+        end: str,
+        previous_start: str,
+        previous_end: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Per-service cost of [start, end) against [previous_start,
+        previous_end), by descending absolute change.
+        """
+        current = self.by_service(start, end)
+        previous = self.by_service(previous_start, previous_end)
+        change = current - previous
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent = np.where(previous != 0, change / previous * 100, np.nan)
+        order = np.argsort(-np.abs(change), kind="stable")
+        return [{
+            "service": str(self.services[i]),
+            "amount": float(current[i]),
+            "previous_amount": float(previous[i]),
+            "delta": float(change[i]),
+            "delta_percent": None if np.isnan(percent[i]) else round(float(percent[i]), 2),
+        } for i in order]
+
+    def by_tag(self, start: str, end: str) -> np.ndarray:
+        """
+        Cost of [start, end) per tag value, aligned with self.tag_values.
+        """
+        _, tags, amounts = self.service_tag_amounts(start, end)
+        return np.bincount(tags, weights=amounts,
+                           minlength=len(self.tag_values)).astype(float, copy=False)
+
+    def service_tag_amounts(
+        self,
+        start: str,
+        end: str
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Cost of [start, end) per (service, tag value) pair with rows in the
+        range, as sparse (service index, tag index, amount) columns ordered by
+        service and tag; pairs whose costs cancel out are kept with 0.
+        """
+        window = self._day_slice(start, end)
+        mask = (self._day_index >= window.start) & (self._day_index < window.stop)
+        tag_count = max(len(self.tag_values), 1)
+        cells, inverse = np.unique(
+            self._service_index[mask].astype(np.int64) * tag_count + self._tag_index[mask],
+            return_inverse=True)
+        amounts = np.bincount(inverse.ravel(), weights=self._amounts[mask],
+                              minlength=len(cells)).astype(float, copy=False)
+        return cells // tag_count, cells % tag_count, amounts
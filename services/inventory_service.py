@@ -1,63 +1,42 @@
 from datetime import datetime, timedelta
-import boto3
+from botocore.exceptions import ClientError
 
-from services import cache_service
+from services import cache_service, metrics_service, resource_snapshot_service, snapshot_store_service
+from utils.boto3_util import get_boto_client, paginate
+from utils.gevent_util import gevent_map
 import logging
 
 logger = logging.getLogger(__name__)
 
 # ec2 = boto3.client("ec2")
-ec2 = boto3.client("ec2", region_name="us-east-1")
-cw = boto3.client("cloudwatch", region_name="us-east-1")
-s3 = boto3.client("s3", region_name="us-east-1")
-rds = boto3.client("rds", region_name="us-east-1")
-lam = boto3.client("lambda", region_name="us-east-1")
-cw = boto3.client("cloudwatch", region_name="us-east-1")
 
 # ---------- EC2 ----------
 
 
-def list_ec2_instances():
-    # Create a unique cache key based on input parameters
-    cache_key = f"list_ec2_instances"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
+@cache_service.cached(depends_on=[resource_snapshot_service.describe_ec2_instances])
+def list_ec2_instances(region=None, account=None):
+    ec2 = get_boto_client("ec2", region, account)
     instances = []
-    reservations = ec2.describe_instances()["Reservations"]
-
-    for res in reservations:
-        for inst in res["Instances"]:
-            tags = {t["Key"]: t["Value"] for t in inst.get("Tags", [])}
-            instances.append({
-                "id": inst["InstanceId"],
-                "type": inst["InstanceType"],
-                "state": inst["State"]["Name"],
-                "region": ec2.meta.region_name,
-                "tags": tags
-            })
-    # Store result in cache
-    cache_service.set(cache_key, instances)
-    logger.info("Cached result for key: %s", cache_key)
+    for inst in resource_snapshot_service.get_ec2_instances(
+            region=region, account=account):
+        tags = {t["Key"]: t["Value"] for t in inst.get("Tags", [])}
+        instances.append({
+            "id": inst["InstanceId"],
+            "type": inst["InstanceType"],
+            "state": inst["State"]["Name"],
+            "region": ec2.meta.region_name,
+            "tags": tags
+        })
+    snapshot_store_service.save_inventory("ec2", instances, region, account)
     return instances
 
 
 # ---------- EBS ----------
-def list_ebs_volumes():
-    # Create a unique cache key based on input parameters
-    cache_key = f"list_ebs_volumes"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
+@cache_service.cached(depends_on=[resource_snapshot_service.describe_ebs_volumes])
+def list_ebs_volumes(region=None, account=None):
     volumes = []
-    for v in ec2.describe_volumes()["Volumes"]:
+    for v in resource_snapshot_service.get_ebs_volumes(
+            region=region, account=account):
         tags = {t["Key"]: t["Value"] for t in v.get("Tags", [])}
         volumes.append({
             "id": v["VolumeId"],
@@ -68,68 +47,89 @@ def list_ebs_volumes():
             "last_attached": v["Attachments"][0]["AttachTime"].isoformat() if v["Attachments"] else None,
             "Name": tags
         })
-    # Store result in cache
-    cache_service.set(cache_key, volumes)
-    logger.info("Cached result for key: %s", cache_key)
+    snapshot_store_service.save_inventory("ebs", volumes, region, account)
     return volumes
 
 
 # ---------- S3 ----------
-def list_s3_buckets():
-    # Create a unique cache key based on input parameters
-    cache_key = f"list_s3_buckets"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-    buckets = []
-    for b in s3.list_buckets()["Buckets"]:
-        bucket_name = b["Name"]
-
-        # Get encryption
-        try:
-            enc = s3.get_bucket_encryption(Bucket=bucket_name)
-            encryption = enc["ServerSideEncryptionConfiguration"]
-        except:
-            encryption = "None"
-
-        # Get versioning
-        ver = s3.get_bucket_versioning(
+@cache_service.cached()
+def get_s3_bucket_details():
+    """
+    Inspects every bucket once (encryption, versioning, lifecycle) on a bounded
+    greenlet pool. Shared by the S3 inventory and the S3 alerts.
+
+    Settings that are not configured are None; calls that failed are
+    recorded under "errors" by setting.
+    """
+    s3 = get_boto_client("s3")
+    names = [b["Name"] for b in paginate(s3, "list_buckets", "Buckets[]")]
+    results = gevent_map(_describe_bucket, names, return_exceptions=True)
+
+    details = []
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Failed to inspect S3 bucket {name}: {result!r}")
+            result = {"name": name, "encryption": None, "versioning": None,
+                      "lifecycle": None, "errors": {"bucket": repr(result)}}
+        details.append(result)
+    return details
+
+
+def _describe_bucket(bucket_name):
+    s3 = get_boto_client("s3")
+    details = {"name": bucket_name, "encryption": None,
+               "versioning": None, "lifecycle": None, "errors": {}}
+
+    # Get encryption
+    try:
+        enc = s3.get_bucket_encryption(Bucket=bucket_name)
+        details["encryption"] = enc["ServerSideEncryptionConfiguration"]
+    except ClientError as e:
+        if _error_code(e) != "ServerSideEncryptionConfigurationNotFoundError":
+            details["errors"]["encryption"] = str(e)
+
+    # Get versioning
+    try:
+        details["versioning"] = s3.get_bucket_versioning(
             Bucket=bucket_name).get("Status", "Disabled")
+    except ClientError as e:
+        details["errors"]["versioning"] = str(e)
+
+    # Get lifecycle
+    try:
+        details["lifecycle"] = s3.get_bucket_lifecycle_configuration(
+            Bucket=bucket_name)["Rules"]
+    except ClientError as e:
+        if _error_code(e) != "NoSuchLifecycleConfiguration":
+            details["errors"]["lifecycle"] = str(e)
+    return details
 
-        # Get lifecycle
-        try:
-            lifecycle = s3.get_bucket_lifecycle_configuration(
-                Bucket=bucket_name)
-        except:
-            lifecycle = "None"
 
+def _error_code(error):
+    return error.response.get("Error", {}).get("Code")
+
+
+@cache_service.cached(depends_on=[get_s3_bucket_details])
+def list_s3_buckets():
+    buckets = []
+    for bucket in get_s3_bucket_details():
         buckets.append({
-            "name": bucket_name,
-            "versioning": ver,
-            "encryption": encryption,
-            "lifecycle": lifecycle
+            "name": bucket["name"],
+            "versioning": bucket["versioning"],
+            "encryption": bucket["encryption"] or "None",
+            "lifecycle": {"Rules": bucket["lifecycle"]} if bucket["lifecycle"] else "None"
         })
-    # Store result in cache
-    cache_service.set(cache_key, buckets)
-    logger.info("Cached result for key: %s", cache_key)
+    snapshot_store_service.save_inventory(
+        "s3", buckets, snapshot_store_service.GLOBAL_REGION, id_field="name")
     return buckets
 
 
 # ---------- RDS ----------
-def list_rds_instances():
-    # Create a unique cache key based on input parameters
-    cache_key = f"list_rds_instances"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
+@cache_service.cached()
+def list_rds_instances(region=None, account=None):
+    rds = get_boto_client("rds", region, account)
     dbs = []
-    for db in rds.describe_db_instances()["DBInstances"]:
+    for db in paginate(rds, "describe_db_instances", "DBInstances[]"):
         arn = db["DBInstanceArn"]
         tags = {t["Key"]: t["Value"]
                 for t in rds.list_tags_for_resource(ResourceName=arn)["TagList"]}
@@ -140,50 +140,37 @@ def list_rds_instances():
             "storage": db["AllocatedStorage"],
             "tags": tags
         })
-    # Store result in cache
-    cache_service.set(cache_key, dbs)
-    logger.info("Cached result for key: %s", cache_key)
+    snapshot_store_service.save_inventory("rds", dbs, region, account)
     return dbs
 
 
 # ---------- Lambda ----------
-def list_lambda_functions():
-    # Create a unique cache key based on input parameters
-    cache_key = f"list_lambda_functions"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
+@cache_service.cached()
+def list_lambda_functions(region=None, account=None):
+    lam = get_boto_client("lambda", region, account)
+    cw = get_boto_client("cloudwatch", region, account)
     functions = []
-    for f in lam.list_functions()["Functions"]:
+    lambda_functions = list(paginate(lam, "list_functions", "Functions[]"))
+    names = [f["FunctionName"] for f in lambda_functions]
+
+    # Example: Get invocation count vs errors (last 1 hour)
+    window = {
+        "stat": "Sum",
+        "period": 300,
+        "start_time": datetime.utcnow() - timedelta(hours=1),
+        "end_time": datetime.utcnow(),
+    }
+    inv = metrics_service.get_metric_values(
+        cw, "AWS/Lambda", "Invocations", "FunctionName", names, **window)
+    err = metrics_service.get_metric_values(
+        cw, "AWS/Lambda", "Errors", "FunctionName", names, **window)
+
+    for f in lambda_functions:
         name = f["FunctionName"]
         mem = f["MemorySize"]
         timeout = f["Timeout"]
-
-        # Example: Get invocation count vs errors (last 1 hour)
-        inv = cw.get_metric_statistics(
-            Namespace="AWS/Lambda",
-            MetricName="Invocations",
-            Dimensions=[{"Name": "FunctionName", "Value": name}],
-            StartTime=datetime.utcnow() - timedelta(hours=1),
-            EndTime=datetime.utcnow(),
-            Period=300,
-            Statistics=["Sum"]
-        )
-        err = cw.get_metric_statistics(
-            Namespace="AWS/Lambda",
-            MetricName="Errors",
-            Dimensions=[{"Name": "FunctionName", "Value": name}],
-            StartTime=datetime.utcnow() - timedelta(hours=1),
-            EndTime=datetime.utcnow(),
-            Period=300,
-            Statistics=["Sum"]
-        )
-        invocations = inv["Datapoints"][0]["Sum"] if inv["Datapoints"] else 0
-        errors = err["Datapoints"][0]["Sum"] if err["Datapoints"] else 0
+        invocations = sum(inv[name])
+        errors = sum(err[name])
 
         functions.append({
             "name": name,
@@ -192,7 +179,6 @@ def list_lambda_functions():
             "invocations": invocations,
             "errors": errors
         })
-    # Store result in cache
-    cache_service.set(cache_key, functions)
-    logger.info("Cached result for key: %s", cache_key)
+    snapshot_store_service.save_inventory(
+        "lambda", functions, region, account, id_field="name")
     return functions
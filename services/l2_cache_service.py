@@ -0,0 +1,210 @@
+"""
+Module for the shared second-level (L2) cache.
+
+Each gunicorn worker keeps its own in-process L1 cache in cache_service. The
+L2 backend configured here is shared by all workers on a host (sqlite file) or
+across hosts (Redis), so a result fetched from AWS by one worker is reused by
+the others instead of being fetched again.
+
+Backends store opaque bytes; serialization and expiry semantics belong to
+cache_service. Backends are selected with CACHE_L2_BACKEND:
+    - ""       : no L2 cache (default)
+    - "sqlite" : local file at CACHE_L2_SQLITE_PATH
+    - "redis"  : any Redis-compatible server at CACHE_L2_REDIS_URL
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import logging
+import os
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from utils.env_config import CACHE_CONFIG
+from utils.storage_util import create_dir_path, get_dir_from_path
+
+logger = logging.getLogger(__name__)
+
+SQLITE_BACKEND = "sqlite"
+REDIS_BACKEND = "redis"
+
+
+class CacheBackend:
+    """
+    Interface for L2 cache backends.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the stored bytes for key, or None if absent or expired.
+        """
+        raise NotImplementedError
+
+    def set(self, key: str, data: bytes, expire_at: Optional[datetime]) -> None:
+        """
+        Stores bytes for key until expire_at (naive UTC), or forever if None.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """
+        Removes key from the backend.
+        """
+        raise NotImplementedError
+
+    def delete_namespace(self, namespace: str) -> None:
+        """
+        Removes the key equal to namespace and every key prefixed "namespace:".
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """
+        Removes every key owned by this cache from the backend.
+        """
+        raise NotImplementedError
+
+    def sweep(self) -> None:
+        """
+        Removes expired keys, for backends without native expiry.
+        """
+
+
+class SqliteCacheBackend(CacheBackend):
+    """
+    L2 backend on a local sqlite file shared by all workers on the host.
+
+    Connections are opened lazily per process so the backend is safe to create
+    before gunicorn forks its workers.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            directory = get_dir_from_path(self.path)
+            if directory:
+                create_dir_path(directory)
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, data BLOB NOT NULL, expire_at REAL)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            "SELECT data, expire_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        data, expire_at = row
+        if expire_at is not None and expire_at < _epoch(datetime.utcnow()):
+            return None
+        return data
+
+    def set(self, key: str, data: bytes, expire_at: Optional[datetime]) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, data, expire_at) VALUES (?, ?, ?)",
+            (key, sqlite3.Binary(data), _epoch(expire_at) if expire_at else None))
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def delete_namespace(self, namespace: str) -> None:
+        self._connection().execute(
+            "DELETE FROM cache WHERE key = ? OR substr(key, 1, ?) = ?",
+            (namespace, len(namespace) + 1, namespace + ":"))
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM cache")
+
+    def sweep(self) -> None:
+        self._connection().execute(
+            "DELETE FROM cache WHERE expire_at IS NOT NULL AND expire_at < ?",
+            (_epoch(datetime.utcnow()),))
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    L2 backend on a Redis-compatible server shared by every worker and host.
+
+    Keys are namespaced with CACHE_L2_KEY_PREFIX and expire natively.
+    """
+
+    def __init__(self, url: str = None, prefix: str = "", client: Any = None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, data: bytes, expire_at: Optional[datetime]) -> None:
+        if expire_at is None:
+            self.client.set(self.prefix + key, data)
+            return
+        ttl_ms = int((_epoch(expire_at) - _epoch(datetime.utcnow())) * 1000)
+        if ttl_ms > 0:
+            self.client.set(self.prefix + key, data, px=ttl_ms)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def delete_namespace(self, namespace: str) -> None:
+        pattern = _escape_glob(self.prefix + namespace) + ":*"
+        keys = list(self.client.scan_iter(match=pattern))
+        self.client.delete(self.prefix + namespace, *keys)
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(
+            match=_escape_glob(self.prefix) + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def create_backend() -> Optional[CacheBackend]:
+    """
+    Creates the L2 backend selected by CACHE_L2_BACKEND.
+
+    :return: Optional[CacheBackend]
+        The backend, or None if no L2 cache is configured.
+    """
+    backend = (CACHE_CONFIG.CACHE_L2_BACKEND or "").lower()
+    if not backend:
+        return None
+    if backend == SQLITE_BACKEND:
+        logger.info("Using sqlite L2 cache at %s",
+                    CACHE_CONFIG.CACHE_L2_SQLITE_PATH)
+        return SqliteCacheBackend(CACHE_CONFIG.CACHE_L2_SQLITE_PATH)
+    if backend == REDIS_BACKEND:
+        logger.info("Using Redis L2 cache")
+        return RedisCacheBackend(CACHE_CONFIG.CACHE_L2_REDIS_URL,
+                                 prefix=CACHE_CONFIG.CACHE_L2_KEY_PREFIX)
+    raise ValueError(f"Unsupported CACHE_L2_BACKEND: {backend}")
+
+
+def _escape_glob(text: str) -> str:
+    """
+    Escapes Redis glob metacharacters in a literal key prefix.
+    """
+    return "".join("\\" + c if c in "*?[]\\" else c for c in text)
+
+
+def _epoch(dt: datetime) -> float:
+    """
+    Converts a naive UTC datetime to a POSIX timestamp.
+    """
+    return dt.replace(tzinfo=timezone.utc).timestamp()
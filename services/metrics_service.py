@@ -0,0 +1,219 @@
+"""
+Module for batched CloudWatch metric retrieval.
+
+Utilisation checks need one metric series per resource. Fetching them with
+get_metric_statistics costs one sequential round-trip per resource; this module
+packs up to MAX_QUERIES_PER_REQUEST series into each GetMetricData call, pages
+through NextToken and returns the datapoints keyed by the caller's resource
+ids, so a fleet of thousands of resources takes a handful of calls.
+
+get_metric_matrix() returns the same series as a resources x periods NumPy
+matrix aligned on the period grid, with NaN where a period has no datapoint,
+for vectorized classification (utilisation_classifier_service).
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_UTC = timezone.utc
+
+# GetMetricData accepts at most 500 MetricDataQueries per request
+MAX_QUERIES_PER_REQUEST = 500
+
+
+def get_metric_data(
+    client: Any,
+    queries: List[Dict[str, Any]],
+    start_time: datetime,
+    end_time: datetime
+) -> Dict[str, List[float]]:
+    """
+    Fetches many metric series with as few GetMetricData calls as possible.
+
+    Args:
+        client: CloudWatch client.
+        queries (List[Dict[str, Any]]): One dict per series with keys
+            "key" (unique id for the result), "namespace", "metric_name",
+            "dimensions" ({name: value}), "stat" and "period" (seconds).
+        start_time (datetime): Start of the window (UTC).
+        end_time (datetime): End of the window (UTC).
+
+    Returns:
+        Dict[str, List[float]]: Datapoint values in ascending time order by
+        query key; empty for series without data.
+    """
+    return {key: values for key, (_, values)
+            in _get_metric_series(client, queries, start_time, end_time).items()}
+
+
+def _get_metric_series(
+    client: Any,
+    queries: List[Dict[str, Any]],
+    start_time: datetime,
+    end_time: datetime
+) -> Dict[str, Tuple[List[datetime], List[float]]]:
+    """
+    Fetches the series of get_metric_data() with their timestamps.
+    """
+    results: Dict[str, Tuple[List[datetime], List[float]]] = {
+        query["key"]: ([], []) for query in queries}
+    for offset in range(0, len(queries), MAX_QUERIES_PER_REQUEST):
+        batch = queries[offset:offset + MAX_QUERIES_PER_REQUEST]
+        keys = {f"q{index}": query["key"] for index, query in enumerate(batch)}
+        request = {
+            "MetricDataQueries": [_to_metric_data_query(f"q{index}", query)
+                                  for index, query in enumerate(batch)],
+            "StartTime": start_time,
+            "EndTime": end_time,
+            "ScanBy": "TimestampAscending",
+        }
+        calls = 0
+        while True:
+            response = client.get_metric_data(**request)
+            calls += 1
+            for result in response.get("MetricDataResults", []):
+                timestamps, values = results[keys[result["Id"]]]
+                timestamps.extend(result.get("Timestamps", []))
+                values.extend(result.get("Values", []))
+            for message in response.get("Messages", []):
+                logger.warning("GetMetricData: %s", message.get("Value"))
+            next_token = response.get("NextToken")
+            if not next_token:
+                break
+            request["NextToken"] = next_token
+        logger.info("Fetched %d metric series in %d GetMetricData calls",
+                    len(batch), calls)
+    return results
+
+
+def get_metric_values(
+    client: Any,
+    namespace: str,
+    metric_name: str,
+    dimension_name: str,
+    resources: Union[List[str], Dict[str, str]],
+    stat: str,
+    period: int,
+    start_time: datetime,
+    end_time: datetime
+) -> Dict[str, List[float]]:
+    """
+    Fetches the same metric for many resources identified by one dimension.
+
+    Args:
+        resources (Union[List[str], Dict[str, str]]): Dimension values, or a
+            mapping of result key to dimension value when they differ.
+
+    Returns:
+        Dict[str, List[float]]: Datapoint values by resource.
+    """
+    return get_metric_data(client, _to_queries(
+        namespace, metric_name, dimension_name, resources, stat, period),
+        start_time, end_time)
+
+
+def get_metric_matrix(
+    client: Any,
+    namespace: str,
+    metric_name: str,
+    dimension_name: str,
+    resources: Union[List[str], Dict[str, str]],
+    stat: str,
+    period: int,
+    start_time: datetime,
+    end_time: datetime
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Fetches the same metric for many resources as a resources x periods
+    matrix.
+
+    Args:
+        resources (Union[List[str], Dict[str, str]]): Dimension values, or a
+            mapping of result key to dimension value when they differ.
+
+    Returns:
+        Tuple[List[str], np.ndarray]: The resource keys, and a float matrix
+        with one row per key and one column per period from start_time
+        rounded down to a multiple of period, NaN where CloudWatch returned
+        no datapoint.
+    """
+    queries = _to_queries(namespace, metric_name, dimension_name, resources,
+                          stat, period)
+    # CloudWatch aligns datapoints to a rounded StartTime; querying from a
+    # period boundary puts each datapoint exactly on a column
+    start = (start_time if start_time.tzinfo else start_time.replace(tzinfo=_UTC)).timestamp()
+    start -= start % period
+    aligned_start = datetime.fromtimestamp(start, _UTC)
+    if not start_time.tzinfo:
+        aligned_start = aligned_start.replace(tzinfo=None)
+    series = _get_metric_series(client, queries, aligned_start, end_time)
+    keys = [query["key"] for query in queries]
+    end = (end_time if end_time.tzinfo else end_time.replace(tzinfo=_UTC)).timestamp()
+    periods = max(1, -(-int(end - start) // period))
+    matrix = np.full((len(keys), periods), np.nan)
+    for row, key in enumerate(keys):
+        timestamps, values = series[key]
+        if not values:
+            continue
+        offsets = np.array([timestamp.timestamp() for timestamp in timestamps])
+        columns = np.rint((offsets - start) / period).astype(int)
+        keep = (columns >= 0) & (columns < periods)
+        columns, values = columns[keep], np.array(values, dtype=float)[keep]
+        if len(np.unique(columns)) < len(columns):
+            # Several datapoints per period: sums add up, other statistics
+            # keep the latest datapoint
+            logger.warning("%s %s of %s has several datapoints per %ds period",
+                           namespace, metric_name, key, period)
+            if stat in ("Sum", "SampleCount"):
+                matrix[row, np.unique(columns)] = 0.0
+                np.add.at(matrix[row], columns, values)
+                continue
+        matrix[row, columns] = values
+    return keys, matrix
+
+
+def _to_queries(
+    namespace: str,
+    metric_name: str,
+    dimension_name: str,
+    resources: Union[List[str], Dict[str, str]],
+    stat: str,
+    period: int
+) -> List[Dict[str, Any]]:
+    if not isinstance(resources, dict):
+        resources = {resource: resource for resource in resources}
+    return [{
+        "key": key,
+        "namespace": namespace,
+        "metric_name": metric_name,
+        "dimensions": {dimension_name: value},
+        "stat": stat,
+        "period": period,
+    } for key, value in resources.items()]
+
+
+def _to_metric_data_query(query_id: str, query: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "Id": query_id,
+        "MetricStat": {
+            "Metric": {
+                "Namespace": query["namespace"],
+                "MetricName": query["metric_name"],
+                "Dimensions": [{"Name": name, "Value": value}
+                               for name, value in query["dimensions"].items()],
+            },
+            "Period": query["period"],
+            "Stat": query["stat"],
+        },
+        "ReturnData": True,
+    }
@@ -3,18 +3,16 @@
 # Proprietary and confidential
 # See file LICENSE.txt for full license details.
 
-import boto3
 import os
 import uuid
 import logging
 import html
 from botocore.exceptions import BotoCoreError, ClientError
+from utils.boto3_util import get_boto_client
 
 AUDIO_DIR = "tts_audio"
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
-polly_client = boto3.client("polly")
-
 def synthesize_speech(text: str, speed: float = 1.0) -> str:
     if not text.strip():
         raise ValueError("Text is empty or invalid.")
@@ -29,6 +27,7 @@ def synthesize_speech(text: str, speed: float = 1.0) -> str:
     ssml_text = f"<speak><prosody rate='{rate_percent}'>{text}</prosody></speak>"
 
     try:
+        polly_client = get_boto_client("polly")
         response = polly_client.synthesize_speech(
             TextType="ssml",
             Text=ssml_text,
@@ -1,33 +1,31 @@
 from typing import Dict, List
-import boto3
 import logging
-from services import cache_service
+from services import cache_service, resource_snapshot_service
+from utils.boto3_util import get_boto_client, paginate
 logger = logging.getLogger(__name__)
 
-compute_optimizer_client = boto3.client(
-    'compute-optimizer', region_name="us-east-1")
-cost_explorer_client = boto3.client(
-    'ce', region_name="us-east-1")  # Cost Explorer
-ec2 = boto3.client('ec2', region_name='us-east-1')
 
 # AWS public IPv4 charge (USD/hour) effective Feb 1, 2024
 USD_PER_IP_PER_HOUR = 0.005
 
 
-def get_ec2_rightsizing_recommendations():
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_ec2_rightsizing_recommendations"
+def _is_placeholder(result) -> bool:
+    """
+    Returns True for placeholder results (a single "info" or "error" entry),
+    which are negative-cached so failing calls are retried with backoff.
+    """
+    return (len(result) == 1 and isinstance(result[0], dict)
+            and ("info" in result[0] or "error" in result[0]))
 
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
+
+@cache_service.cached(negative_if=_is_placeholder)
+def get_ec2_rightsizing_recommendations(region=None):
+    compute_optimizer_client = get_boto_client('compute-optimizer', region)
     results = []
 
     try:
-        response = compute_optimizer_client.get_ec2_instance_recommendations()
-        recs = response.get("instanceRecommendations", [])
+        recs = paginate(compute_optimizer_client,
+                        "get_ec2_instance_recommendations", "instanceRecommendations[]")
 
         for rec in recs:
             finding = rec.get("finding", "Optimized")
@@ -58,10 +56,6 @@ def get_ec2_rightsizing_recommendations():
                 "MonthlySavingsUSD": round(monthly_saving_usd, 2)
             })
         result = results or [{"info": "No rightsizing recommendations found"}]
-        # Store result in cache
-        if results:
-            cache_service.set(cache_key, results)
-            logger.info("Cached result for key: %s", cache_key)
 
         return result
 
@@ -76,20 +70,14 @@ def get_ec2_rightsizing_recommendations():
 #     except Exception as e:
 #         return [{'error': str(e)}]
 
-def get_ebs_rightsizing_recommendations():
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_ebs_rightsizing_recommendations"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
+@cache_service.cached(negative_if=_is_placeholder)
+def get_ebs_rightsizing_recommendations(region=None):
+    compute_optimizer_client = get_boto_client('compute-optimizer', region)
     results = []
 
     try:
-        response = compute_optimizer_client.get_ebs_volume_recommendations()
-        recs = response.get("volumeRecommendations", [])
+        recs = paginate(compute_optimizer_client,
+                        "get_ebs_volume_recommendations", "volumeRecommendations[]")
 
         for rec in recs:
             volume_arn = rec.get("volumeArn", "")
@@ -122,79 +110,43 @@ def get_ebs_rightsizing_recommendations():
 
         result = results or [
             {"info": "No EBS rightsizing recommendations found"}]
-        if results:
-            cache_service.set(cache_key, results)
-            logger.info("Cached result for key: %s", cache_key)
         return result
     except Exception as e:
         return [{"error": str(e)}]
 
 
-def get_unattached_ebs_volumes(region='us-east-1'):
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_unattached_ebs_volumes"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
-    volumes = ec2.describe_volumes(
-        Filters=[{'Name': 'status', 'Values': ['available']}])
-    result = [v['VolumeId'] for v in volumes['Volumes']]
-    cache_service.set(cache_key, result)
-    logger.info("Cached result for key: %s", cache_key)
-    return result
+@cache_service.cached(namespace="recommend_unattached_ebs_volumes",
+                       depends_on=[resource_snapshot_service.describe_ebs_volumes])
+def get_unattached_ebs_volumes(region=None):
+    volumes = resource_snapshot_service.get_ebs_volumes(
+        statuses=['available'], region=region)
+    return [v['VolumeId'] for v in volumes]
 
 
-def get_unassociated_elastic_ips(region='us-east-1'):
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_unassociated_elastic_ips"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
+@cache_service.cached()
+def get_unassociated_elastic_ips(region=None):
+    ec2 = get_boto_client('ec2', region)
     addresses = ec2.describe_addresses()
     unattached_eips = [a['PublicIp']
                        for a in addresses['Addresses'] if 'InstanceId' not in a]
     result = {"unattached_eips": unattached_eips,
               "cost_savings": eip_cost_estimate(unattached_eips)}
-    cache_service.set(cache_key, result)
-    logger.info("Cached result for key: %s", cache_key)
     return result
 
 
-def get_inactive_nat_gateways(region='us-east-1'):
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_inactive_nat_gateways"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-    nats = ec2.describe_nat_gateways(
-        Filters=[{'Name': 'state', 'Values': ['available', 'pending']}])
+@cache_service.cached()
+def get_inactive_nat_gateways(region=None):
+    ec2 = get_boto_client('ec2', region)
+    nats = paginate(ec2, 'describe_nat_gateways', 'NatGateways[]',
+                    Filters=[{'Name': 'state', 'Values': ['available', 'pending']}])
     result = [nat['NatGatewayId']
-              for nat in nats['NatGateways'] if nat['State'] != 'available']
-    cache_service.set(cache_key, result)
-    logger.info("Cached result for key: %s", cache_key)
+              for nat in nats if nat['State'] != 'available']
     return result
 
 
+@cache_service.cached(negative_if=_is_placeholder)
 def get_reserved_instance_savings_opportunities(service='Amazon Elastic Compute Cloud - Compute'):
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_reserved_instance_savings_opportunities"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
+    cost_explorer_client = get_boto_client('ce')
     try:
         response = cost_explorer_client.get_reservation_purchase_recommendation(
             Service=service,
@@ -219,23 +171,14 @@ def get_reserved_instance_savings_opportunities(service='Amazon Elastic Compute
             })
 
         result = results or [{"info": "No RI purchase recommendations found"}]
-        if results:
-            cache_service.set(cache_key, result)
-            logger.info("Cached result for key: %s", cache_key)
         return result
     except Exception as e:
         return [{"error": str(e)}]
 
 
+@cache_service.cached(negative_if=_is_placeholder)
 def get_savings_plans_opportunities():
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_savings_plans_opportunities"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
+    cost_explorer_client = get_boto_client('ce')
     try:
         response = cost_explorer_client.get_savings_plans_purchase_recommendation(
             SavingsPlansType='COMPUTE_SP',
@@ -285,31 +228,15 @@ def get_savings_plans_opportunities():
 
         result = concise_data or [
             {"info": "No meaningful savings recommendations found"}]
-        if concise_data:
-            cache_service.set(cache_key, concise_data)
-            logger.info("Cached result for key: %s", cache_key)
+        return result
     except Exception as e:
         return [{"error": str(e)}]
 
 
-def get_ec2_instances_without_tags(region='us-east-1'):
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_ec2_instances_without_tags"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-    instances = ec2.describe_instances()
-    untagged = []
-    for reservation in instances['Reservations']:
-        for instance in reservation['Instances']:
-            if 'Tags' not in instance or len(instance['Tags']) == 0:
-                untagged.append(instance['InstanceId'])
-    cache_service.set(cache_key, untagged)
-    logger.info("Cached result for key: %s", cache_key)
-    return untagged
+@cache_service.cached(depends_on=[resource_snapshot_service.describe_ec2_instances])
+def get_ec2_instances_without_tags(region=None):
+    untagged = resource_snapshot_service.get_untagged_ec2_instances(region)
+    return [instance['InstanceId'] for instance in untagged]
 
 
 def eip_cost_estimate(
@@ -325,14 +252,6 @@ def eip_cost_estimate(
     - days_in_month: use 30 by default (adjust if you want calendar month)
     - usd_to_inr: conversion rate to INR (supply live rate if you want accuracy)
     """
-    # Create a unique cache key based on input parameters
-    cache_key = f"eip_cost_estimate"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
     count = len(eip_list)
     hours_per_month = 24 * days_in_month
 
@@ -350,8 +269,6 @@ def eip_cost_estimate(
             "days_in_month": days_in_month,
         }
     }
-    cache_service.set(cache_key, result)
-    logger.info("Cached result for key: %s", cache_key)
     return result
 
 
@@ -0,0 +1,99 @@
+"""
+Module for running regional checks across several AWS regions.
+
+Regional service functions take a region argument (None for AWS_REGION) and are
+cached per region through their call signature. for_regions() runs such a
+function for every requested region concurrently, each with its own regional
+clients, and merges the results into one list whose items carry a "region"
+field, so a multi-region scan takes about as long as its slowest region.
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from services import cache_service
+from utils.boto3_util import get_boto_client
+from utils.env_config import AWS_CONFIG
+from utils.gevent_util import gevent_map
+
+logger = logging.getLogger(__name__)
+
+ALL_REGIONS = "all"
+
+
+@cache_service.cached()
+def get_enabled_regions() -> List[str]:
+    """
+    Returns the regions enabled for the account, or AWS_FANOUT_REGIONS if set.
+    """
+    if AWS_CONFIG.AWS_FANOUT_REGIONS:
+        return AWS_CONFIG.AWS_FANOUT_REGIONS
+    ec2 = get_boto_client("ec2")
+    return sorted(region["RegionName"]
+                  for region in ec2.describe_regions()["Regions"])
+
+
+def resolve_regions(regions: str) -> List[str]:
+    """
+    Parses a regions argument: "all" or a comma separated list of regions.
+    """
+    if regions.strip().lower() == ALL_REGIONS:
+        return get_enabled_regions()
+    return [region.strip() for region in regions.split(",") if region.strip()]
+
+
+def for_regions(
+    func: Callable[..., Any],
+    regions: Optional[str] = None,
+    region: Optional[str] = None,
+    **kwargs: Any
+) -> Any:
+    """
+    Calls a regional function for one region, or for several regions
+    concurrently.
+
+    :param regions: Optional[str]
+        "all" or a comma separated list of regions. If empty, func is called
+        once for region and its result is returned unchanged.
+    :param region: Optional[str]
+        Single region to use when regions is empty; None for AWS_REGION.
+    :return: Any
+        func's result, or with regions a merged list of items tagged with
+        their region. Regions that fail contribute an {"region", "error"} item.
+    """
+    if not regions:
+        return func(region=region, **kwargs)
+
+    region_list = resolve_regions(regions)
+    results = gevent_map(lambda r: func(region=r, **kwargs), region_list,
+                         concurrency=len(region_list) or 1,
+                         timeout=AWS_CONFIG.AWS_REGION_TIMEOUT_SECONDS,
+                         return_exceptions=True)
+    merged = []
+    for name, result in zip(region_list, results):
+        if isinstance(result, BaseException):
+            logger.error(f"{func.__name__} failed in region {name}: {result!r}")
+            merged.append({"region": name, "error": str(result) or repr(result)})
+        else:
+            merged.extend(tag_results(result, region=name))
+    return merged
+
+
+def tag_results(result: Any, **fields: str) -> List[Dict[str, Any]]:
+    """
+    Converts one scan's result into a list of items carrying the given fields
+    (e.g. region=...). Non-dict items become {"id": item}; fields already set
+    on an item are kept.
+    """
+    items = result if isinstance(result, list) else [result]
+    tagged = []
+    for item in items:
+        if not isinstance(item, dict):
+            item = {"id": item}
+        tagged.append({**fields, **item})
+    return tagged
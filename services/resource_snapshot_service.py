@@ -0,0 +1,104 @@
+"""
+Module for shared EC2 and EBS describe snapshots.
+
+Inventory, utilisation, alerts and recommendations all look at the same
+instances and volumes. Rather than each of them calling describe_instances or
+describe_volumes, they read a snapshot taken by one paginated describe per
+resource type and refresh window (see the describe_* TTL policies), and filter
+it in memory through the derived views below.
+
+Functions built from a snapshot declare it with @cached(depends_on=...), so
+they are invalidated together whenever the snapshot is refreshed and every
+view of the account reflects the same describe. Snapshots are taken per region
+and account (None for AWS_REGION and the default credentials) and every view
+takes the region and account it reads.
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from services import cache_service
+from utils.boto3_util import get_boto_client, paginate
+
+logger = logging.getLogger(__name__)
+
+
+@cache_service.cached()
+def describe_ec2_instances(
+    region: Optional[str] = None,
+    account: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Returns every EC2 instance in the region, in all states, as returned by
+    describe_instances.
+    """
+    ec2 = get_boto_client("ec2", region, account)
+    instances = list(paginate(
+        ec2, "describe_instances", "Reservations[].Instances[]"))
+    logger.info("Described %d EC2 instances in %s",
+                len(instances), ec2.meta.region_name)
+    return instances
+
+
+@cache_service.cached()
+def describe_ebs_volumes(
+    region: Optional[str] = None,
+    account: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Returns every EBS volume in the region as returned by describe_volumes.
+    """
+    ec2 = get_boto_client("ec2", region, account)
+    volumes = list(paginate(ec2, "describe_volumes", "Volumes[]"))
+    logger.info("Described %d EBS volumes in %s",
+                len(volumes), ec2.meta.region_name)
+    return volumes
+
+
+def get_ec2_instances(
+    states: Optional[Iterable[str]] = None,
+    region: Optional[str] = None,
+    account: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Returns the snapshot's instances, optionally only those in the given
+    states (e.g. ["stopped"]).
+    """
+    instances = describe_ec2_instances(region, account)
+    if states is None:
+        return instances
+    states = frozenset(states)
+    return [instance for instance in instances
+            if instance["State"]["Name"] in states]
+
+
+def get_untagged_ec2_instances(
+    region: Optional[str] = None,
+    account: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Returns the snapshot's instances without any tags.
+    """
+    return [instance for instance in describe_ec2_instances(region, account)
+            if not instance.get("Tags")]
+
+
+def get_ebs_volumes(
+    statuses: Optional[Iterable[str]] = None,
+    region: Optional[str] = None,
+    account: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Returns the snapshot's volumes, optionally only those in the given states
+    (e.g. ["available"] for unattached volumes).
+    """
+    volumes = describe_ebs_volumes(region, account)
+    if statuses is None:
+        return volumes
+    statuses = frozenset(statuses)
+    return [volume for volume in volumes if volume["State"] in statuses]
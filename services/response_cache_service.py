@@ -0,0 +1,165 @@
+"""
+Module for caching serialized HTTP responses.
+
+Service results are cached as Python objects by cache_service, but every hit
+still pays for jsonify() over structures such as the full inventory. Routes
+decorated with @cached_response store the final JSON body, gzip-compressed
+when it is large enough, and serve those bytes directly on later requests.
+
+Entries are keyed by view, the normalized query string and the current UTC
+date (routes default their date windows to "today"), and live in the
+"response.<module>.<view>" namespace of cache_service. Each response namespace is
+registered as a dependent of the service namespaces it is built from, so it is
+invalidated whenever one of them is refreshed or invalidated, and its TTL is
+the shortest TTL among them. A response is not cached when any of its
+service results was computed but not cached itself.
+
+Responses built while a dependency holds negative-cached (error or
+placeholder) results carry an X-Cache-Negative header naming those namespaces
+and the seconds until they are retried, and are only cached until then.
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import functools
+import gzip
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from flask import Response, make_response, request
+
+from services import cache_service
+from utils.env_config import CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_NAMESPACE_PREFIX = "response."
+GZIP_ENCODING = "gzip"
+CACHE_STATUS_HEADER = "X-Cache"
+NEGATIVE_CACHE_HEADER = "X-Cache-Negative"
+
+
+def cached_response(
+    *depends_on: Union[str, Callable[..., Any]],
+    ttl: Optional[int] = None
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator caching a Flask view's serialized JSON response.
+
+    Only 200 responses with a JSON body are cached. The X-Cache response
+    header reports HIT or MISS, and X-Cache-Negative lists dependencies
+    currently served from the negative cache.
+
+    :param depends_on: Union[str, Callable[..., Any]]
+        Cache namespaces, or @cached service functions, the response is built
+        from.
+    :param ttl: Optional[int]
+        Lifetime in seconds; defaults to the shortest TTL of depends_on.
+    """
+    namespaces = [getattr(dependency, "cache_namespace", dependency)
+                  for dependency in depends_on]
+
+    def decorator(view: Callable[..., Any]) -> Callable[..., Any]:
+        namespace = f"{RESPONSE_NAMESPACE_PREFIX}{view.__module__}.{view.__name__}"
+        for dependency in namespaces:
+            cache_service.add_dependent(dependency, namespace)
+
+        @functools.wraps(view)
+        def wrapper(*args: Any, **kwargs: Any) -> Response:
+            key = cache_service.make_key(namespace, _request_arguments())
+            entry = cache_service.get(key)
+            if entry is not None:
+                return _to_response(entry, "HIT")
+
+            uncached_before = _uncached_count(namespaces)
+            response = make_response(view(*args, **kwargs))
+            if not _is_cacheable(response):
+                return response
+
+            entry = _to_entry(response)
+            entry["negative"] = cache_service.get_negative_state(namespaces)
+            response_ttl = _response_ttl(entry, ttl or _default_ttl(namespaces))
+            if _uncached_count(namespaces) == uncached_before and response_ttl > 0:
+                cache_service.set(key, entry, ttl=response_ttl, stale_ttl=0)
+            return _to_response(entry, "MISS")
+
+        return wrapper
+    return decorator
+
+
+def _request_arguments() -> Dict[str, Any]:
+    """
+    Normalized query arguments plus the current UTC date.
+    """
+    arguments = {key: sorted(value for value in values if value != "")
+                 for key, values in request.args.lists()}
+    arguments = {key: values for key, values in arguments.items() if values}
+    arguments["_date"] = datetime.utcnow().date().isoformat()
+    return arguments
+
+
+def _uncached_count(namespaces: List[str]) -> int:
+    return sum(cache_service.uncached[namespace] for namespace in namespaces)
+
+
+def _default_ttl(namespaces: List[str]) -> int:
+    ttls = [ttl for ttl in map(cache_service.get_ttl, namespaces)
+            if ttl is not None]
+    return min(ttls) if ttls else CACHE_CONFIG.CACHE_DEFAULT_TTL_SECONDS
+
+
+def _response_ttl(entry: Dict[str, Any], ttl: int) -> int:
+    """
+    Caps ttl so a response built from negative-cached results expires with
+    the first of them.
+    """
+    if not entry["negative"]:
+        return ttl
+    return min(ttl, min(_seconds_until(retry_at)
+                        for retry_at in entry["negative"].values()))
+
+
+def _seconds_until(moment: datetime) -> int:
+    return max(0, int((moment - datetime.utcnow()).total_seconds()))
+
+
+def _is_cacheable(response: Response) -> bool:
+    return (response.status_code == 200 and response.is_json
+            and not response.direct_passthrough
+            and not response.headers.get("Content-Encoding"))
+
+
+def _to_entry(response: Response) -> Dict[str, Any]:
+    """
+    Converts a JSON response into a cache entry, compressing large bodies.
+    """
+    body = response.get_data()
+    encoding = None
+    if len(body) >= CACHE_CONFIG.CACHE_RESPONSE_GZIP_MIN_BYTES:
+        body = gzip.compress(
+            body, compresslevel=CACHE_CONFIG.CACHE_RESPONSE_GZIP_LEVEL)
+        encoding = GZIP_ENCODING
+    return {"body": body, "encoding": encoding, "mimetype": response.mimetype}
+
+
+def _to_response(entry: Dict[str, Any], status: str) -> Response:
+    """
+    Builds a response from a cache entry, decompressing the body for clients
+    that do not accept gzip.
+    """
+    body = entry["body"]
+    headers = {"Vary": "Accept-Encoding", CACHE_STATUS_HEADER: status}
+    if entry.get("negative"):
+        headers[NEGATIVE_CACHE_HEADER] = ", ".join(
+            f"{namespace};retry-after={_seconds_until(retry_at)}"
+            for namespace, retry_at in sorted(entry["negative"].items()))
+    if entry["encoding"] == GZIP_ENCODING:
+        if GZIP_ENCODING in request.accept_encodings:
+            headers["Content-Encoding"] = GZIP_ENCODING
+        else:
+            body = gzip.decompress(body)
+    return Response(body, mimetype=entry["mimetype"], headers=headers)
@@ -0,0 +1,402 @@
+"""
+Module for refreshing the dashboard datasets in the background.
+
+Routes read their data through @cached service functions, so the first request
+after an entry expires pays for walking the fleet, querying CloudWatch or
+Cost Explorer. The scheduler keeps those entries fresh off the request path by
+recomputing them on a cadence per dataset:
+
+- inventory: resource snapshots, inventory, configuration alerts and
+  recommendations derived from them, every SCHEDULER_INVENTORY_INTERVAL_SECONDS
+- utilisation: CloudWatch utilisation checks, every
+  SCHEDULER_UTILISATION_INTERVAL_SECONDS
+- cost: Cost Explorer datasets with the dashboard's default date ranges, and
+  the ledger, anomaly and forecast state behind them, every
+  SCHEDULER_COST_INTERVAL_SECONDS
+
+Each job recomputes its entries with .refresh() (cache_service.recompute()),
+which replaces a value in place, so requests keep being served the previous
+value meanwhile and dependent namespaces are only invalidated when a value
+changed. With an L2 cache every worker reads the results; without one only
+the scheduling worker's L1 holds them, while the file-backed cost ledger,
+anomaly and forecast state are shared on the host either way.
+
+One worker per host runs the jobs: the one holding an exclusive lock on
+SCHEDULER_LOCK_PATH, which the others retry every
+SCHEDULER_LEADER_RETRY_SECONDS. Runs are delayed by a random jitter of up to
+SCHEDULER_JITTER_SECONDS, stopped after SCHEDULER_JOB_TIMEOUT_SECONDS, and
+recorded in a run history at SCHEDULER_HISTORY_PATH that every worker reports.
+A job never runs twice at once. Manual runs (request_run()) asked for on
+another worker are forwarded to the scheduling worker through a request file
+at SCHEDULER_RUN_REQUEST_PATH, which it checks every
+SCHEDULER_RUN_REQUEST_POLL_SECONDS, so they are serialized with the scheduled
+runs and recorded with them.
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, IO, List, Optional, Tuple
+
+import gevent
+
+from services import (account_service, alerts_service, cost_service, inventory_service,
+                      recommend_service, region_service, resource_snapshot_service,
+                      utilisation_service)
+from utils.env_config import SCHEDULER_CONFIG
+from utils.gevent_util import gevent_spawn
+from utils.storage_util import (create_dir_path, delete_path, get_dir_from_path,
+                                path_exists, read_file, rename_path, write_file)
+
+logger = logging.getLogger(__name__)
+
+Call = Tuple[str, Callable[[], Any]]
+
+
+class Job:
+    """
+    A dataset refreshed on its own interval by recomputing a list of calls.
+    """
+
+    def __init__(self, name: str, interval: int, calls: Callable[[], List[Call]]):
+        self.name = name
+        self.interval = interval
+        # Built at run time, so date ranges follow the current day
+        self.calls = calls
+        self.next_run_at: Optional[datetime] = None
+        self.running = False
+
+
+def _scan_accounts(func: Callable[..., Any], **kwargs: Any) -> Call:
+    """
+    Refreshes a function taking region and account arguments in the
+    scheduler's accounts and regions.
+    """
+    return func.__name__, lambda: account_service.for_accounts(
+        func.refresh, SCHEDULER_CONFIG.SCHEDULER_ACCOUNTS,
+        SCHEDULER_CONFIG.SCHEDULER_REGIONS, **kwargs)
+
+
+def _scan_regions(func: Callable[..., Any], **kwargs: Any) -> Call:
+    """
+    Refreshes a function taking a region argument in the scheduler's regions.
+    """
+    return func.__name__, lambda: region_service.for_regions(
+        func.refresh, SCHEDULER_CONFIG.SCHEDULER_REGIONS, **kwargs)
+
+
+def _refresh(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Call:
+    return func.__name__, lambda: func.refresh(*args, **kwargs)
+
+
+def _inventory_calls() -> List[Call]:
+    # Snapshots first, so the views built from them read the new ones
+    return [
+        _scan_accounts(resource_snapshot_service.describe_ec2_instances),
+        _scan_accounts(resource_snapshot_service.describe_ebs_volumes),
+        _scan_accounts(inventory_service.list_ec2_instances),
+        _scan_accounts(inventory_service.list_ebs_volumes),
+        _scan_accounts(inventory_service.list_rds_instances),
+        _scan_accounts(inventory_service.list_lambda_functions),
+        _refresh(inventory_service.get_s3_bucket_details),
+        _refresh(inventory_service.list_s3_buckets),
+        _refresh(alerts_service.get_s3_buckets_without_lifecycle),
+        _refresh(alerts_service.get_unencrypted_s3_buckets),
+        _refresh(alerts_service.get_ecr_repos_without_lifecycle),
+        _refresh(alerts_service.get_unrestricted_security_groups),
+        _scan_accounts(utilisation_service.get_stopped_ec2_instances),
+        _scan_accounts(utilisation_service.get_unattached_ebs_volumes),
+        _scan_regions(recommend_service.get_unattached_ebs_volumes),
+        _scan_regions(recommend_service.get_unassociated_elastic_ips),
+        _scan_regions(recommend_service.get_inactive_nat_gateways),
+        _scan_regions(recommend_service.get_ec2_instances_without_tags),
+    ]
+
+
+def _utilisation_calls() -> List[Call]:
+    return [
+        _scan_accounts(utilisation_service.get_idle_rds_instances),
+        _scan_accounts(utilisation_service.get_underutilized_redshift),
+        _scan_accounts(utilisation_service.get_idle_load_balancers),
+        _scan_accounts(utilisation_service.get_overprovisioned_ec2),
+        _scan_accounts(utilisation_service.get_overprovisioned_lambdas),
+        _scan_accounts(utilisation_service.get_overprovisioned_ebs),
+        # Arguments as the /alerts/idle-ec2 route passes them
+        _refresh(alerts_service.get_idle_ec2_instances, idle_cpu_threshold=5.0, days=7),
+    ]
+
+
+def _cost_calls() -> List[Call]:
+    # Default date ranges of the cost routes: the last 30 days and the 30 before
+    today = date.today()
+    start = today - timedelta(days=30)
+    previous_start = start - timedelta(days=30)
+    iso = cost_service.iso_date
+    return [
+        _refresh(cost_service.total_cost_trend, iso(start), iso(today), granularity='MONTHLY'),
+        _refresh(cost_service.total_cost_trend, iso(previous_start), iso(start),
+                 granularity='MONTHLY'),
+        _refresh(cost_service.cost_by_service, iso(start), iso(today), granularity='MONTHLY',
+                 top_n=10),
+        _refresh(cost_service.cost_deltas_by_service, iso(start), iso(today), top_n=10),
+        _refresh(cost_service.get_daily_cost_trend, today.year, today.month),
+        _refresh(cost_service.get_cost_data),
+        _refresh(cost_service.get_local_cost_anomalies, iso(start), iso(today)),
+        _refresh(cost_service.local_forecasted_spend, iso(today),
+                 iso(today + timedelta(days=30))),
+        _refresh(alerts_service.get_budget_vs_actual),
+        _scan_regions(recommend_service.get_ec2_rightsizing_recommendations),
+        _scan_regions(recommend_service.get_ebs_rightsizing_recommendations),
+        _refresh(recommend_service.get_reserved_instance_savings_opportunities),
+        _refresh(recommend_service.get_savings_plans_opportunities),
+    ]
+
+
+jobs: Dict[str, Job] = {job.name: job for job in (
+    Job("inventory", SCHEDULER_CONFIG.SCHEDULER_INVENTORY_INTERVAL_SECONDS, _inventory_calls),
+    Job("utilisation", SCHEDULER_CONFIG.SCHEDULER_UTILISATION_INTERVAL_SECONDS,
+        _utilisation_calls),
+    Job("cost", SCHEDULER_CONFIG.SCHEDULER_COST_INTERVAL_SECONDS, _cost_calls),
+)}
+
+_leader: Optional[gevent.Greenlet] = None
+_lock_file: Optional[IO[str]] = None
+_history: List[Dict[str, Any]] = []
+# Serializes history writes of the concurrently running jobs
+_history_lock = threading.Lock()
+
+
+def init_scheduler() -> None:
+    """
+    Starts competing for the scheduler lock if SCHEDULER_ENABLED is set.
+    """
+    global _leader
+    if not SCHEDULER_CONFIG.SCHEDULER_ENABLED:
+        return
+    if _leader is None or _leader.dead:
+        _leader = gevent.spawn(_lead_forever)
+    logger.info("Scheduler started...")
+
+
+def is_leader() -> bool:
+    return _lock_file is not None
+
+
+def request_run(name: str) -> str:
+    """
+    Runs a job once now, on the scheduling worker. Raises RuntimeError if the
+    scheduler is not enabled, as no worker would pick the run up.
+
+    :return: str
+        "started", "running" if the job is already running, or "forwarded"
+        when the run was handed to the scheduling worker.
+    """
+    if not SCHEDULER_CONFIG.SCHEDULER_ENABLED:
+        raise RuntimeError("The scheduler is not enabled.")
+    if is_leader():
+        return _start(jobs[name])
+    path = SCHEDULER_CONFIG.SCHEDULER_RUN_REQUEST_PATH.format(job=name)
+    directory = get_dir_from_path(path)
+    if directory:
+        gevent_spawn(create_dir_path, directory)
+    gevent_spawn(write_file, path, datetime.utcnow().isoformat())
+    return "forwarded"
+
+
+def run_job(name: str) -> Optional[Dict[str, Any]]:
+    """
+    Runs a job once, recomputing its calls in order within
+    SCHEDULER_JOB_TIMEOUT_SECONDS, and records the run. Calls scanning
+    several accounts or regions fail if any of them failed.
+
+    :return: Optional[Dict[str, Any]]
+        The run record: job, status ("succeeded", "failed" or "timed_out"),
+        started_at, duration_seconds, refreshed calls and errors. None if the
+        job was already running.
+    """
+    job = jobs[name]
+    if job.running:
+        logger.info("Scheduled job %s is already running", name)
+        return None
+    job.running = True
+    try:
+        return _run(job)
+    finally:
+        job.running = False
+        _save_history()
+
+
+def _run(job: Job) -> Dict[str, Any]:
+    name = job.name
+    _save_history()
+    started_at = datetime.utcnow()
+    started = time.monotonic()
+    refreshed = 0
+    errors = []
+    status = "succeeded"
+    try:
+        with gevent.Timeout(SCHEDULER_CONFIG.SCHEDULER_JOB_TIMEOUT_SECONDS):
+            for call_name, call in job.calls():
+                try:
+                    failures = _scan_failures(call())
+                except Exception as e:
+                    failures = [str(e)]
+                if failures:
+                    logger.error(f"Scheduled refresh of {call_name} failed: {failures}")
+                    errors.extend(f"{call_name}: {failure}" for failure in failures)
+                else:
+                    refreshed += 1
+    except gevent.Timeout:
+        logger.error(f"Scheduled job {name} timed out after "
+                     f"{SCHEDULER_CONFIG.SCHEDULER_JOB_TIMEOUT_SECONDS} seconds")
+        status = "timed_out"
+    if errors and status == "succeeded":
+        status = "failed"
+
+    run = {
+        "job": name,
+        "status": status,
+        "started_at": started_at.isoformat(),
+        "duration_seconds": round(time.monotonic() - started, 3),
+        "refreshed": refreshed,
+        "errors": errors,
+    }
+    logger.info("Scheduled job %s %s in %.1fs", name, status, run["duration_seconds"])
+    _history.append(run)
+    del _history[:-SCHEDULER_CONFIG.SCHEDULER_HISTORY_SIZE]
+    return run
+
+
+def _scan_failures(result: Any) -> List[str]:
+    """
+    The {"account"/"region", "error"} items that account_service and
+    region_service put in place of the accounts and regions that failed.
+    """
+    if not isinstance(result, list):
+        return []
+    return [", ".join(f"{key} {item[key]}" for key in ("account", "region") if key in item)
+            + f": {item['error']}"
+            for item in result
+            if isinstance(item, dict) and "error" in item
+            and set(item) <= {"account", "region", "error"}]
+
+
+def get_status() -> Dict[str, Any]:
+    """
+    Returns the jobs' schedule and run history as last written by the
+    scheduling worker, and whether this worker is it.
+    """
+    status = {"jobs": {}, "history": []}
+    path = SCHEDULER_CONFIG.SCHEDULER_HISTORY_PATH
+    if gevent_spawn(path_exists, path):
+        try:
+            status = json.loads(gevent_spawn(read_file, path))
+        except ValueError as e:
+            logger.warning(f"Could not read scheduler history {path}: {e}")
+    return {**status, "leader": is_leader()}
+
+
+def _lead_forever() -> None:
+    while not _acquire_lock():
+        gevent.sleep(SCHEDULER_CONFIG.SCHEDULER_LEADER_RETRY_SECONDS)
+    logger.info("Scheduler lock acquired by worker %d", os.getpid())
+    _history.extend(get_status()["history"])
+    greenlets = [gevent.spawn(_run_forever, job) for job in jobs.values()]
+    greenlets.append(gevent.spawn(_watch_run_requests))
+    gevent.joinall(greenlets)
+
+
+def _run_forever(job: Job) -> None:
+    delay = random.uniform(0, SCHEDULER_CONFIG.SCHEDULER_JITTER_SECONDS)
+    while True:
+        job.next_run_at = datetime.utcnow() + timedelta(seconds=delay)
+        _save_history()
+        gevent.sleep(delay)
+        try:
+            run_job(job.name)
+        except Exception as e:
+            logger.error(f"Scheduled job {job.name} failed: {e}")
+        delay = job.interval + random.uniform(0, SCHEDULER_CONFIG.SCHEDULER_JITTER_SECONDS)
+
+
+def _watch_run_requests() -> None:
+    """
+    Starts the runs other workers requested through request_run().
+    """
+    while True:
+        for job in jobs.values():
+            path = SCHEDULER_CONFIG.SCHEDULER_RUN_REQUEST_PATH.format(job=job.name)
+            try:
+                if gevent_spawn(path_exists, path):
+                    gevent_spawn(delete_path, path)
+                    logger.info("Manual run of job %s requested: %s", job.name, _start(job))
+            except OSError as e:
+                logger.warning(f"Could not read run request {path}: {e}")
+        gevent.sleep(SCHEDULER_CONFIG.SCHEDULER_RUN_REQUEST_POLL_SECONDS)
+
+
+def _start(job: Job) -> str:
+    if job.running:
+        return "running"
+    gevent.spawn(run_job, job.name)
+    return "started"
+
+
+def _acquire_lock() -> bool:
+    """
+    Takes the host-wide scheduler lock without blocking. The lock is released
+    by the operating system when the holding worker exits.
+    """
+    global _lock_file
+    path = SCHEDULER_CONFIG.SCHEDULER_LOCK_PATH
+    directory = get_dir_from_path(path)
+    if directory:
+        gevent_spawn(create_dir_path, directory)
+    lock_file = open(path, "a+")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    lock_file.truncate(0)
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    _lock_file = lock_file
+    return True
+
+
+def _save_history() -> None:
+    """
+    Writes the schedule and run history for get_status() in other workers.
+    """
+    if not is_leader():
+        return
+    status = {
+        "leader_pid": os.getpid(),
+        "jobs": {job.name: {
+            "interval_seconds": job.interval,
+            "running": job.running,
+            "next_run_at": job.next_run_at.isoformat() if job.next_run_at else None,
+            "last_run": next((run for run in reversed(_history)
+                              if run["job"] == job.name), None),
+        } for job in jobs.values()},
+        "history": _history,
+    }
+    path = SCHEDULER_CONFIG.SCHEDULER_HISTORY_PATH
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with _history_lock:
+            gevent_spawn(write_file, tmp_path, json.dumps(status, indent=2))
+            gevent_spawn(rename_path, tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write scheduler history {path}: {e}")
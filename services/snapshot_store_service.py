@@ -0,0 +1,165 @@
+"""
+Module for persisting collected cloud data to MongoDB.
+
+With MONGODB_SNAPSHOTS_ENABLED set, inventory lists, the metric features of
+the utilisation checks and the daily cost rows fetched into the ledger are
+also written to MongoDB through the repositories package (bulk upserts,
+retention by TTL indexes). The data then survives restarts, is shared by
+every worker and host, and can be read back without calling AWS: inventory
+through get_inventory(), and settled daily costs through find_daily_costs(),
+which the cost ledger tries before Cost Explorer.
+
+Writes run in background greenlets and failures are only logged, so a
+database outage never fails the request that collected the data. The
+repositories package connects and creates its indexes on import, so it is
+only imported once persistence is enabled and used.
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import importlib
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import gevent
+
+from utils.boto3_util import get_account_id
+from utils.env_config import AWS_CONFIG, DB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_REGION = "global"
+# Resource types inventory_service stores
+INVENTORY_TYPES = ("ec2", "ebs", "rds", "lambda", "s3")
+
+
+def is_enabled() -> bool:
+    return DB_CONFIG.MONGODB_SNAPSHOTS_ENABLED
+
+
+def save_inventory(
+    resource_type: str,
+    items: List[Dict[str, Any]],
+    region: Optional[str] = None,
+    account: Optional[str] = None,
+    id_field: str = "id"
+) -> None:
+    """
+    Stores an inventory list as a snapshot taken now.
+
+    :param region: Optional[str]
+        Region scanned; None for the default region, GLOBAL_REGION for global
+        resources such as S3 buckets.
+    """
+    if not is_enabled():
+        return
+    account, region = _scope(account, region)
+    _spawn_write("inventory_snapshot_repository", "upsert_snapshot", account, region,
+                 resource_type, items, _now(), id_field=id_field)
+
+
+def save_utilisation(
+    resource_type: str,
+    metric: str,
+    resource_ids: Sequence[str],
+    features: Dict[str, Sequence[float]],
+    region: Optional[str] = None,
+    account: Optional[str] = None
+) -> None:
+    """
+    Stores the metric features computed by a utilisation check.
+    """
+    if not is_enabled() or not resource_ids:
+        return
+    account, region = _scope(account, region)
+    _spawn_write("utilisation_metric_repository", "upsert_metrics", account, region,
+                 resource_type, metric, list(resource_ids), features, _now())
+
+
+def save_daily_costs(rows: Iterable[Any], tag_key: str = "") -> None:
+    """
+    Stores daily cost rows fetched into the ledger for the default account.
+    """
+    if not is_enabled():
+        return
+    _spawn_write("daily_cost_repository", "upsert_costs", get_account_id(), list(rows),
+                 tag_key=tag_key)
+
+
+def get_inventory(
+    resource_type: str,
+    region: Optional[str] = None,
+    account: Optional[str] = None,
+    fields: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Returns the latest stored snapshot of a resource type.
+
+    :param fields: Optional[List[str]]
+        Inventory fields to read; all if None.
+    """
+    account, region = _scope(account, region)
+    return _repository("inventory_snapshot_repository").find_latest(
+        account, region, resource_type, fields)
+
+
+def find_daily_costs(
+    start: date,
+    end: date,
+    metrics: Sequence[str],
+    tag_key: str = ""
+) -> Optional[List[Any]]:
+    """
+    Returns the stored daily cost rows of [start, end) for the default
+    account, if every day has rows for every metric.
+
+    :return: Optional[List[Any]]
+        Ledger rows, or None if persistence is disabled, the days are not all
+        stored or MongoDB cannot be read; the caller then asks Cost Explorer.
+    """
+    if not is_enabled() or start >= end:
+        return None
+    try:
+        rows = _repository("daily_cost_repository").find_costs(
+            get_account_id(), start.isoformat(), end.isoformat(), metrics, tag_key)
+    except Exception as e:
+        logger.error(f"Reading daily costs from MongoDB failed: {e}")
+        return None
+    stored = {(row[0], row[3]) for row in rows}
+    days = [(start + timedelta(days=offset)).isoformat()
+            for offset in range((end - start).days)]
+    if any((day, metric) not in stored for day in days for metric in metrics):
+        return None
+    return rows
+
+
+def _scope(account: Optional[str], region: Optional[str]):
+    return account or get_account_id(), region or AWS_CONFIG.AWS_REGION
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _repository(name: str) -> Any:
+    return importlib.import_module(f"repositories.{name}")
+
+
+def _spawn_write(repository: str, method: str, *args: Any, **kwargs: Any) -> None:
+    def write(func: Callable[..., int]) -> None:
+        try:
+            written = func(*args, **kwargs)
+            logger.info("Persisted %d documents with %s.%s", written, repository, method)
+        except Exception as e:
+            logger.error(f"Persisting with {repository}.{method} failed: {e}")
+
+    try:
+        func = getattr(_repository(repository), method)
+    except Exception as e:
+        logger.error(f"MongoDB repositories are unavailable: {e}")
+        return
+    gevent.spawn(write, func)
@@ -0,0 +1,138 @@
+"""
+Module for classifying resources from their CloudWatch metric matrices.
+
+The utilisation checks fetch one metric for a whole fleet as a resources x
+periods matrix (metrics_service.get_metric_matrix). metric_features() reduces
+it to per-resource features in one vectorized pass:
+
+- mean, p95, max and sum over the datapoints present,
+- active_fraction: share of all periods above the rule's active threshold
+  (periods without a datapoint count as inactive),
+- trend: least-squares slope per day,
+- datapoints: number of periods with a datapoint.
+
+classify() evaluates a named rule from UTILISATION_RULES (constants, merged
+with the UTILISATION_RULES environment overrides) against those features and
+any per-resource attributes, and returns a boolean mask over the resources.
+
+Copyright Flexday Solutions LLC, Inc - All Rights Reserved
+Unauthorized copying of this file, via any medium is strictly prohibited
+Proprietary and confidential
+See file LICENSE.txt for full license details.
+"""
+
+import operator
+import warnings
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from constants import UTILISATION_RULES
+from utils.env_config import UTILISATION_CONFIG
+
+SECONDS_PER_DAY = 24 * 60 * 60
+METRIC_FEATURES = ("mean", "p95", "max", "sum", "active_fraction", "trend")
+OPERATORS = {"lt": operator.lt, "le": operator.le,
+             "gt": operator.gt, "ge": operator.ge}
+
+
+def get_rule(name: str) -> Dict[str, Any]:
+    """
+    Returns a classifier rule with its environment overrides applied.
+    """
+    rule = {**UTILISATION_RULES[name],
+            **UTILISATION_CONFIG.UTILISATION_RULES.get(name, {})}
+    rule["conditions"] = {
+        **UTILISATION_RULES[name].get("conditions", {}),
+        **UTILISATION_CONFIG.UTILISATION_RULES.get(name, {}).get("conditions", {})}
+    return rule
+
+
+def metric_features(
+    matrix: np.ndarray,
+    period: int,
+    active_threshold: float = 0
+) -> Dict[str, np.ndarray]:
+    """
+    Computes per-resource features of a resources x periods matrix.
+
+    :param matrix: np.ndarray
+        Metric values, NaN for periods without a datapoint.
+    :param period: int
+        Period length in seconds, used to express the trend per day.
+    :param active_threshold: float
+        Values above this count as active for active_fraction.
+    :return: Dict[str, np.ndarray]
+        One array per feature, aligned with the matrix rows. Features of
+        resources without datapoints are NaN (sum is 0).
+    """
+    present = ~np.isnan(matrix)
+    datapoints = present.sum(axis=1)
+    days = np.arange(matrix.shape[1]) * (period / SECONDS_PER_DAY)
+
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        # All-NaN rows are expected and yield NaN features
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(matrix, axis=1)
+        p95 = np.nanpercentile(matrix, 95, axis=1) if matrix.size \
+            else np.full(len(matrix), np.nan)
+        maximum = np.nanmax(matrix, axis=1) if matrix.size \
+            else np.full(len(matrix), np.nan)
+
+        # Least-squares slope over the periods with datapoints
+        x = np.where(present, days, np.nan)
+        x_centered = x - np.nanmean(x, axis=1, keepdims=True)
+        y_centered = matrix - mean[:, None]
+        trend = np.nansum(x_centered * y_centered, axis=1) \
+            / np.nansum(x_centered ** 2, axis=1)
+        trend[datapoints < 2] = np.nan
+
+    return {
+        "mean": mean,
+        "p95": p95,
+        "max": maximum,
+        "sum": np.nansum(matrix, axis=1),
+        "active_fraction": (np.nan_to_num(matrix, nan=-np.inf) > active_threshold).sum(axis=1)
+        / max(matrix.shape[1], 1),
+        "trend": trend,
+        "datapoints": datapoints,
+    }
+
+
+def classify(
+    rule_name: str,
+    matrix: np.ndarray,
+    period: int,
+    attributes: Optional[Dict[str, Any]] = None,
+    conditions: Optional[Dict[str, Any]] = None
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Applies a classifier rule to every resource of a metric matrix.
+
+    :param rule_name: str
+        Key of UTILISATION_RULES, e.g. "ec2_overprovisioned".
+    :param attributes: Optional[Dict[str, Any]]
+        Per-resource attribute arrays (e.g. {"size_gib": [...]}) the rule's
+        conditions may refer to, aligned with the matrix rows.
+    :param conditions: Optional[Dict[str, Any]]
+        Conditions overriding the rule's for this call.
+    :return: Tuple[np.ndarray, Dict[str, np.ndarray]]
+        Boolean mask of matching resources, and the computed features.
+    """
+    rule = get_rule(rule_name)
+    features = metric_features(matrix, period, rule.get("active_threshold", 0))
+    values = {**features, **{name: np.asarray(value, dtype=float)
+                             for name, value in (attributes or {}).items()}}
+    has_data = features["datapoints"] > 0
+    no_data = rule.get("no_data", False)
+
+    matches = np.ones(len(matrix), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        for name, (op, threshold) in {**rule["conditions"], **(conditions or {})}.items():
+            condition = OPERATORS[op](values[name], threshold)
+            if name in METRIC_FEATURES and no_data:
+                condition |= ~has_data
+            matches &= condition
+    if not no_data:
+        matches &= has_data
+    return matches, features
@@ -1,259 +1,161 @@
 from datetime import datetime, timedelta
-import boto3
 import logging
 
-from services import cache_service
+import numpy as np
+
+from services import (cache_service, metrics_service, resource_snapshot_service,
+                      snapshot_store_service, utilisation_classifier_service)
+from utils.boto3_util import get_boto_client, paginate
 
 logger = logging.getLogger(__name__)
 
 # 1. Stopped / unused EC2
 
-ec2 = boto3.client("ec2", region_name="us-east-1")
-rds = boto3.client("rds", region_name="us-east-1")
-cw = boto3.client("cloudwatch", region_name="us-east-1")
-redshift = boto3.client("redshift", region_name="us-east-1")
-elbv2 = boto3.client("elbv2", region_name="us-east-1")
-lambda_client = boto3.client("lambda", region_name="us-east-1")
-
-
-def get_stopped_ec2_instances():
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_stopped_ec2_instances"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
 
-    response = ec2.describe_instances(
-        Filters=[{"Name": "instance-state-name", "Values": ["stopped"]}])
-    instances = []
-    for reservation in response["Reservations"]:
-        for instance in reservation["Instances"]:
-            instances.append(instance["InstanceId"])
-    cache_service.set(cache_key, instances)
-    logger.info("Cached result for key: %s", cache_key)
-    return instances
+@cache_service.cached(depends_on=[resource_snapshot_service.describe_ec2_instances])
+def get_stopped_ec2_instances(region=None, account=None):
+    instances = resource_snapshot_service.get_ec2_instances(
+        states=["stopped"], region=region, account=account)
+    return [instance["InstanceId"] for instance in instances]
 
 
 # 2. Unattached EBS volumes
-def get_unattached_ebs_volumes():
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_unattached_ebs_volumes"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
-    response = ec2.describe_volumes(
-        Filters=[{"Name": "status", "Values": ["available"]}])
-    result = [vol["VolumeId"] for vol in response["Volumes"]]
-    cache_service.set(cache_key, result)
-    logger.info("Cached result for key: %s", cache_key)
-    return result
+@cache_service.cached(depends_on=[resource_snapshot_service.describe_ebs_volumes])
+def get_unattached_ebs_volumes(region=None, account=None):
+    volumes = resource_snapshot_service.get_ebs_volumes(
+        statuses=["available"], region=region, account=account)
+    return [vol["VolumeId"] for vol in volumes]
 
 
 # 3. Idle RDS (no connections, low CPU)
-def get_idle_rds_instances(cloudwatch_period=3600):
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_idle_rds_instances"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
-    instances = rds.describe_db_instances()["DBInstances"]
-    idle = []
-    for db in instances:
-        metrics = cw.get_metric_statistics(
-            Namespace="AWS/RDS",
-            MetricName="CPUUtilization",
-            Dimensions=[{"Name": "DBInstanceIdentifier",
-                         "Value": db["DBInstanceIdentifier"]}],
-            StartTime=datetime.utcnow() - timedelta(seconds=cloudwatch_period * 24),
-            EndTime=datetime.utcnow(),
-            Period=cloudwatch_period,
-            Statistics=["Average"]
-        )
-        if not metrics["Datapoints"] or metrics["Datapoints"][0]["Average"] < 5:  # <5% CPU avg
-            idle.append(db["DBInstanceIdentifier"])
-    cache_service.set(cache_key, idle)
-    logger.info("Cached result for key: %s", cache_key)
-    return idle
+@cache_service.cached()
+def get_idle_rds_instances(cloudwatch_period=3600, region=None, account=None):
+    rds = get_boto_client("rds", region, account)
+    cw = get_boto_client("cloudwatch", region, account)
+    instances = list(paginate(rds, "describe_db_instances", "DBInstances[]"))
+    ids, cpu = metrics_service.get_metric_matrix(
+        cw, "AWS/RDS", "CPUUtilization", "DBInstanceIdentifier",
+        [db["DBInstanceIdentifier"] for db in instances],
+        stat="Average",
+        period=cloudwatch_period,
+        start_time=datetime.utcnow() - timedelta(seconds=cloudwatch_period * 24),
+        end_time=datetime.utcnow()
+    )
+    idle, features = utilisation_classifier_service.classify(
+        "rds_idle", cpu, cloudwatch_period)
+    snapshot_store_service.save_utilisation(
+        "rds", "CPUUtilization", ids, features, region, account)
+    return [ids[i] for i in np.flatnonzero(idle)]
 
 
 # 4. Underutilized Redshift clusters
-def get_underutilized_redshift(cloudwatch_period=3600):
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_underutilized_redshift"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-    clusters = redshift.describe_clusters()["Clusters"]
-
-    underutilized = []
-    for cluster in clusters:
-        metrics = cw.get_metric_statistics(
-            Namespace="AWS/Redshift",
-            MetricName="CPUUtilization",
-            Dimensions=[{"Name": "ClusterIdentifier",
-                         "Value": cluster["ClusterIdentifier"]}],
-            StartTime=datetime.utcnow() - timedelta(seconds=cloudwatch_period * 24),
-            EndTime=datetime.utcnow(),
-            Period=cloudwatch_period,
-            Statistics=["Average"]
-        )
-        if not metrics["Datapoints"] or metrics["Datapoints"][0]["Average"] < 10:  # <10% avg CPU
-            underutilized.append(cluster["ClusterIdentifier"])
-    cache_service.set(cache_key, underutilized)
-    logger.info("Cached result for key: %s", cache_key)
-    return underutilized
+@cache_service.cached()
+def get_underutilized_redshift(cloudwatch_period=3600, region=None, account=None):
+    redshift = get_boto_client("redshift", region, account)
+    cw = get_boto_client("cloudwatch", region, account)
+    clusters = list(paginate(redshift, "describe_clusters", "Clusters[]"))
+    ids, cpu = metrics_service.get_metric_matrix(
+        cw, "AWS/Redshift", "CPUUtilization", "ClusterIdentifier",
+        [cluster["ClusterIdentifier"] for cluster in clusters],
+        stat="Average",
+        period=cloudwatch_period,
+        start_time=datetime.utcnow() - timedelta(seconds=cloudwatch_period * 24),
+        end_time=datetime.utcnow()
+    )
+    underutilized, features = utilisation_classifier_service.classify(
+        "redshift_underutilized", cpu, cloudwatch_period)
+    snapshot_store_service.save_utilisation(
+        "redshift", "CPUUtilization", ids, features, region, account)
+    return [ids[i] for i in np.flatnonzero(underutilized)]
 
 
 # 5. Idle / unused Load Balancers (very low request count)
-def get_idle_load_balancers(cloudwatch_period=3600):
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_idle_load_balancers"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
-    lbs = elbv2.describe_load_balancers()["LoadBalancers"]
-
-    idle = []
-    for lb in lbs:
-        metrics = cw.get_metric_statistics(
-            Namespace="AWS/ApplicationELB",
-            MetricName="RequestCount",
-            Dimensions=[{"Name": "LoadBalancer", "Value": lb["LoadBalancerArn"].split(
-                ":loadbalancer/")[1]}],
-            # StartTime=datetime.utcnow() - timedelta(seconds=cloudwatch_period * 24),
-            StartTime=datetime.utcnow() - timedelta(days=30),  # 30 days back
-            EndTime=datetime.utcnow(),
-            Period=cloudwatch_period,
-            Statistics=["Sum"]
-        )
-        if not metrics["Datapoints"] or metrics["Datapoints"][0]["Sum"] == 0:
-            idle.append(lb["LoadBalancerName"])
-    cache_service.set(cache_key, idle)
-    logger.info("Cached result for key: %s", cache_key)
-    return idle
+@cache_service.cached()
+def get_idle_load_balancers(cloudwatch_period=3600, region=None, account=None):
+    elbv2 = get_boto_client("elbv2", region, account)
+    cw = get_boto_client("cloudwatch", region, account)
+    lbs = list(paginate(elbv2, "describe_load_balancers", "LoadBalancers[]"))
+    arns, requests = metrics_service.get_metric_matrix(
+        cw, "AWS/ApplicationELB", "RequestCount", "LoadBalancer",
+        {lb["LoadBalancerArn"]: lb["LoadBalancerArn"].split(":loadbalancer/")[1]
+         for lb in lbs},
+        stat="Sum",
+        period=cloudwatch_period,
+        start_time=datetime.utcnow() - timedelta(days=30),  # 30 days back
+        end_time=datetime.utcnow()
+    )
+    idle, features = utilisation_classifier_service.classify(
+        "elb_idle", requests, cloudwatch_period)
+    snapshot_store_service.save_utilisation(
+        "elb", "RequestCount", arns, features, region, account)
+    return [lbs[i]["LoadBalancerName"] for i in np.flatnonzero(idle)]
 
 # 6. EC2 with very low CPU utilization vs size
 
 
-def get_overprovisioned_ec2(cloudwatch_period=3600):
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_overprovisioned_ec2"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
-    reservations = ec2.describe_instances()["Reservations"]
-
-    overprovisioned = []
-    for reservation in reservations:
-        for instance in reservation["Instances"]:
-            instance_id = instance["InstanceId"]
-            instance_type = instance["InstanceType"]
-
-            metrics = cw.get_metric_statistics(
-                Namespace="AWS/EC2",
-                MetricName="CPUUtilization",
-                Dimensions=[{"Name": "InstanceId", "Value": instance_id}],
-                StartTime=datetime.utcnow() - timedelta(seconds=cloudwatch_period * 24),
-                EndTime=datetime.utcnow(),
-                Period=cloudwatch_period,
-                Statistics=["Average"]
-            )
-            if metrics["Datapoints"] and metrics["Datapoints"][0]["Average"] < 5:  # <5% avg
-                overprovisioned.append(
-                    {"InstanceId": instance_id, "Type": instance_type})
-    cache_service.set(cache_key, overprovisioned)
-    logger.info("Cached result for key: %s", cache_key)
-    return overprovisioned
+@cache_service.cached(depends_on=[resource_snapshot_service.describe_ec2_instances])
+def get_overprovisioned_ec2(cloudwatch_period=3600, region=None, account=None):
+    cw = get_boto_client("cloudwatch", region, account)
+    instances = resource_snapshot_service.get_ec2_instances(
+        region=region, account=account)
+    ids, cpu = metrics_service.get_metric_matrix(
+        cw, "AWS/EC2", "CPUUtilization", "InstanceId",
+        [instance["InstanceId"] for instance in instances],
+        stat="Average",
+        period=cloudwatch_period,
+        start_time=datetime.utcnow() - timedelta(seconds=cloudwatch_period * 24),
+        end_time=datetime.utcnow()
+    )
+    overprovisioned, features = utilisation_classifier_service.classify(
+        "ec2_overprovisioned", cpu, cloudwatch_period)
+    snapshot_store_service.save_utilisation(
+        "ec2", "CPUUtilization", ids, features, region, account)
+    return [{"InstanceId": instances[i]["InstanceId"], "Type": instances[i]["InstanceType"]}
+            for i in np.flatnonzero(overprovisioned)]
 
 
 # 7. Lambda with high memory but low usage
-def get_overprovisioned_lambdas():
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_overprovisioned_lambdas"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
-    functions = lambda_client.list_functions()["Functions"]
-    overprovisioned = []
-
-    for fn in functions:
-        fn_name = fn["FunctionName"]
-        mem = fn["MemorySize"]
-
-        metrics = cw.get_metric_statistics(
-            Namespace="AWS/Lambda",
-            MetricName="Invocations",
-            Dimensions=[{"Name": "FunctionName", "Value": fn_name}],
-            StartTime=datetime.utcnow() - timedelta(days=7),
-            EndTime=datetime.utcnow(),
-            Period=3600,
-            Statistics=["Sum"]
-        )
-        invocations = sum(
-            dp["Sum"] for dp in metrics["Datapoints"]) if metrics["Datapoints"] else 0
-
-        if mem > 512 and invocations < 10:  # heuristic
-            overprovisioned.append(
-                {"FunctionName": fn_name, "Memory": mem, "Invocations": invocations})
-    cache_service.set(cache_key, overprovisioned)
-    logger.info("Cached result for key: %s", cache_key)
-    return overprovisioned
+@cache_service.cached()
+def get_overprovisioned_lambdas(region=None, account=None):
+    lambda_client = get_boto_client("lambda", region, account)
+    cw = get_boto_client("cloudwatch", region, account)
+    functions = list(paginate(lambda_client, "list_functions", "Functions[]"))
+    names, invocations = metrics_service.get_metric_matrix(
+        cw, "AWS/Lambda", "Invocations", "FunctionName",
+        [fn["FunctionName"] for fn in functions],
+        stat="Sum",
+        period=3600,
+        start_time=datetime.utcnow() - timedelta(days=7),
+        end_time=datetime.utcnow()
+    )
+    overprovisioned, features = utilisation_classifier_service.classify(
+        "lambda_overprovisioned", invocations, 3600,
+        attributes={"memory_mb": [fn["MemorySize"] for fn in functions]})
+    snapshot_store_service.save_utilisation(
+        "lambda", "Invocations", names, features, region, account)
+    return [{"FunctionName": functions[i]["FunctionName"],
+             "Memory": functions[i]["MemorySize"],
+             "Invocations": float(features["sum"][i])}
+            for i in np.flatnonzero(overprovisioned)]
 
 
 # 8. EBS volumes much larger than needed (low IOPS)
-def get_overprovisioned_ebs(cloudwatch_period=3600):
-    # Create a unique cache key based on input parameters
-    cache_key = f"get_overprovisioned_ebs"
-
-    # Try to get cached result
-    cached_result = cache_service.get(cache_key)
-    if cached_result is not None:
-        logger.info("Returning cached result for key: %s", cache_key)
-        return cached_result
-
-    volumes = ec2.describe_volumes()["Volumes"]
-    overprovisioned = []
-
-    for vol in volumes:
-        metrics = cw.get_metric_statistics(
-            Namespace="AWS/EBS",
-            MetricName="VolumeReadOps",
-            Dimensions=[{"Name": "VolumeId", "Value": vol["VolumeId"]}],
-            StartTime=datetime.utcnow() - timedelta(seconds=cloudwatch_period * 24),
-            EndTime=datetime.utcnow(),
-            Period=cloudwatch_period,
-            Statistics=["Sum"]
-        )
-        total_ops = sum(dp["Sum"] for dp in metrics["Datapoints"]
-                        ) if metrics["Datapoints"] else 0
-        if vol["Size"] > 100 and total_ops < 50:  # >100GB but hardly used
-            overprovisioned.append(vol["VolumeId"])
-    cache_service.set(cache_key, overprovisioned)
-    logger.info("Cached result for key: %s", cache_key)
-    return overprovisioned
+@cache_service.cached(depends_on=[resource_snapshot_service.describe_ebs_volumes])
+def get_overprovisioned_ebs(cloudwatch_period=3600, region=None, account=None):
+    cw = get_boto_client("cloudwatch", region, account)
+    volumes = resource_snapshot_service.get_ebs_volumes(
+        region=region, account=account)
+    ids, read_ops = metrics_service.get_metric_matrix(
+        cw, "AWS/EBS", "VolumeReadOps", "VolumeId",
+        [vol["VolumeId"] for vol in volumes],
+        stat="Sum",
+        period=cloudwatch_period,
+        start_time=datetime.utcnow() - timedelta(seconds=cloudwatch_period * 24),
+        end_time=datetime.utcnow()
+    )
+    overprovisioned, features = utilisation_classifier_service.classify(
+        "ebs_overprovisioned", read_ops, cloudwatch_period,
+        attributes={"size_gib": [vol["Size"] for vol in volumes]})
+    snapshot_store_service.save_utilisation(
+        "ebs", "VolumeReadOps", ids, features, region, account)
+    return [ids[i] for i in np.flatnonzero(overprovisioned)]
@@ -1,16 +1,164 @@
 # utils/aws_init.py
+import threading
+
 import boto3
+import botocore.session
+import jmespath
+from botocore.config import Config
+from botocore.credentials import DeferredRefreshableCredentials
+
+from utils.env_config import AWS_CONFIG
 
+# Clients by (service, region, account); account None is the default credentials
 _boto_clients = {}
+_sessions = {}
+_account_id = None
+_lock = threading.Lock()
 
 
 def init_boto_clients():
-    global _boto_clients
-    services = ["ce", "ec2", "s3", "rds", "lambda",
-                "ecr", "iam", "budgets", "cloudwatch", "compute-optimizer", "redshift", "elbv2"]
-    for svc in services:
-        _boto_clients[svc] = boto3.client(svc, region_name="us-east-1")
+    """
+    Resets the client registry. Clients are created lazily by get_boto_client(),
+    so each worker process builds its own after forking.
+    """
+    global _boto_clients, _sessions, _account_id
+    with _lock:
+        _boto_clients = {}
+        _sessions = {}
+        _account_id = None
+
+
+def get_boto_client(service, region=None, account=None):
+    """
+    Returns the shared client for a service, region and account, creating it
+    on first use with pooled connections and adaptive retries.
+
+    Args:
+        service (str): boto3 service name, e.g. "ec2".
+        region (str): Region name; defaults to AWS_REGION.
+        account (str): Account id; None for the default credentials. Other
+            accounts are accessed by assuming AWS_ASSUME_ROLE_NAME in them.
+    """
+    key = (service, region or AWS_CONFIG.AWS_REGION, account)
+    client = _boto_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _boto_clients.get(key)
+            if client is None:
+                client = _get_session(account).client(
+                    service, region_name=key[1], config=_client_config())
+                _boto_clients[key] = client
+    return client
+
+
+def get_account_id():
+    """
+    Returns the account id of the default credentials, looked up once per
+    process.
+    """
+    global _account_id
+    if _account_id is None:
+        _account_id = get_boto_client("sts").get_caller_identity()["Account"]
+    return _account_id
+
+
+def _get_session(account):
+    session = _sessions.get(account)
+    if session is None:
+        if account is None:
+            session = boto3.session.Session()
+        else:
+            session = _assume_role_session(account)
+        _sessions[account] = session
+    return session
+
+
+def _assume_role_session(account):
+    """
+    Returns a session for another account using AWS_ASSUME_ROLE_NAME.
+
+    The role is assumed on first use, and the temporary credentials are cached
+    by botocore and refreshed shortly before they expire.
+    """
+    role_arn = f"arn:aws:iam::{account}:role/{AWS_CONFIG.AWS_ASSUME_ROLE_NAME}"
+    request = {
+        "RoleArn": role_arn,
+        "RoleSessionName": AWS_CONFIG.AWS_ASSUME_ROLE_SESSION_NAME,
+        "DurationSeconds": AWS_CONFIG.AWS_ASSUME_ROLE_DURATION_SECONDS,
+    }
+    if AWS_CONFIG.AWS_ASSUME_ROLE_EXTERNAL_ID:
+        request["ExternalId"] = AWS_CONFIG.AWS_ASSUME_ROLE_EXTERNAL_ID
+
+    def refresh():
+        credentials = get_boto_client("sts").assume_role(**request)["Credentials"]
+        return {
+            "access_key": credentials["AccessKeyId"],
+            "secret_key": credentials["SecretAccessKey"],
+            "token": credentials["SessionToken"],
+            "expiry_time": credentials["Expiration"].isoformat(),
+        }
+
+    return _session_with_credentials(DeferredRefreshableCredentials(
+        refresh_using=refresh, method="sts-assume-role"))
+
+
+def _session_with_credentials(credentials):
+    """
+    Returns a session using the given botocore credentials object.
+    """
+    session = botocore.session.Session()
+    # botocore has no public setter for refreshable credentials; this relies on
+    # Session._credentials, checked against the botocore pinned in requirements.txt
+    session._credentials = credentials
+    return boto3.session.Session(botocore_session=session)
+
+
+def _client_config():
+    return Config(
+        max_pool_connections=AWS_CONFIG.AWS_MAX_POOL_CONNECTIONS,
+        retries={"mode": AWS_CONFIG.AWS_RETRY_MODE,
+                 "total_max_attempts": AWS_CONFIG.AWS_MAX_ATTEMPTS},
+    )
+
+
+# Response/request token pairs for operations without a boto3 paginator
+_PAGINATION_TOKENS = (
+    ("NextToken", "NextToken"),
+    ("nextToken", "nextToken"),
+    ("NextPageToken", "NextPageToken"),
+    ("NextMarker", "Marker"),
+)
+
+
+def paginate(client, operation, result_key, **kwargs):
+    """
+    Yields every item of a paginated describe/list call, one page at a time.
+
+    Uses the boto3 paginator when the operation has one, otherwise follows
+    the operation's next-token field manually (e.g. Compute Optimizer
+    get_ec2_instance_recommendations).
 
+    Args:
+        client: boto3 client.
+        operation (str): Client method name, e.g. "describe_instances".
+        result_key (str): JMESPath expression selecting the items of a page,
+            e.g. "Reservations[].Instances[]".
+        **kwargs: Request parameters.
+    """
+    if client.can_paginate(operation):
+        pages = client.get_paginator(operation).paginate(**kwargs)
+        for item in pages.search(result_key):
+            if item is not None:
+                yield item
+        return
 
-def get_boto_client(service):
-    return _boto_clients.get(service)
+    method = getattr(client, operation)
+    while True:
+        response = method(**kwargs)
+        yield from jmespath.search(result_key, response) or []
+        for response_token, request_token in _PAGINATION_TOKENS:
+            if response.get(response_token):
+                kwargs[request_token] = response[response_token]
+                break
+        else:
+            return
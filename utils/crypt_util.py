@@ -3,12 +3,9 @@
 # Proprietary and confidential
 # See file LICENSE.txt for full license details.
 
-import boto3
+from utils.boto3_util import get_boto_client
 from utils.env_config import AWS_CONFIG, APP_CONFIG
 
-# Initialize the KMS client
-kms_client = boto3.client('kms', region_name=AWS_CONFIG.KMS_REGION)  # Set your AWS region
-
 # Define the KMS key ID (replace with your own KMS key ID)
 KMS_KEY_ID = AWS_CONFIG.KMS_KEY_ID
 
@@ -23,7 +20,7 @@ def encrypt(data: str) -> str:
         return data 
     try:
         # Encrypt the plaintext data
-        encrypted_response = kms_client.encrypt(
+        encrypted_response = get_boto_client('kms', AWS_CONFIG.KMS_REGION).encrypt(
             KeyId=KMS_KEY_ID,
             Plaintext=data.encode('utf-8')
         )
@@ -50,7 +47,7 @@ def decrypt(encrypted_data: str) -> str:
         encrypted_data_bytes = bytes.fromhex(encrypted_data)
 
         # Decrypt the ciphertext
-        decrypted_response = kms_client.decrypt(
+        decrypted_response = get_boto_client('kms', AWS_CONFIG.KMS_REGION).decrypt(
             CiphertextBlob=encrypted_data_bytes
         )
 
@@ -2,10 +2,11 @@
 # Unauthorized copying of this file, via any medium is strictly prohibited
 # Proprietary and confidential
 # See file LICENSE.txt for full license details.
+import json
 import os
 from constants import TRUE_STRING
 from utils.map import Map
-from utils.string_util import str_lower, parse_cors_origins
+from utils.string_util import str_lower, parse_cors_origins, parse_key_value_pairs
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
@@ -55,13 +56,47 @@ DB_CONFIG = Map(
     MONGODB_MAX_POOLSIZE=os.getenv('MONGODB_MAX_POOLSIZE', 100),
     MONGODB_MIN_POOLSIZE=os.getenv('MONGODB_MIN_POOLSIZE', 0),
     MONGODB_MAX_IDLETIME_MS=os.getenv('MONGODB_MAX_IDLETIME_MS', None),
-    MONGODB_MAX_CONNECTING=os.getenv('MONGODB_MAX_CONNECTING', 2)
+    MONGODB_MAX_CONNECTING=os.getenv('MONGODB_MAX_CONNECTING', 2),
+    # Persist inventory, utilisation metrics and daily costs to MongoDB
+    # (snapshot_store_service)
+    MONGODB_SNAPSHOTS_ENABLED=True if str_lower(os.getenv(
+        'MONGODB_SNAPSHOTS_ENABLED')) == TRUE_STRING else False,
+    MONGODB_BULK_BATCH_SIZE=int(os.getenv('MONGODB_BULK_BATCH_SIZE', 1000)),
+    # Documents are removed by TTL indexes after these retention periods
+    MONGODB_INVENTORY_RETENTION_DAYS=int(
+        os.getenv('MONGODB_INVENTORY_RETENTION_DAYS', 90)),
+    MONGODB_UTILISATION_RETENTION_DAYS=int(
+        os.getenv('MONGODB_UTILISATION_RETENTION_DAYS', 30)),
+    MONGODB_COST_RETENTION_DAYS=int(
+        os.getenv('MONGODB_COST_RETENTION_DAYS', 3 * 365))
 )
 
 
 AWS_CONFIG = Map(
     KMS_KEY_ID=os.getenv('KMS_KEY_ID'),
-    KMS_REGION=os.getenv('KMS_REGION')
+    KMS_REGION=os.getenv('KMS_REGION'),
+    AWS_REGION=os.getenv('AWS_REGION', 'us-east-1'),
+    # Pooled HTTP connections per client; sized for the gevent fan-outs
+    AWS_MAX_POOL_CONNECTIONS=int(os.getenv('AWS_MAX_POOL_CONNECTIONS', 50)),
+    AWS_RETRY_MODE=os.getenv('AWS_RETRY_MODE', 'adaptive'),
+    AWS_MAX_ATTEMPTS=int(os.getenv('AWS_MAX_ATTEMPTS', 10)),
+    # Regions scanned for regions=all; empty means every enabled region
+    AWS_FANOUT_REGIONS=[region.strip() for region in os.getenv(
+        'AWS_FANOUT_REGIONS', '').split(',') if region.strip()],
+    AWS_REGION_TIMEOUT_SECONDS=int(
+        os.getenv('AWS_REGION_TIMEOUT_SECONDS', 55)),
+    # Member accounts scanned for accounts=all; empty means every active
+    # account of the organization
+    AWS_ACCOUNTS=[account.strip() for account in os.getenv(
+        'AWS_ACCOUNTS', '').split(',') if account.strip()],
+    AWS_ASSUME_ROLE_NAME=os.getenv(
+        'AWS_ASSUME_ROLE_NAME', 'OrganizationAccountAccessRole'),
+    AWS_ASSUME_ROLE_SESSION_NAME=os.getenv(
+        'AWS_ASSUME_ROLE_SESSION_NAME', 'cloud-copilot-scan'),
+    AWS_ASSUME_ROLE_EXTERNAL_ID=os.getenv('AWS_ASSUME_ROLE_EXTERNAL_ID'),
+    AWS_ASSUME_ROLE_DURATION_SECONDS=int(
+        os.getenv('AWS_ASSUME_ROLE_DURATION_SECONDS', 3600)),
+    AWS_ACCOUNT_POOL_SIZE=int(os.getenv('AWS_ACCOUNT_POOL_SIZE', 4))
 )
 
 OIDC_CONFIG = Map(
@@ -73,7 +108,117 @@ OIDC_CONFIG = Map(
 )
 
 
+# Bounded fan-outs of per-resource AWS calls (see utils.gevent_util.gevent_map)
+GEVENT_CONFIG = Map(
+    GEVENT_POOL_SIZE=int(os.getenv('GEVENT_POOL_SIZE', 20)),
+    GEVENT_CALL_TIMEOUT_SECONDS=int(
+        os.getenv('GEVENT_CALL_TIMEOUT_SECONDS', 30))
+)
+
 AWS_AGENT_CONFIG = Map(
     AGENT_ID=os.getenv('AGENT_ID'),
     AGENT_ALIAS_ID=os.getenv('AGENT_ALIAS_ID')
-)
\ No newline at end of file
+)
+
+CACHE_CONFIG = Map(
+    CACHE_MAX_ENTRIES=int(os.getenv('CACHE_MAX_ENTRIES', 2000)),
+    CACHE_MAX_BYTES=int(os.getenv('CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+    CACHE_SWEEP_INTERVAL_SECONDS=int(
+        os.getenv('CACHE_SWEEP_INTERVAL_SECONDS', 300)),
+    CACHE_SINGLE_FLIGHT_TIMEOUT_SECONDS=int(
+        os.getenv('CACHE_SINGLE_FLIGHT_TIMEOUT_SECONDS', 55)),
+    CACHE_STALE_TTL_SECONDS=int(
+        os.getenv('CACHE_STALE_TTL_SECONDS', 24 * 60 * 60)),
+    CACHE_DEFAULT_TTL_SECONDS=int(
+        os.getenv('CACHE_DEFAULT_TTL_SECONDS', 7 * 24 * 60 * 60)),
+    # e.g. "idle_ec2_instances=900,get_daily_cost_trend=immutable"
+    CACHE_TTL_POLICIES=parse_key_value_pairs(
+        os.getenv('CACHE_TTL_POLICIES', '')),
+    # Shared L2 cache: "" (disabled), "sqlite" or "redis"
+    CACHE_L2_BACKEND=os.getenv('CACHE_L2_BACKEND', ''),
+    CACHE_L2_SQLITE_PATH=os.getenv(
+        'CACHE_L2_SQLITE_PATH', 'cache/l2_cache.sqlite3'),
+    CACHE_L2_REDIS_URL=os.getenv(
+        'CACHE_L2_REDIS_URL', 'redis://localhost:6379/0'),
+    CACHE_L2_KEY_PREFIX=os.getenv('CACHE_L2_KEY_PREFIX', 'cloud-copilot:'),
+    # Snapshot file for warm restarts; empty disables snapshots
+    CACHE_SNAPSHOT_PATH=os.getenv(
+        'CACHE_SNAPSHOT_PATH', 'cache/cache_snapshot.bin'),
+    CACHE_SNAPSHOT_INTERVAL_SECONDS=int(
+        os.getenv('CACHE_SNAPSHOT_INTERVAL_SECONDS', 300)),
+    # Error/placeholder results are cached for CACHE_NEGATIVE_TTL_SECONDS, doubling
+    # per consecutive failure of the same key up to CACHE_NEGATIVE_MAX_TTL_SECONDS
+    CACHE_NEGATIVE_TTL_SECONDS=int(
+        os.getenv('CACHE_NEGATIVE_TTL_SECONDS', 60)),
+    CACHE_NEGATIVE_MAX_TTL_SECONDS=int(
+        os.getenv('CACHE_NEGATIVE_MAX_TTL_SECONDS', 60 * 60)),
+    # Serialized HTTP responses of at least this size are stored gzip-compressed
+    CACHE_RESPONSE_GZIP_MIN_BYTES=int(
+        os.getenv('CACHE_RESPONSE_GZIP_MIN_BYTES', 1024)),
+    CACHE_RESPONSE_GZIP_LEVEL=int(os.getenv('CACHE_RESPONSE_GZIP_LEVEL', 6)),
+    # Days after which Cost Explorer data for a closed period stops changing
+    CE_SETTLEMENT_DAYS=int(os.getenv('CE_SETTLEMENT_DAYS', 5)),
+    # Metrics fetched together whenever ce_query_service queries a month
+    CE_QUERY_METRICS=[metric.strip() for metric in os.getenv(
+        'CE_QUERY_METRICS', 'UnblendedCost,AmortizedCost').split(',')
+        if metric.strip()],
+    # Local daily cost ledger; unsettled days are refetched after
+    # CE_LEDGER_REFRESH_SECONDS
+    CE_LEDGER_PATH=os.getenv('CE_LEDGER_PATH', 'cache/ce_ledger.sqlite3'),
+    CE_LEDGER_REFRESH_SECONDS=int(
+        os.getenv('CE_LEDGER_REFRESH_SECONDS', 6 * 60 * 60)),
+    # Local cost anomaly detection (cost_anomaly_service); {metric} is replaced
+    # by the cost metric the state belongs to
+    CE_ANOMALY_STATE_PATH=os.getenv(
+        'CE_ANOMALY_STATE_PATH', 'cache/ce_anomalies_{metric}.npz'),
+    CE_ANOMALY_WINDOW_DAYS=int(os.getenv('CE_ANOMALY_WINDOW_DAYS', 28)),
+    CE_ANOMALY_MIN_HISTORY_DAYS=int(
+        os.getenv('CE_ANOMALY_MIN_HISTORY_DAYS', 14)),
+    # Days scored when the state is first built
+    CE_ANOMALY_HISTORY_DAYS=int(os.getenv('CE_ANOMALY_HISTORY_DAYS', 90)),
+    CE_ANOMALY_THRESHOLD=float(os.getenv('CE_ANOMALY_THRESHOLD', 3.5)),
+    CE_ANOMALY_MIN_IMPACT=float(os.getenv('CE_ANOMALY_MIN_IMPACT', 1.0)),
+    # Local spend forecasts (cost_forecast_service); {metric} is replaced by the
+    # cost metric the model belongs to
+    CE_FORECAST_STATE_PATH=os.getenv(
+        'CE_FORECAST_STATE_PATH', 'cache/ce_forecast_{metric}.npz'),
+    CE_FORECAST_HISTORY_DAYS=int(os.getenv('CE_FORECAST_HISTORY_DAYS', 182)),
+    CE_FORECAST_REFIT_DAYS=int(os.getenv('CE_FORECAST_REFIT_DAYS', 7))
+)
+
+SCHEDULER_CONFIG = Map(
+    # Background refresh of the dashboard datasets (scheduler_service)
+    SCHEDULER_ENABLED=True if str_lower(os.getenv(
+        'SCHEDULER_ENABLED')) == TRUE_STRING else False,
+    # One worker per host holding this file lock runs the jobs
+    SCHEDULER_LOCK_PATH=os.getenv('SCHEDULER_LOCK_PATH', 'cache/scheduler.lock'),
+    SCHEDULER_HISTORY_PATH=os.getenv(
+        'SCHEDULER_HISTORY_PATH', 'cache/scheduler_history.json'),
+    SCHEDULER_HISTORY_SIZE=int(os.getenv('SCHEDULER_HISTORY_SIZE', 100)),
+    # Manual runs requested on other workers, picked up by the scheduling worker
+    SCHEDULER_RUN_REQUEST_PATH=os.getenv(
+        'SCHEDULER_RUN_REQUEST_PATH', 'cache/scheduler_run_{job}.request'),
+    SCHEDULER_RUN_REQUEST_POLL_SECONDS=int(
+        os.getenv('SCHEDULER_RUN_REQUEST_POLL_SECONDS', 5)),
+    SCHEDULER_LEADER_RETRY_SECONDS=int(
+        os.getenv('SCHEDULER_LEADER_RETRY_SECONDS', 60)),
+    SCHEDULER_JITTER_SECONDS=int(os.getenv('SCHEDULER_JITTER_SECONDS', 60)),
+    SCHEDULER_INVENTORY_INTERVAL_SECONDS=int(
+        os.getenv('SCHEDULER_INVENTORY_INTERVAL_SECONDS', 15 * 60)),
+    SCHEDULER_UTILISATION_INTERVAL_SECONDS=int(
+        os.getenv('SCHEDULER_UTILISATION_INTERVAL_SECONDS', 60 * 60)),
+    SCHEDULER_COST_INTERVAL_SECONDS=int(
+        os.getenv('SCHEDULER_COST_INTERVAL_SECONDS', 24 * 60 * 60)),
+    SCHEDULER_JOB_TIMEOUT_SECONDS=int(
+        os.getenv('SCHEDULER_JOB_TIMEOUT_SECONDS', 10 * 60)),
+    # Accounts and regions the jobs scan, as the accounts and regions query
+    # arguments; empty scans the default credentials and region
+    SCHEDULER_ACCOUNTS=os.getenv('SCHEDULER_ACCOUNTS', ''),
+    SCHEDULER_REGIONS=os.getenv('SCHEDULER_REGIONS', '')
+)
+
+UTILISATION_CONFIG = Map(
+    # JSON overrides of constants.UTILISATION_RULES, merged per rule, e.g.
+    # '{"ec2_overprovisioned": {"conditions": {"mean": ["lt", 10]}}}'
+    UTILISATION_RULES=json.loads(os.getenv('UTILISATION_RULES') or '{}')
+)
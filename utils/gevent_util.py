@@ -15,11 +15,18 @@ the result or raises any exceptions that occurred during execution.
 This module is particularly useful in scenarios where multiple HTTP requests or
 I/O-bound tasks need to be performed concurrently, improving the overall performance
 of an application by utilizing Gevent's cooperative multitasking.
+The `gevent_map` function fans a func out over many items on a bounded
+`gevent.pool.Pool`, with a timeout per call, for per-resource AWS checks.
+The `gevent_join` function waits for already spawned greenlets and raises the
+first failure instead of leaving a None value in its place.
 """
 
 
 import gevent
-from typing import Dict, Any, Callable, List
+from gevent.pool import Pool
+from typing import Dict, Any, Callable, Iterable, List, Optional
+
+from utils.env_config import GEVENT_CONFIG
 
 
 def gevent_spawn(
@@ -50,4 +57,66 @@ def gevent_spawn(
         # Retrieve the response if no exception occurred
         response = greenlet.value
 
-    return response
\ No newline at end of file
+    return response
+
+
+def gevent_join(greenlets: List[gevent.Greenlet]) -> List[Any]:
+    """
+    Waits for all greenlets and returns their values.
+    Args:
+        greenlets (List[gevent.Greenlet]): The spawned greenlets.
+
+    Returns:
+        List[Any]: The values, in the order of greenlets.
+
+    Raises:
+        BaseException: The exception of the first failed greenlet, once all
+            greenlets have finished.
+    """
+    gevent.joinall(greenlets)
+    for greenlet in greenlets:
+        if not greenlet.successful():
+            raise greenlet.exception
+    return [greenlet.value for greenlet in greenlets]
+
+
+def gevent_map(
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    return_exceptions: bool = False
+) -> List[Any]:
+    """
+    Calls func on every item concurrently on a bounded greenlet pool.
+    Args:
+        func (Callable[[Any], Any]): The func to call with each item.
+        items (Iterable[Any]): The items.
+        concurrency (Optional[int]): Maximum concurrent calls. Defaults to
+            GEVENT_POOL_SIZE.
+        timeout (Optional[float]): Seconds allowed per call. Defaults to
+            GEVENT_CALL_TIMEOUT_SECONDS.
+        return_exceptions (bool): If True, a failed or timed out call yields
+            its exception (gevent.Timeout on timeout) in place of a result;
+            otherwise the first failure is raised.
+
+    Returns:
+        List[Any]: The results, in the order of items.
+    """
+    if timeout is None:
+        timeout = GEVENT_CONFIG.GEVENT_CALL_TIMEOUT_SECONDS
+
+    def call(item: Any) -> Any:
+        try:
+            with gevent.Timeout(timeout):
+                return func(item)
+        except (Exception, gevent.Timeout) as e:
+            if return_exceptions:
+                return e
+            raise
+
+    pool = Pool(concurrency or GEVENT_CONFIG.GEVENT_POOL_SIZE)
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.kill()
@@ -43,6 +43,26 @@ def parse_cors_origins(cors_origins_string: str) -> list:
     return [origin.strip() for origin in cors_origins_string.split(',') if origin.strip()]
 
 
+def parse_key_value_pairs(pairs_string: str) -> dict:
+    """
+    Parse a comma-separated string of key=value pairs into a dict.
+
+    Args:
+        pairs_string (str): String such as "a=1, b=2". Entries without '=' are ignored.
+
+    Returns:
+        dict: A dict of stripped keys to stripped string values.
+    """
+    if not pairs_string:
+        return {}
+    pairs = {}
+    for pair in pairs_string.split(','):
+        key, sep, value = pair.partition('=')
+        if sep and key.strip():
+            pairs[key.strip()] = value.strip()
+    return pairs
+
+
 def parse_valid_date(date_str: str, fmt: str = '%d-%m-%Y') -> datetime:
     """
     Validates and parses a date string using the given format.